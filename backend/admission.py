@@ -0,0 +1,189 @@
+"""
+Cost-aware admission control for pipeline runs.
+
+Cache hits never come here. A request that would start a pipeline run is
+charged its expected cost (the run itself plus its LLM tokens) against a
+global budget and a per-client budget. When the global budget is spent,
+requests wait in a FIFO queue up to a deadline; when the queue is full, the
+client is over its share, the wait runs out, or the event loop itself is
+lagging, the request is shed with a Retry-After estimate instead.
+
+All methods must be called on the event loop thread.
+"""
+import math
+import time
+import asyncio
+import logging
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SAMPLE_SECONDS = 0.1
+LOOP_LAG_DECAY = 0.8            # the lag estimate is a decaying peak, so one slow tick is remembered briefly
+SERVICE_EWMA_ALPHA = 0.2
+DEFAULT_SERVICE_SECONDS = 5.0   # how long a run holds its budget before any have been measured
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is the suggested wait in whole seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    __slots__ = ("client", "cost", "admitted_at", "released")
+
+    def __init__(self, client: str, cost: float):
+        self.client = client
+        self.cost = cost
+        self.admitted_at = time.monotonic()
+        self.released = False
+
+
+class AdmissionController:
+    def __init__(self, capacity: float, per_client: float, max_queue: int, queue_timeout: float, max_loop_lag: float):
+        self.capacity = capacity
+        self.per_client = per_client
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_loop_lag = max_loop_lag
+        self.in_use = 0.0
+        self.loop_lag = 0.0
+        self.service_seconds = None
+        self._client_cost = defaultdict(float)  # admitted plus queued cost per client
+        self._queue: deque = deque()            # [client, cost, future] in arrival order
+        self._monitor = None
+        self.admitted = 0
+        self.queued = 0
+        self.shed = defaultdict(int)
+
+    # ── Admission ──
+
+    async def acquire(self, client: str, cost: float) -> Ticket:
+        """Admits, queues or sheds (raising Overloaded) a request that will start a run."""
+        self._ensure_monitor()
+        if self.loop_lag > self.max_loop_lag:
+            raise self._shed("loop_lag", cost)
+        held = self._client_cost.get(client, 0.0)
+        if held and held + cost > self.per_client:
+            raise self._shed("client_limit", cost)
+        if not self._queue and self._fits(cost):
+            return self._admit(client, cost)
+        if len(self._queue) >= self.max_queue:
+            raise self._shed("queue_full", cost)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [client, cost, future]
+        self._queue.append(entry)
+        self._client_cost[client] += cost
+        self.queued += 1
+        try:
+            await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # The client went away while queued; give back whatever it was holding
+            self._leave_queue(entry)
+            if future.done() and not future.cancelled():
+                self.release(future.result())
+            raise
+        if future.done():
+            return future.result()
+        self._leave_queue(entry)
+        future.cancel()
+        raise self._shed("queue_timeout", cost)
+
+    def try_acquire(self, client: str, cost: float):
+        """Admits only if the budget is free right now (background refreshes); never queues."""
+        if self._queue or not self._fits(cost) or self._client_cost.get(client, 0.0) + cost > self.per_client:
+            self.shed["background_skipped"] += 1
+            return None
+        return self._admit(client, cost)
+
+    def release(self, ticket: Ticket):
+        if ticket.released:
+            return
+        ticket.released = True
+        self.in_use = max(self.in_use - ticket.cost, 0.0)
+        self._client_cost[ticket.client] -= ticket.cost
+        if self._client_cost[ticket.client] <= 1e-9:
+            del self._client_cost[ticket.client]
+        held = time.monotonic() - ticket.admitted_at
+        self.service_seconds = held if self.service_seconds is None else (
+            (1 - SERVICE_EWMA_ALPHA) * self.service_seconds + SERVICE_EWMA_ALPHA * held
+        )
+        self._grant()
+
+    def _fits(self, cost: float) -> bool:
+        # An idle controller admits even a request costing more than the whole budget
+        return self.in_use == 0 or self.in_use + cost <= self.capacity
+
+    def _admit(self, client: str, cost: float, counted: bool = False) -> Ticket:
+        self.in_use += cost
+        if not counted:
+            self._client_cost[client] += cost
+        self.admitted += 1
+        return Ticket(client, cost)
+
+    def _grant(self):
+        """Hands freed budget to queued requests in arrival order."""
+        while self._queue:
+            client, cost, future = self._queue[0]
+            if future.done():
+                self._queue.popleft()
+                continue
+            if not self._fits(cost):
+                return
+            self._queue.popleft()
+            future.set_result(self._admit(client, cost, counted=True))
+
+    def _leave_queue(self, entry: list):
+        try:
+            self._queue.remove(entry)
+        except ValueError:
+            return  # already granted; the ticket carries the client's cost now
+        client, cost, _ = entry
+        self._client_cost[client] -= cost
+        if self._client_cost[client] <= 1e-9:
+            del self._client_cost[client]
+
+    def _shed(self, reason: str, cost: float) -> Overloaded:
+        self.shed[reason] += 1
+        retry_after = self.retry_after(cost)
+        logger.warning("Shedding pipeline request (%s); retry after %ss", reason, retry_after)
+        return Overloaded(reason, retry_after)
+
+    def retry_after(self, cost: float) -> int:
+        """Seconds until the queue ahead, plus this request, should have drained through the budget."""
+        service = self.service_seconds or DEFAULT_SERVICE_SECONDS
+        queued_cost = sum(entry[1] for entry in self._queue)
+        drain = (queued_cost + cost) / max(self.capacity, 1e-9) * service
+        return max(1, math.ceil(drain + self.loop_lag))
+
+    # ── Event loop lag ──
+
+    def _ensure_monitor(self):
+        loop = asyncio.get_running_loop()
+        if self._monitor is None or self._monitor.done() or self._monitor.get_loop() is not loop:
+            self._monitor = loop.create_task(self._watch_loop_lag())
+
+    async def _watch_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LOOP_LAG_SAMPLE_SECONDS)
+            lag = max(loop.time() - started - LOOP_LAG_SAMPLE_SECONDS, 0.0)
+            self.loop_lag = max(lag, self.loop_lag * LOOP_LAG_DECAY)
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "in_use": round(self.in_use, 2),
+            "queue_depth": len(self._queue),
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            "service_seconds": round(self.service_seconds, 2) if self.service_seconds is not None else None,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": dict(self.shed),
+        }
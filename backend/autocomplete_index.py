@@ -0,0 +1,362 @@
+"""
+Local prefix index for autocomplete.
+
+Every candidate returned by the live Wikipedia / onefivenine searches is
+appended to a journal. `python autocomplete_index.py build` merges the journal
+(plus an optional bulk gazetteer) into a sorted, memory-mapped index file, so
+prefix queries are answered with a binary search instead of a network call.
+Workers also compact the journal themselves once it passes
+AUTOCOMPLETE_JOURNAL_MAX_BYTES, one at a time behind a file lock.
+
+Index file layout (little-endian):
+    b"GCAC" | uint8 version | uint32 count | count × uint32 record offsets | records
+    record = normalized key, b"\\0", candidate JSON, b"\\n"   (records sorted by key)
+
+Because the file is mmap'd read-only, every uvicorn worker shares the same
+page-cache copy and startup costs nothing beyond opening the file.
+"""
+import os
+import re
+import json
+import mmap
+import bisect
+import struct
+import logging
+import argparse
+import threading
+import time
+import unicodedata
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction is only serialized within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.getenv("AUTOCOMPLETE_INDEX_PATH", os.path.join(BASE_DIR, "data", "autocomplete.idx"))
+JOURNAL_PATH = os.getenv("AUTOCOMPLETE_JOURNAL_PATH", os.path.join(BASE_DIR, "data", "autocomplete.journal.jsonl"))
+RELOAD_CHECK_SECONDS = 30  # how often a worker checks whether the index file was rebuilt
+# Entries recorded since the last build are held in memory up to this many; the
+# rest are only journaled and become searchable once the journal is compacted.
+PENDING_MAX_ENTRIES = int(os.getenv("AUTOCOMPLETE_PENDING_MAX_ENTRIES", 5000))
+JOURNAL_MAX_BYTES = int(os.getenv("AUTOCOMPLETE_JOURNAL_MAX_BYTES", 1048576))  # compact past 1 MB
+
+_MAGIC = b"GCAC"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBI")
+_OFFSET = struct.Struct("<I")
+
+
+def normalize(text: str) -> str:
+    """Lower-cases, strips accents and collapses whitespace so 'Tiruchirāppalli ' matches 'tiruchira'."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _candidate_id(candidate: dict) -> tuple:
+    return (candidate.get("source"), candidate.get("title"), candidate.get("path"))
+
+
+class PrefixIndex:
+    """Read side of the index plus the in-process tail of entries recorded since the last build."""
+
+    def __init__(self, index_path: str = INDEX_PATH, journal_path: str = JOURNAL_PATH):
+        self.index_path = index_path
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+        self._mm = None
+        self._count = 0
+        self._data_start = 0
+        self._file_id = None
+        self._checked_at = 0.0
+        # Recorded after the last build: ids for dedup, plus keys kept sorted for bisecting
+        # with the candidates in the same order
+        self._pending_ids: set = set()
+        self._pending_keys: list = []
+        self._pending_candidates: list = []
+        self._compacting = False
+        self._open()
+        self._load_journal()
+
+    # ── Reading ───────────────────────────────────────────────────────────────
+
+    def _open(self):
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        if file_id == self._file_id or stat.st_size < _HEADER.size:
+            return
+        with open(self.index_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            logger.warning("Ignoring autocomplete index with unexpected header: %s", self.index_path)
+            mm.close()
+            return
+        self._mm, self._count, self._file_id = mm, count, file_id
+        self._data_start = _HEADER.size + count * _OFFSET.size
+        # Entries already compacted into the new file no longer need to be held in
+        # memory; whatever was journaled since the build is read back in
+        self._pending_ids.clear()
+        self._pending_keys.clear()
+        self._pending_candidates.clear()
+        self._load_journal()
+        logger.info("Autocomplete index loaded: %d entries from %s", count, self.index_path)
+
+    def _load_journal(self):
+        try:
+            for candidate in _read_candidates(self.journal_path):
+                if not self._add_pending(candidate):
+                    break
+        except OSError:
+            pass  # no journal yet
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        self._open()
+
+    def _record_at(self, i: int) -> tuple:
+        start = self._data_start + _OFFSET.unpack_from(self._mm, _HEADER.size + i * _OFFSET.size)[0]
+        end = self._mm.find(b"\n", start)
+        sep = self._mm.find(b"\0", start, end)
+        return start, sep, end
+
+    def _key_at(self, i: int) -> bytes:
+        start, sep, _ = self._record_at(i)
+        return self._mm[start:sep]
+
+    def _lower_bound(self, prefix: bytes) -> int:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, query: str, source: str = None, limit: int = 5, scan: int = 64) -> list:
+        """
+        Returns up to `limit` candidates whose normalized title starts with the query,
+        shortest titles first. `scan` bounds how many prefix matches are examined.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            self._maybe_reload()
+            matches = []
+            if self._mm is not None:
+                encoded = prefix.encode("utf-8")
+                i = self._lower_bound(encoded)
+                while i < self._count and len(matches) < scan:
+                    start, sep, end = self._record_at(i)
+                    if not self._mm[start:sep].startswith(encoded):
+                        break
+                    matches.append((self._mm[start:sep].decode("utf-8"), json.loads(self._mm[sep + 1:end])))
+                    i += 1
+            i = bisect.bisect_left(self._pending_keys, prefix)
+            end = min(i + scan, len(self._pending_keys))
+            while i < end and self._pending_keys[i].startswith(prefix):
+                matches.append((self._pending_keys[i], self._pending_candidates[i]))
+                i += 1
+
+        seen = set()
+        results = []
+        for key, candidate in sorted(matches, key=lambda m: (len(m[0]), m[0])):
+            if source and candidate.get("source") != source:
+                continue
+            cid = _candidate_id(candidate)
+            if cid in seen:
+                continue
+            seen.add(cid)
+            results.append(candidate)
+            if len(results) >= limit:
+                break
+        return results
+
+    # ── Recording ─────────────────────────────────────────────────────────────
+
+    def _add_pending(self, candidate: dict) -> bool:
+        """Holds a candidate in memory until the next build; False once the cap is reached."""
+        if len(self._pending_ids) >= PENDING_MAX_ENTRIES:
+            return False
+        cid = _candidate_id(candidate)
+        if cid not in self._pending_ids:
+            key = normalize(candidate["title"])
+            i = bisect.bisect_right(self._pending_keys, key)
+            self._pending_keys.insert(i, key)
+            self._pending_candidates.insert(i, candidate)
+            self._pending_ids.add(cid)
+        return True
+
+    def record(self, candidates: list):
+        """Remembers live search results: searchable in this worker now, in all workers after the next build."""
+        fresh = []
+        with self._lock:
+            for candidate in candidates:
+                cid = _candidate_id(candidate)
+                if not candidate.get("title") or cid in self._pending_ids:
+                    continue
+                self._add_pending(candidate)
+                fresh.append(candidate)
+        if not fresh:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            # One short line per write; O_APPEND keeps lines from different workers intact
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                for candidate in fresh:
+                    f.write(json.dumps(candidate, ensure_ascii=False) + "\n")
+                journal_bytes = f.tell()
+        except OSError as e:
+            logger.warning("Could not append to autocomplete journal: %s", e)
+            return
+        if journal_bytes >= JOURNAL_MAX_BYTES:
+            self.compact_in_background()
+
+    # ── Compaction ────────────────────────────────────────────────────────────
+
+    def compact(self) -> bool:
+        """
+        Merges the journal into the index file unless another worker is already
+        doing so, then reloads it. Returns whether this call did the build.
+        """
+        lock_path = self.journal_path + ".lock"
+        try:
+            with open(lock_path, "a") as lock:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        return False  # another worker is compacting
+                # The journal may have been consumed while we waited on our own append
+                if not os.path.exists(self.journal_path):
+                    return False
+                total = build_index(self.index_path, self.journal_path)
+        except OSError as e:
+            logger.warning("Autocomplete journal compaction failed: %s", e)
+            return False
+        logger.info("Compacted autocomplete journal into %d entries", total)
+        with self._lock:
+            self._open()
+            self._checked_at = time.monotonic()
+        return True
+
+    def compact_in_background(self):
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            finally:
+                self._compacting = False
+
+        threading.Thread(target=run, name="autocomplete-compact", daemon=True).start()
+
+
+# ── Building ──────────────────────────────────────────────────────────────────
+
+def _read_candidates(path: str, default_source: str = "wikipedia"):
+    """
+    Yields candidates from a JSONL file. Lines that are not JSON are read as a
+    gazetteer row: 'title<TAB>description' (description optional).
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                candidate = json.loads(line)
+            except json.JSONDecodeError:
+                title, _, description = line.partition("\t")
+                candidate = {"title": title.strip(), "description": description.strip() or "Place", "source": default_source}
+            if isinstance(candidate, dict) and candidate.get("title"):
+                yield candidate
+
+
+def _read_index(path: str):
+    """Yields the candidates stored in an existing index file, if any."""
+    index = PrefixIndex(index_path=path, journal_path=os.devnull)
+    for i in range(index._count):
+        start, sep, end = index._record_at(i)
+        yield json.loads(index._mm[sep + 1:end])
+
+
+def build_index(out_path: str = INDEX_PATH, journal_path: str = JOURNAL_PATH, gazetteers: list = (), keep_journal: bool = False) -> int:
+    """Merges the existing index, the journal and any gazetteer files into a fresh index file."""
+    # Rotate the journal first so workers appending during the build start a new one
+    consumed_journal = None
+    if os.path.exists(journal_path):
+        consumed_journal = journal_path + ".building"
+        os.replace(journal_path, consumed_journal)
+
+    merged = {}
+    sources = [_read_index(out_path)]
+    if consumed_journal:
+        sources.append(_read_candidates(consumed_journal))
+    sources.extend(_read_candidates(path) for path in gazetteers)
+    for stream in sources:
+        for candidate in stream:
+            merged[_candidate_id(candidate)] = candidate
+
+    entries = sorted(
+        (normalize(c["title"]).encode("utf-8"), json.dumps(c, ensure_ascii=False).encode("utf-8"))
+        for c in merged.values()
+    )
+
+    offsets = []
+    body = bytearray()
+    for key, payload in entries:
+        offsets.append(len(body))
+        body += key + b"\0" + payload + b"\n"
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(entries)))
+        for offset in offsets:
+            f.write(_OFFSET.pack(offset))
+        f.write(body)
+    # Atomic swap: workers still mapping the old file keep a valid view until they reload
+    os.replace(tmp_path, out_path)
+
+    if consumed_journal:
+        if keep_journal:
+            with open(consumed_journal, encoding="utf-8") as src, open(journal_path, "a", encoding="utf-8") as dst:
+                dst.write(src.read())
+        os.remove(consumed_journal)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build the local autocomplete prefix index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="merge the journal and gazetteers into the index file")
+    build.add_argument("--gazetteer", action="append", default=[], help="JSONL or 'title<TAB>description' file (repeatable)")
+    build.add_argument("--out", default=INDEX_PATH)
+    build.add_argument("--journal", default=JOURNAL_PATH)
+    build.add_argument("--keep-journal", action="store_true", help="keep the journal entries after building")
+    query = sub.add_parser("query", help="look up a prefix in the index")
+    query.add_argument("prefix")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        total = build_index(args.out, args.journal, args.gazetteer, keep_journal=args.keep_journal)
+        print(f"Wrote {total} entries to {args.out}")
+    else:
+        for candidate in PrefixIndex(journal_path=os.devnull).lookup(args.prefix, limit=20):
+            print(json.dumps(candidate, ensure_ascii=False))
@@ -0,0 +1,261 @@
+import os
+import json
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Stale-while-revalidate: after the soft TTL a summary is still served (X-Cache: STALE)
+# while one background run refreshes it; after the hard TTL it is gone from Redis.
+SUMMARY_SOFT_TTL_SECONDS = int(os.getenv("SUMMARY_SOFT_TTL_SECONDS", 43200))   # 12 hours
+SUMMARY_HARD_TTL_SECONDS = int(os.getenv("SUMMARY_HARD_TTL_SECONDS", 604800))  # 7 days
+
+
+# Query aliases map a normalized query to its canonical page and change far less
+# often than the summaries themselves.
+ALIAS_TTL_SECONDS = int(os.getenv("ALIAS_TTL_SECONDS", 2592000))  # 30 days
+
+
+def _normalize_query(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def alias_cache_key(source: str, query: str) -> str:
+    return f"alias:{source}:{_normalize_query(query)}"
+
+
+def page_summary_key(source: str, page: str) -> str:
+    """Summary key for a canonical page: a Wikipedia title, or a onefivenine path."""
+    return f"summary:{source}:page:{page.strip()}"
+
+
+def summary_entry(result: dict, revid: int = None, text_hash: str = None) -> dict:
+    """
+    Wraps a pipeline result so readers can tell fresh from stale entries. The
+    Wikipedia revid and the filtered-text hash let a refresh skip the LLM when
+    the article has not changed.
+    """
+    return {"stored_at": time.time(), "result": result, "revid": revid, "text_hash": text_hash}
+
+
+def has_insights(result: dict) -> bool:
+    """False when the LLM step failed: no insights, or the {"error": ...} placeholder."""
+    insights = (result or {}).get("insights")
+    return bool(insights) and "error" not in insights
+
+
+def _estimate_size(value) -> int:
+    """Approximate in-memory footprint of a cached value in bytes."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class SizedTTLCache:
+    """
+    Thread-safe in-process LRU cache bounded by total payload bytes rather than
+    entry count, with a per-entry expiry.
+
+    Supports the small dict-style surface the endpoints already used on
+    cachetools.TTLCache (`in`, `[]`, assignment) so it can replace those caches.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, name: str = "l1"):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.name = name
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, _, value = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return  # would evict everything else; not worth holding
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class TieredCache:
+    """
+    Two-tier JSON cache: a SizedTTLCache (L1) in front of the Upstash Redis client (L2).
+
+    L1 entries never outlive the Redis copy: on write they get the same TTL,
+    and on an L2 read-through the remaining Redis TTL is fetched in the same
+    pipelined round-trip and used for the L1 entry.
+    Redis errors are logged and treated as misses, matching the endpoints'
+    existing "cache is best-effort" behaviour.
+    """
+
+    def __init__(self, redis_client, l1: SizedTTLCache):
+        self.redis = redis_client
+        self.l1 = l1
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+
+    async def get(self, key: str):
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+
+        if not self.redis:
+            return None
+        try:
+            pipe = self.redis.pipeline()
+            pipe.get(key)
+            pipe.ttl(key)
+            raw, remaining = await pipe.exec()
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning("Redis cache read error: %s", e)
+            return None
+
+        if not raw:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        value = json.loads(raw) if isinstance(raw, str) else raw
+        # remaining is -1 for keys without expiry; fall back to the L1 default TTL
+        self.l1.set(key, value, ttl=remaining if remaining and remaining > 0 else None)
+        return value
+
+    async def get_many(self, keys: list) -> dict:
+        """
+        Reads many entries: L1 first, the rest in one pipelined Redis request.
+        Redis hits are copied into L1 with their remaining TTL, as get() does.
+        """
+        found, missing = {}, []
+        for key in keys:
+            value = self.l1.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        if not self.redis or not missing:
+            return found
+        try:
+            pipe = self.redis.pipeline()
+            for key in missing:
+                pipe.get(key)
+                pipe.ttl(key)
+            replies = await pipe.exec()
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning("Redis pipelined read error: %s", e)
+            return found
+        for key, raw, remaining in zip(missing, replies[0::2], replies[1::2]):
+            if not raw:
+                self.l2_misses += 1
+                continue
+            self.l2_hits += 1
+            value = json.loads(raw) if isinstance(raw, str) else raw
+            self.l1.set(key, value, ttl=remaining if remaining and remaining > 0 else None)
+            found[key] = value
+        return found
+
+    async def set(self, key: str, value, ex: int):
+        self.l1.set(key, value, ttl=ex)
+        if not self.redis:
+            return
+        try:
+            await self.redis.set(key, json.dumps(value), ex=ex)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning("Redis cache write error: %s", e)
+
+    async def set_many(self, items: dict, ex: int):
+        """Writes many entries in one pipelined Redis request (used by bulk warming)."""
+        for key, value in items.items():
+            self.l1.set(key, value, ttl=ex)
+        if not self.redis or not items:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            for key, value in items.items():
+                pipe.set(key, json.dumps(value), ex=ex)
+            await pipe.exec()
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning("Redis pipelined write error: %s", e)
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "l1": self.l1.stats(),
+            "l2": {"hits": self.l2_hits, "misses": self.l2_misses, "errors": self.l2_errors},
+        }
@@ -0,0 +1,58 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineCancelled(Exception):
+    """Raised inside a pipeline run once nobody is waiting for its result any more."""
+
+
+class CancelToken:
+    """
+    Thread-safe cancellation flag shared by a run and the work it started.
+
+    The pipeline thread polls it between steps with raise_if_cancelled();
+    anything that blocks for longer (queued side fetches, the Groq stream)
+    registers an on_cancel callback that aborts it. Callbacks run once, on the
+    thread that cancels, so they must be quick and must not block.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: list = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("Cancel callback failed: %s", e)
+
+    def on_cancel(self, callback):
+        """Registers callback (run at once if already cancelled) and returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise PipelineCancelled()
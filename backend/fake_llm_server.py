@@ -0,0 +1,145 @@
+"""
+Local stand-in for the Groq API, for exercising the model router.
+
+Serves the OpenAI-compatible chat completions endpoint the Groq SDK calls,
+streaming or not, with a latency profile per model: time to first token,
+tokens per second, a failure rate (a 429 or a 500) and a rate of empty
+completions. Point the backend at it and watch /api/metrics → llm_router
+while it routes, hedges and falls back:
+
+    python fake_llm_server.py --model llama-3.3-70b-versatile:ttft=4,tps=40 \
+                              --model llama-3.1-8b-instant:ttft=0.3,tps=300
+    GROQ_BASE_URL=http://127.0.0.1:8089 GROQ_API_KEY=fake uvicorn main:app --port 8000
+
+Models without a --model profile answer with DEFAULT_PROFILE. The reply is a
+JSON object of insights, so the whole pipeline (incremental parser included)
+runs unchanged. tests/test_llm_router.py drives the router against it.
+"""
+import json
+import time
+import random
+import argparse
+import logging
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8089
+DEFAULT_PROFILE = {"ttft": 0.5, "tps": 100.0, "error": 0.0, "status": 500, "empty": 0.0}
+
+_INSIGHTS = {
+    "Historical Significance": "A fake insight about the place's long history, streamed one token at a time.",
+    "Famous Landmark": "A fake insight about the landmark visitors come to see first.",
+    "Local Culture": "A fake insight about the festivals, food and crafts of the region.",
+    "Geography": "A fake insight about the rivers, hills and climate around the place.",
+    "Economy": "A fake insight about the trades that have sustained the place.",
+    "Notable People": "A fake insight about people from the place who became well known.",
+}
+
+
+def parse_profile(spec: str) -> tuple:
+    """'model:ttft=2,tps=40,error=0.1,status=429,empty=0.1' -> (model, profile dict)."""
+    model, _, options = spec.partition(":")
+    profile = dict(DEFAULT_PROFILE)
+    for option in filter(None, options.split(",")):
+        name, _, value = option.partition("=")
+        if name not in profile:
+            raise argparse.ArgumentTypeError(f"unknown profile option: {name}")
+        profile[name] = type(DEFAULT_PROFILE[name])(value)
+    return model, profile
+
+
+def _tokens(text: str) -> list:
+    """Splits the reply into word-sized pieces, roughly how Groq chunks a stream."""
+    pieces, start = [], 0
+    for i, char in enumerate(text):
+        if char in " \n":
+            pieces.append(text[start:i + 1])
+            start = i + 1
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+def make_handler(profiles: dict):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            logger.debug(fmt, *args)
+
+        def _json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, text: str):
+            data = text.encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self._json(404, {"error": {"message": f"no route {self.path}"}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            model = request.get("model", "")
+            profile = profiles.get(model, DEFAULT_PROFILE)
+            logger.info("%s request for %s", "stream" if request.get("stream") else "complete", model)
+
+            if random.random() < profile["error"]:
+                kind = "rate_limit_exceeded" if profile["status"] == 429 else "internal_server_error"
+                self._json(profile["status"], {"error": {"message": f"fake {kind}", "type": kind, "code": kind}})
+                return
+
+            tokens = [] if random.random() < profile["empty"] else _tokens(json.dumps(_INSIGHTS, indent=2))
+            time.sleep(profile["ttft"])
+            if not request.get("stream"):
+                completion_time = len(tokens) / profile["tps"] or 0.001
+                time.sleep(completion_time)
+                self._json(200, {
+                    "id": "fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens),
+                              "completion_time": completion_time},
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for token in tokens:
+                    chunk = {
+                        "id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                    }
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n")
+                    time.sleep(1 / profile["tps"])
+                self._chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                logger.info("Stream for %s closed by the client", model)  # a hedge loser being cancelled
+
+    return Handler
+
+
+def serve(port: int = DEFAULT_PORT, profiles: dict = None, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Binds the fake server; call serve_forever() on it (in a thread, from a test harness)."""
+    return ThreadingHTTPServer((host, port), make_handler(profiles or {}))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server with per-model latency profiles.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", type=parse_profile, action="append", default=[],
+                        help="name:ttft=SECONDS,tps=TOKENS_PER_SECOND,error=RATE,status=429|500,empty=RATE (repeatable)")
+    args = parser.parse_args()
+    server = serve(args.port, dict(args.model))
+    logger.info("Fake LLM server on http://127.0.0.1:%d (profiles: %s)", args.port, dict(args.model) or "default")
+    server.serve_forever()
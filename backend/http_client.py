@@ -0,0 +1,399 @@
+import os
+import time
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing. Each upstream host gets its own keep-alive connection pool so a
+# burst against Wikipedia never evicts the warm sockets held for Nominatim.
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))   # sockets kept per host
+HTTP_POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "false").lower() == "true"
+
+# Per-host overrides for the pool size, e.g. HTTP_POOL_LIMITS="en.wikipedia.org=32,nominatim.openstreetmap.org=2"
+UPSTREAM_HOSTS = {
+    "en.wikipedia.org": HTTP_POOL_MAXSIZE,
+    "www.wikidata.org": HTTP_POOL_MAXSIZE,
+    "query.wikidata.org": 5,  # the query service allows 5 concurrent queries per client
+    "nominatim.openstreetmap.org": 4,
+    "www.onefivenine.com": 8,
+}
+
+
+def _parse_pool_limits(raw: str, cast=int) -> dict:
+    """Parses 'host=value,host=value' into a dict, ignoring malformed or non-positive entries."""
+    limits = {}
+    for part in raw.split(","):
+        host, _, value = part.partition("=")
+        host = host.strip()
+        try:
+            value = cast(value.strip())
+        except ValueError:
+            continue
+        if host and value > 0:
+            limits[host] = value
+    return limits
+
+
+UPSTREAM_HOSTS.update(_parse_pool_limits(os.getenv("HTTP_POOL_LIMITS", "")))
+
+# Request-rate caps (requests/second) for hosts whose usage policy limits the rate,
+# not just concurrency; override with HTTP_RATE_LIMITS="nominatim.openstreetmap.org=1".
+# Enforced per process, so the policy rate should be split across workers.
+UPSTREAM_RATES = {
+    "nominatim.openstreetmap.org": 1.0,  # "an absolute maximum of 1 request per second"
+}
+UPSTREAM_RATES.update(_parse_pool_limits(os.getenv("HTTP_RATE_LIMITS", ""), cast=float))
+
+# Resilience. Each host is a bulkhead with as many concurrent requests as it has
+# pooled sockets, so a slow onefivenine or Nominatim cannot hold the threads the
+# Wikipedia fetches need.
+BULKHEAD_WAIT_SECONDS = float(os.getenv("HTTP_BULKHEAD_WAIT_SECONDS", 2.0))  # then fail fast
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("HTTP_CIRCUIT_FAILURES", 5))       # consecutive failures to open
+CIRCUIT_OPEN_SECONDS = float(os.getenv("HTTP_CIRCUIT_OPEN_SECONDS", 30))     # then one probe is let through
+LATENCY_WINDOW = 256            # recent latencies kept per host
+LATENCY_MIN_SAMPLES = 20        # before this many, callers' timeouts are used as given and nothing is hedged
+ADAPTIVE_TIMEOUT_MULTIPLIER = 2.0
+ADAPTIVE_TIMEOUT_FLOOR = 1.0    # seconds; never tighter than this however fast the host has been
+# GETs to these hosts are hedged once they pass the host's p95. Nominatim and
+# onefivenine are left out: their usage policies ask for minimal load.
+HEDGE_HOSTS = {
+    h.strip() for h in os.getenv("HTTP_HEDGE_HOSTS", "en.wikipedia.org,www.wikidata.org").split(",") if h.strip()
+}
+
+
+def _mount_pools(session: requests.Session) -> requests.Session:
+    """Mounts one dedicated keep-alive pool per known upstream host on the session."""
+    for host, maxsize in UPSTREAM_HOSTS.items():
+        session.mount(
+            f"https://{host}",
+            HTTPAdapter(pool_connections=1, pool_maxsize=maxsize, pool_block=HTTP_POOL_BLOCK),
+        )
+    # Catch-all for any host we have not configured explicitly
+    session.mount(
+        "https://",
+        HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=HTTP_POOL_BLOCK),
+    )
+    return session
+
+
+# Query parameters that decide what a MediaWiki/Wikidata API call does. Calls that
+# differ in them (opensearch vs. full extracts) differ in cost by orders of
+# magnitude, so each combination keeps its own latency window.
+_ENDPOINT_PARAMS = ("action", "list", "prop", "props", "generator")
+_BATCH_PARAMS = ("titles", "ids", "pageids")
+
+
+def _endpoint(method: str, url: str, params) -> str:
+    """Latency-window key for a call: method, path, the operation it asks for, and whether it is batched."""
+    parts = [method, urlsplit(url).path]
+    if isinstance(params, dict):
+        parts += [f"{name}={params[name]}" for name in _ENDPOINT_PARAMS if params.get(name)]
+        if any("|" in str(params.get(name, "")) for name in _BATCH_PARAMS):
+            parts.append("batch")
+    return " ".join(parts)
+
+
+class UpstreamUnavailable(requests.exceptions.ConnectionError):
+    """Raised without sending when a host's circuit is open, its bulkhead stays full or its rate is used up."""
+
+
+class _Upstream:
+    """Bulkhead, rate limit and circuit breaker for one host, with a latency window per endpoint."""
+
+    def __init__(self, host: str, limit: int):
+        self.host = host
+        self.limit = limit
+        self.hedge = host in HEDGE_HOSTS
+        self._slots = threading.BoundedSemaphore(limit)
+        self.rate = UPSTREAM_RATES.get(host)
+        self._next_send = 0.0  # token bucket of one: when the next request may go out
+        self._lock = threading.Lock()
+        self._latencies: dict = {}  # endpoint -> deque of recent latencies
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.in_flight = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    # ── Bulkhead ──
+
+    def enter(self, wait: float) -> bool:
+        acquired = self._slots.acquire(timeout=wait) if wait > 0 else self._slots.acquire(blocking=False)
+        if not acquired:
+            self.count("rejected")
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    # ── Rate limit ──
+
+    def reserve(self, wait: float) -> bool:
+        """
+        Claims the next send slot and sleeps until it, or refuses at once when
+        that slot is more than `wait` seconds away, so a burst fails fast
+        instead of queueing behind the rate.
+        """
+        if not self.rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_send)
+            if slot - now > wait:
+                self.rate_limited += 1
+                return False
+            self._next_send = slot + 1 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+        return True
+
+    def count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # ── Circuit breaker ──
+
+    def allow(self) -> bool:
+        """Closed: always. Open: never, until CIRCUIT_OPEN_SECONDS pass. Half-open: one probe at a time."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < CIRCUIT_OPEN_SECONDS:
+                    self.rejected += 1
+                    return False
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open":
+                if self._probing:
+                    self.rejected += 1
+                    return False
+                self._probing = True
+            return True
+
+    def release_probe(self):
+        """A half-open probe that never got sent (bulkhead full) frees the probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def observe(self, endpoint: str, latency: float):
+        with self._lock:
+            self._observe(endpoint, latency)
+
+    def _observe(self, endpoint: str, latency: float):
+        window = self._latencies.get(endpoint)
+        if window is None:
+            window = self._latencies[endpoint] = deque(maxlen=LATENCY_WINDOW)
+        window.append(latency)
+
+    def record_success(self, endpoint: str, latency: float):
+        with self._lock:
+            self._observe(endpoint, latency)
+            self.failures = 0
+            if self.state != "closed":
+                logger.info("Circuit for %s closed", self.host)
+            self.state = "closed"
+            self._probing = False
+
+    def record_failure(self, endpoint: str = None, latency: float = None):
+        with self._lock:
+            if latency is not None:
+                # A timeout still says the endpoint is at least this slow, so the adaptive timeout can grow back
+                self._observe(endpoint, latency)
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+                if self.state != "open":
+                    logger.warning("Circuit for %s opened after %d failures", self.host, self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    # ── Latency ──
+
+    def percentile(self, q: float, endpoint: str = None):
+        """Latency percentile of one endpoint, or of all the host's endpoints together."""
+        with self._lock:
+            if endpoint is not None:
+                samples = list(self._latencies.get(endpoint, ()))
+            else:
+                samples = [latency for window in self._latencies.values() for latency in window]
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def timeout_for(self, method: str, endpoint: str, requested):
+        """
+        The caller's timeout tightened to a multiple of the endpoint's observed
+        p99 (never below the floor). POSTs keep theirs: their cost is in the
+        body (a 200-item SPARQL query), which the endpoint key cannot see.
+        """
+        if requested is None or isinstance(requested, tuple) or method != "GET" or self.state != "closed":
+            return requested  # half-open probes get the full timeout
+        p99 = self.percentile(0.99, endpoint)
+        if p99 is None:
+            return requested
+        return min(requested, max(ADAPTIVE_TIMEOUT_FLOOR, p99 * ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+    def stats(self) -> dict:
+        p50, p95, p99 = (self.percentile(q) for q in (0.5, 0.95, 0.99))
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "circuit": self.state,
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "p99_ms": round(p99 * 1000) if p99 is not None else None,
+            "rejected": self.rejected,
+            "rate_limited": self.rate_limited,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+# Hedged GETs run both copies here so the caller can wait on whichever returns first
+_hedge_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv("HTTP_HEDGE_WORKERS", 32)), thread_name_prefix="http-hedge"
+)
+
+
+def _close_response(future: concurrent.futures.Future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class ResilientSession:
+    """
+    Drop-in for the requests.Session calls the fetchers make (get/post), routed
+    through a per-host bulkhead and circuit breaker with adaptive timeouts, and
+    hedged once for slow GETs to hosts in HEDGE_HOSTS.
+    Failures are raised as the usual requests exceptions, so callers' existing
+    error handling covers them.
+    """
+
+    def __init__(self, session: requests.Session):
+        self._session = session
+        self._upstreams: dict = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def _upstream(self, url: str) -> _Upstream:
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            upstream = self._upstreams.get(host)
+            if upstream is None:
+                upstream = _Upstream(host, UPSTREAM_HOSTS.get(host, HTTP_POOL_MAXSIZE))
+                self._upstreams[host] = upstream
+            return upstream
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, data=None, **kwargs) -> requests.Response:
+        return self.request("POST", url, data=data, **kwargs)
+
+    def request(self, method: str, url: str, rate_wait: float = None, **kwargs) -> requests.Response:
+        """
+        Sends through the host's circuit breaker, rate limit and bulkhead. A
+        rate-limited host refuses once its next free slot is more than
+        BULKHEAD_WAIT_SECONDS away; a caller working through a queue of its
+        own passes a longer `rate_wait` to be paced instead.
+        """
+        upstream = self._upstream(url)
+        if not upstream.allow():
+            raise UpstreamUnavailable(f"{upstream.host}: circuit open")
+        endpoint = _endpoint(method, url, kwargs.get("params"))
+        hedge_after = upstream.percentile(0.95, endpoint) if method == "GET" and upstream.hedge and upstream.state == "closed" else None
+        if hedge_after is not None:
+            return self._hedged(upstream, url, kwargs, hedge_after, rate_wait)
+        return self._send(upstream, method, url, kwargs, BULKHEAD_WAIT_SECONDS, rate_wait)
+
+    def _send(self, upstream: _Upstream, method: str, url: str, kwargs: dict, wait: float,
+              rate_wait: float = None) -> requests.Response:
+        # Wait for the rate before taking a socket, so pacing never holds a bulkhead slot
+        if not upstream.reserve(wait if rate_wait is None else rate_wait):
+            upstream.release_probe()
+            raise UpstreamUnavailable(f"{upstream.host}: rate limit ({upstream.rate:g}/s) exceeded")
+        if not upstream.enter(wait):
+            upstream.release_probe()
+            raise UpstreamUnavailable(f"{upstream.host}: bulkhead full ({upstream.limit} in flight)")
+        endpoint = _endpoint(method, url, kwargs.get("params"))
+        requested = kwargs.get("timeout")
+        timeout = upstream.timeout_for(method, endpoint, requested)
+        started = time.monotonic()
+        try:
+            response = self._session.request(method, url, **{**kwargs, "timeout": timeout})
+        except requests.exceptions.Timeout:
+            upstream.count("timeouts")
+            if timeout != requested:
+                # Only our tightened deadline expired, not the caller's: the sample lets the
+                # window grow back, but a slow call is no sign the host is down
+                upstream.observe(endpoint, time.monotonic() - started)
+            else:
+                upstream.record_failure(endpoint, time.monotonic() - started)
+            raise
+        except requests.exceptions.RequestException:
+            upstream.record_failure()
+            raise
+        finally:
+            upstream.leave()
+        if response.status_code >= 500 or response.status_code == 429:
+            upstream.record_failure()
+        else:
+            upstream.record_success(endpoint, time.monotonic() - started)
+        return response
+
+    def _hedged(self, upstream: _Upstream, url: str, kwargs: dict, hedge_after: float,
+                rate_wait: float = None) -> requests.Response:
+        primary = _hedge_pool.submit(self._send, upstream, "GET", url, kwargs, BULKHEAD_WAIT_SECONDS, rate_wait)
+        try:
+            return primary.result(timeout=hedge_after)
+        except concurrent.futures.TimeoutError:
+            pass
+
+        # Past p95: send one duplicate if the bulkhead has a free slot right now
+        hedge = _hedge_pool.submit(self._send, upstream, "GET", url, kwargs, 0)
+        upstream.count("hedges")
+        error = None
+        for future in concurrent.futures.as_completed([primary, hedge]):
+            try:
+                response = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            other = hedge if future is primary else primary
+            other.add_done_callback(_close_response)
+            if future is hedge:
+                upstream.count("hedge_wins")
+            return response
+        raise error
+
+    def stats(self) -> dict:
+        with self._lock:
+            upstreams = dict(self._upstreams)
+        return {host: upstream.stats() for host, upstream in sorted(upstreams.items())}
+
+
+# Shared session used by every fetcher in pipeline.py. requests.Session is safe
+# to share across the worker threads for plain GET/POST calls; reusing it means
+# a cold /api/stream pays at most one TCP+TLS handshake per host instead of one
+# per call.
+session = ResilientSession(_mount_pools(requests.Session()))
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+
+from cancellation import CancelToken
+
+logger = logging.getLogger(__name__)
+
+
+class InflightRun:
+    """
+    One in-progress pipeline run that any number of requests can attach to.
+
+    Events are appended in the order they are produced and kept for the life
+    of the run, so a subscriber that joins late first replays everything
+    emitted so far and then follows the live tail.
+    All methods must be called on the event loop thread.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: list = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.task = None  # asyncio.Task driving the run (kept so it is not GC'd)
+        self.cancel_token = CancelToken()
+        self.subscribers = 0  # streams and waiters currently attached
+        self.on_abandoned = None  # called when the last subscriber leaves an unfinished run
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        # Wake everyone waiting on the current event, then arm a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, item: str):
+        """Appends one serialized event for all current and future subscribers."""
+        if self.done:
+            return
+        self.events.append(item)
+        self._notify()
+
+    def finish(self, result: dict = None, error: Exception = None):
+        """Marks the run complete. result is the payload written to the cache."""
+        if self.done:
+            return
+        self.result = result
+        self.error = error
+        self.done = True
+        self._notify()
+
+    def _attach(self):
+        self.subscribers += 1
+
+    def _detach(self):
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.done and self.on_abandoned is not None:
+            self.on_abandoned(self)
+
+    async def subscribe(self):
+        """Yields every event from the start of the run until it finishes."""
+        self._attach()
+        try:
+            index = 0
+            while True:
+                while index < len(self.events):
+                    yield self.events[index]
+                    index += 1
+                if self.done:
+                    return
+                await self._changed.wait()
+        finally:
+            # Also reached when the client disconnects and the generator is closed
+            self._detach()
+
+    async def wait(self) -> dict:
+        """Waits for the run to finish and returns its result (or raises its error)."""
+        self._attach()
+        try:
+            while not self.done:
+                await self._changed.wait()
+        finally:
+            self._detach()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class InflightRegistry:
+    """
+    Single-flight registry keyed by cache key.
+
+    The first caller for a key becomes the leader and starts the work; every
+    concurrent caller for the same key gets the same InflightRun back, so N
+    simultaneous cache misses cost one pipeline run and one LLM completion.
+    """
+
+    def __init__(self):
+        self._runs: dict = {}
+
+    def get(self, key: str):
+        return self._runs.get(key)
+
+    def __len__(self):
+        return len(self._runs)
+
+    def join_or_start(self, key: str, worker, abandon_after: float = None) -> tuple:
+        """
+        Returns (run, started). If no run is in flight for key, a new one is
+        registered and `worker(run)` (a coroutine function) is scheduled to drive it.
+
+        With `abandon_after`, a run whose last subscriber leaves is cancelled if
+        nobody re-attaches within that many seconds (a page reload rejoins it).
+        """
+        run = self._runs.get(key)
+        if run is not None:
+            logger.info("Joining in-flight run for %s", key)
+            return run, False
+
+        run = InflightRun(key)
+        self._runs[key] = run
+        if abandon_after is not None:
+            loop = asyncio.get_running_loop()
+            run.on_abandoned = lambda r: loop.call_later(abandon_after, self._abandon, key, r)
+
+        async def _drive():
+            try:
+                await worker(run)
+            except Exception as e:
+                logger.exception("In-flight run failed for %s", key)
+                run.finish(error=e)
+            finally:
+                # Ensure waiters are released even if the worker forgot to finish
+                run.finish()
+                if self._runs.get(key) is run:
+                    del self._runs[key]
+
+        run.task = asyncio.create_task(_drive())
+        return run, True
+
+    def _abandon(self, key: str, run: InflightRun):
+        if run.subscribers or run.done:
+            return  # someone re-attached, or the run finished meanwhile
+        logger.info("No subscribers left for %s; cancelling its run", key)
+        # Detach first so a request arriving now starts a fresh run instead of joining a dying one
+        if self._runs.get(key) is run:
+            del self._runs[key]
+        run.cancel_token.cancel()
@@ -0,0 +1,170 @@
+"""
+Incremental parser for the LLM's insight stream.
+
+The model is asked for one `{"Label": "insight"}` object per line. Instead of
+buffering a whole line and calling json.loads, InsightStreamParser walks the
+deltas character by character and reports each insight as it is written:
+
+    ("start", key, "")          the value string has opened
+    ("delta", key, fragment)    decoded characters of the value
+    ("end",   key, value)       the pair is complete; value is the full text
+    ("abort", key, "")          the line turned out malformed after "start"
+
+Anything that is not an object (markdown fences, stray prose, array brackets)
+is skipped up to the next newline, so one bad line never costs the rest.
+"""
+
+_WHITESPACE = " \t\r\n"
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+# Parser states
+_LINE_START = "line_start"      # between objects
+_BEFORE_KEY = "before_key"      # after "{" or ","
+_KEY = "key"                    # inside the key string
+_AFTER_KEY = "after_key"        # expecting ":"
+_BEFORE_VALUE = "before_value"  # expecting the opening quote of the value
+_VALUE = "value"                # inside the value string
+_AFTER_VALUE = "after_value"    # expecting "," or "}"
+_SKIP_LINE = "skip_line"        # discarding a malformed line
+
+
+class InsightStreamParser:
+    def __init__(self):
+        self.state = _LINE_START
+        self.key = ""
+        self.value = ""
+        self._escape = None       # None, "" (after a backslash) or the hex digits of a \u escape
+        self._high_surrogate = None
+
+    def feed(self, chunk: str) -> list:
+        """Consumes one delta and returns the events it completes, in order."""
+        events = []
+        fragment = []
+
+        def flush_fragment():
+            if fragment:
+                events.append(("delta", self.key, "".join(fragment)))
+                fragment.clear()
+
+        for ch in chunk:
+            state = self.state
+            if state == _VALUE:
+                decoded = self._string_char(ch)
+                if decoded is _CLOSE:
+                    flush_fragment()
+                    self.state = _AFTER_VALUE
+                elif decoded is _INVALID:
+                    flush_fragment()
+                    self._abort(events, ch)
+                elif decoded:
+                    fragment.append(decoded)
+                    self.value += decoded
+            elif state == _KEY:
+                decoded = self._string_char(ch)
+                if decoded is _CLOSE:
+                    self.state = _AFTER_KEY
+                elif decoded is _INVALID:
+                    self._abort(events, ch)
+                elif decoded:
+                    self.key += decoded
+            elif state == _SKIP_LINE:
+                if ch == "\n":
+                    self.state = _LINE_START
+            elif ch in _WHITESPACE:
+                continue
+            elif state == _LINE_START:
+                if ch == "{":
+                    self.state = _BEFORE_KEY
+                elif ch not in "[],":
+                    self.state = _SKIP_LINE
+            elif state == _BEFORE_KEY:
+                if ch == '"':
+                    self.key = ""
+                    self.state = _KEY
+                elif ch == "}":
+                    self.state = _LINE_START
+                else:
+                    self._abort(events, ch)
+            elif state == _AFTER_KEY:
+                if ch == ":":
+                    self.state = _BEFORE_VALUE
+                else:
+                    self._abort(events, ch)
+            elif state == _BEFORE_VALUE:
+                if ch == '"':
+                    self.value = ""
+                    self.state = _VALUE
+                    events.append(("start", self.key, ""))
+                else:
+                    self._abort(events, ch)
+            elif state == _AFTER_VALUE:
+                if ch in ",}":
+                    events.append(("end", self.key, self.value))
+                    self.state = _BEFORE_KEY if ch == "," else _LINE_START
+                else:
+                    self._abort(events, ch)
+        flush_fragment()
+        return events
+
+    def finish(self) -> list:
+        """Closes the stream: a complete value missing only its "}" still counts."""
+        events = []
+        if self.state == _AFTER_VALUE:
+            events.append(("end", self.key, self.value))
+        elif self.state == _VALUE:
+            events.append(("abort", self.key, ""))
+        self.state = _LINE_START
+        return events
+
+    def _abort(self, events: list, ch: str):
+        if self.state in (_VALUE, _AFTER_VALUE):
+            events.append(("abort", self.key, ""))
+        self._escape = None
+        self._high_surrogate = None
+        self.state = _LINE_START if ch == "\n" else _SKIP_LINE
+
+    def _string_char(self, ch: str):
+        """Decodes one character inside a JSON string: text, _CLOSE, _INVALID or "" (pending escape)."""
+        if self._escape is None:
+            if ch == '"':
+                return _CLOSE
+            if ch == "\\":
+                self._escape = ""
+                return ""
+            if ch == "\n":
+                return _INVALID  # raw newlines are not allowed in JSON strings
+            return self._with_surrogate(ch)
+
+        if self._escape == "" and ch != "u":
+            self._escape = None
+            if ch not in _ESCAPES:
+                return _INVALID
+            return self._with_surrogate(_ESCAPES[ch])
+
+        if ch == "u" and self._escape == "":
+            self._escape = "u"
+            return ""
+        if ch not in "0123456789abcdefABCDEF":
+            return _INVALID
+        self._escape += ch
+        if len(self._escape) < 5:
+            return ""
+        code = int(self._escape[1:], 16)
+        self._escape = None
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            combined = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+            return chr(combined)
+        return self._with_surrogate(chr(code))
+
+    def _with_surrogate(self, text: str) -> str:
+        # A lone high surrogate is dropped rather than emitted as an unencodable character
+        self._high_surrogate = None
+        return text
+
+
+_CLOSE = object()
+_INVALID = object()
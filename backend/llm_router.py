@@ -0,0 +1,373 @@
+"""
+Latency-aware routing between the Groq models.
+
+ModelRouter keeps an EWMA of time-to-first-token and tokens/sec per model and
+uses them to pick the model for each request under a latency SLO: the first
+model in preference order whose predicted completion time fits, else the
+fastest one. Streaming requests can be hedged: if the chosen model has not
+produced a token by the hedge deadline, the next model is started as well and
+whichever streams first wins; the loser's stream is closed.
+
+A model whose hedge answers first LLM_HEDGE_LOSS_LIMIT times in a row is
+demoted like one predicted over the SLO: a hedged-away attempt only yields a
+lower bound on its TTFT, which can look fast enough forever. A preferred model
+that lost on latency still goes first once every LLM_EXPLORE_AFTER_SECONDS,
+and a completed probe replaces its stale estimate, so one slow sample cannot
+bench it for good; the hedge bounds the probe's cost.
+
+The router only needs a `create(model)` callable returning an OpenAI-style
+chat completion (or stream), so it works against any OpenAI-compatible
+server; fake_llm_server.py serves per-model latency profiles for exercising
+it locally through GROQ_BASE_URL.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+import concurrent.futures
+
+logger = logging.getLogger(__name__)
+
+LLM_LATENCY_SLO_SECONDS = float(os.getenv("LLM_LATENCY_SLO_SECONDS", 8))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE", "1").strip().lower() not in ("0", "false", "no")
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", 2.5))  # upper bound on the hedge deadline
+LLM_HEDGE_TTFT_MULTIPLIER = 3.0     # hedge once the first token is this many typical TTFTs late
+LLM_RATE_LIMIT_COOLDOWN_SECONDS = float(os.getenv("LLM_RATE_LIMIT_COOLDOWN_SECONDS", 20))
+LLM_HEDGE_LOSS_LIMIT = int(os.getenv("LLM_HEDGE_LOSS_LIMIT", 2))  # hedges lost in a row before demotion
+LLM_EXPLORE_AFTER_SECONDS = float(os.getenv("LLM_EXPLORE_AFTER_SECONDS", 60))  # re-probe a passed-over preferred model
+EWMA_ALPHA = 0.2
+DEFAULT_OUTPUT_TOKENS = 350         # prediction before a model has any samples
+
+# Streams are consumed on their own threads so a hedge can race the primary
+_stream_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_STREAM_WORKERS", 16)), thread_name_prefix="llm-stream"
+)
+
+
+def is_rate_limit(error: Exception) -> bool:
+    message = str(error).lower()
+    return "rate_limit" in message or "429" in message
+
+
+class _ModelStats:
+    def __init__(self):
+        self.ttft = None            # EWMA seconds until the first token
+        self.tokens_per_second = None
+        self.output_tokens = None   # EWMA completion length
+        self.requests = 0
+        self.errors = 0
+        self.hedge_wins = 0
+        self.hedge_losses = 0               # consecutive times a hedge answered first instead
+        self.cooldown_until = 0.0
+        self.checked_at = time.monotonic()  # last measurement, or last exploration request
+        self.exploring = False              # the next completed sample replaces the EWMAs
+
+    @staticmethod
+    def _ewma(current, sample):
+        return sample if current is None else (1 - EWMA_ALPHA) * current + EWMA_ALPHA * sample
+
+    def observe(self, ttft: float, tokens: int, stream_seconds: float):
+        self.requests += 1
+        self.checked_at = time.monotonic()
+        self.hedge_losses = 0
+        if self.exploring:
+            # The estimate that got this model passed over is stale; re-seed it from the probe
+            self.exploring = False
+            self.ttft = self.tokens_per_second = None
+        self.ttft = self._ewma(self.ttft, ttft)
+        if tokens:
+            self.output_tokens = self._ewma(self.output_tokens, tokens)
+        if tokens and stream_seconds > 0:
+            self.tokens_per_second = self._ewma(self.tokens_per_second, tokens / stream_seconds)
+
+    def observe_slow_start(self, waited: float, hedged: bool = True):
+        """
+        An attempt cancelled before its first token: `waited` is a lower bound on
+        its TTFT. `hedged` is False for a hedge that lost the race, which only
+        started late and does not count as a loss.
+        """
+        self.ttft = self._ewma(self.ttft, waited)
+        if hedged:
+            self.hedge_losses += 1
+        self.checked_at = time.monotonic()
+        self.exploring = False  # still slow: keep blending into the old estimate
+
+    def predicted_seconds(self) -> float:
+        """Expected completion time; 0 until the model has been measured, so it gets tried."""
+        if self.ttft is None:
+            return 0.0
+        if self.tokens_per_second is None:
+            return self.ttft
+        return self.ttft + (self.output_tokens or DEFAULT_OUTPUT_TOKENS) / self.tokens_per_second
+
+    def snapshot(self) -> dict:
+        return {
+            "ttft_seconds": round(self.ttft, 3) if self.ttft is not None else None,
+            "tokens_per_second": round(self.tokens_per_second, 1) if self.tokens_per_second is not None else None,
+            "predicted_seconds": round(self.predicted_seconds(), 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedge_wins": self.hedge_wins,
+            "hedge_losses": self.hedge_losses,
+            "cooling_down": self.cooldown_until > time.monotonic(),
+        }
+
+
+class _Attempt:
+    """One in-flight streaming request to a single model."""
+
+    def __init__(self, model: str, hedge: bool = False):
+        self.model = model
+        self.hedge = hedge
+        self.started = time.monotonic()
+        self.first_token_at = None
+        self.tokens = 0
+        self.finished = False
+        self.cancelled = threading.Event()
+        self.response = None
+        self._lock = threading.Lock()
+
+    def attach(self, response):
+        with self._lock:
+            self.response = response
+            cancelled = self.cancelled.is_set()
+        if cancelled:
+            self.close()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled.set()
+        self.close()
+
+    def close(self):
+        response = self.response
+        if response is not None and hasattr(response, "close"):
+            try:
+                response.close()
+            except Exception:
+                pass  # the consumer thread may be mid-read; it stops at the next chunk
+
+
+class ModelRouter:
+    def __init__(self, models: list):
+        self.models = list(models)
+        self._stats = {model: _ModelStats() for model in self.models}
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.explorations = 0
+
+    # ── Model choice ──
+
+    def plan(self, slo_seconds: float = None) -> list:
+        """
+        Models in the order they should be tried. Without an SLO this is the
+        preference order minus rate-limited models; with one, the first model
+        predicted to finish within it, and not demoted for losing hedges, moves
+        to the front. A model preferred over it that has gone
+        LLM_EXPLORE_AFTER_SECONDS without being measured goes first instead,
+        and the probe's sample replaces its stale estimate.
+        """
+        now = time.monotonic()
+        with self._lock:
+            available = [m for m in self.models if self._stats[m].cooldown_until <= now] or list(self.models)
+            if slo_seconds is None:
+                return available
+            predicted = {m: self._stats[m].predicted_seconds() for m in available}
+            demoted = {m for m in available if self._stats[m].hedge_losses >= LLM_HEDGE_LOSS_LIMIT}
+            fitting = [m for m in available if predicted[m] <= slo_seconds and m not in demoted]
+            first = fitting[0] if fitting else min(available, key=lambda m: (m in demoted, predicted[m]))
+            for model in available[:available.index(first)]:
+                stats = self._stats[model]
+                if now - stats.checked_at >= LLM_EXPLORE_AFTER_SECONDS:
+                    stats.checked_at = now  # one probe per interval, even under concurrent plans
+                    stats.exploring = True
+                    self.explorations += 1
+                    logger.info("Exploring %s (predicted %.2fs) ahead of %s", model, predicted[model], first)
+                    first = model
+                    break
+        return [first] + [m for m in available if m != first]
+
+    def hedge_after(self, model: str):
+        """Seconds to wait for the first token before hedging, or None when hedging is off."""
+        if not LLM_HEDGE_ENABLED:
+            return None
+        ttft = self._stats[model].ttft
+        if ttft is None:
+            return LLM_HEDGE_AFTER_SECONDS
+        return min(LLM_HEDGE_AFTER_SECONDS, LLM_HEDGE_TTFT_MULTIPLIER * ttft)
+
+    # ── Bookkeeping ──
+
+    def record(self, model: str, ttft: float, tokens: int, stream_seconds: float):
+        with self._lock:
+            self._stats[model].observe(ttft, tokens, stream_seconds)
+
+    def record_failure(self, model: str, error: Exception):
+        with self._lock:
+            stats = self._stats[model]
+            stats.errors += 1
+            if is_rate_limit(error):
+                stats.cooldown_until = time.monotonic() + LLM_RATE_LIMIT_COOLDOWN_SECONDS
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "slo_seconds": LLM_LATENCY_SLO_SECONDS,
+                "hedging": LLM_HEDGE_ENABLED,
+                "hedges": self.hedges,
+                "explorations": self.explorations,
+                "models": {model: stats.snapshot() for model, stats in self._stats.items()},
+            }
+
+    # ── Requests ──
+
+    def complete(self, create, slo_seconds: float = None):
+        """
+        Runs a non-streaming completion, moving down the plan when a model errors.
+        Returns (response, model). Timing comes from the usage block Groq returns.
+        """
+        plan = self.plan(slo_seconds)
+        for i, model in enumerate(plan):
+            started = time.monotonic()
+            try:
+                response = create(model)
+            except Exception as e:
+                self.record_failure(model, e)
+                if i + 1 < len(plan):
+                    logger.warning("Model %s failed (%s), falling back to %s", model, e, plan[i + 1])
+                    continue
+                raise
+            elapsed = time.monotonic() - started
+            usage = getattr(response, "usage", None)
+            tokens = getattr(usage, "completion_tokens", 0) or 0
+            completion_time = getattr(usage, "completion_time", None) or elapsed
+            ttft = max(elapsed - completion_time, 0.0)
+            self.record(model, ttft, tokens, completion_time)
+            return response, model
+
+    def stream(self, create, slo_seconds: float = None, cancel=None):
+        """
+        Generator of content deltas from the first model to start streaming.
+
+        `create(model)` must return a streaming completion. An attempt that
+        fails before its first token hands over to the next model in the plan;
+        a failure after it is raised. Closing the generator, or firing the
+        `cancel` token, closes every attempt's stream.
+        """
+        plan = self.plan(slo_seconds)
+        pending = plan[1:]
+        events = queue.Queue()
+        attempts = []
+
+        def launch(model: str, hedge: bool = False) -> _Attempt:
+            attempt = _Attempt(model, hedge)
+            attempts.append(attempt)
+            _stream_pool.submit(self._consume, attempt, create, events)
+            return attempt
+
+        def others_live(attempt: _Attempt) -> bool:
+            return any(not a.finished and not a.cancelled.is_set() for a in attempts if a is not attempt)
+
+        unregister = None
+        if cancel is not None:
+            # Wake the loop below so it notices even while waiting for a first token
+            unregister = cancel.on_cancel(lambda: events.put((None, "cancelled", None)))
+
+        launch(plan[0])
+        hedge_delay = self.hedge_after(plan[0]) if pending else None
+        hedge_at = time.monotonic() + hedge_delay if hedge_delay is not None else None
+        winner = None
+        try:
+            while True:
+                timeout = None
+                if winner is None and hedge_at is not None:
+                    timeout = max(hedge_at - time.monotonic(), 0.0)
+                try:
+                    attempt, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_at = None
+                    with self._lock:
+                        self.hedges += 1
+                    logger.info("No first token from %s after %.2fs, hedging with %s", plan[0], hedge_delay, pending[0])
+                    launch(pending.pop(0), hedge=True)
+                    continue
+
+                if kind == "cancelled":
+                    cancel.raise_if_cancelled()
+
+                if attempt.cancelled.is_set() or (winner is not None and attempt is not winner):
+                    continue
+
+                if kind == "delta":
+                    if winner is None:
+                        winner = attempt
+                        for other in attempts:
+                            if other is not attempt:
+                                if other.first_token_at is None and not other.finished:
+                                    with self._lock:
+                                        self._stats[other.model].observe_slow_start(
+                                            time.monotonic() - other.started, hedged=not other.hedge
+                                        )
+                                other.cancel()
+                        if attempt.hedge:
+                            with self._lock:
+                                self._stats[attempt.model].hedge_wins += 1
+                        if attempt.model != plan[0]:
+                            logger.info("Streaming from %s instead of %s", attempt.model, plan[0])
+                    yield payload
+
+                elif kind == "done":
+                    if winner is None and others_live(attempt):
+                        continue  # an empty completion: the hedge may still have an answer
+                    if attempt.first_token_at is not None:
+                        self.record(
+                            attempt.model,
+                            attempt.first_token_at - attempt.started,
+                            attempt.tokens,
+                            time.monotonic() - attempt.first_token_at,
+                        )
+                    return
+
+                elif kind == "error":
+                    self.record_failure(attempt.model, payload)
+                    if attempt is winner:
+                        raise payload
+                    if others_live(attempt):
+                        continue  # the hedge (or the primary) is still racing
+                    if not pending:
+                        raise payload
+                    logger.warning("Model %s failed (%s), falling back to %s", attempt.model, payload, pending[0])
+                    hedge_at = None
+                    launch(pending.pop(0))
+        finally:
+            if unregister is not None:
+                unregister()
+            for attempt in attempts:
+                if not attempt.finished:
+                    attempt.cancel()
+
+    def _consume(self, attempt: _Attempt, create, events: queue.Queue):
+        """Pumps one stream into the shared queue; runs on the stream pool."""
+        try:
+            if attempt.cancelled.is_set():
+                return
+            attempt.attach(create(attempt.model))
+            for chunk in attempt.response:
+                if attempt.cancelled.is_set():
+                    return
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if attempt.first_token_at is None:
+                        attempt.first_token_at = time.monotonic()
+                    attempt.tokens += 1  # Groq sends roughly one token per chunk
+                    events.put((attempt, "delta", delta))
+            attempt.finished = True
+            events.put((attempt, "done", None))
+        except Exception as e:
+            attempt.finished = True
+            if not attempt.cancelled.is_set():
+                events.put((attempt, "error", e))
+        finally:
+            attempt.finished = True
+            attempt.close()
@@ -3,30 +3,62 @@ import json
 import time
 import asyncio
 import logging
+import threading
 import concurrent.futures
 from functools import lru_cache
 
+import requests
+
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
 from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 import uvicorn
-from cachetools import TTLCache
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
+import http_client
 from database import redis_client
+from cache import (
+    SizedTTLCache,
+    TieredCache,
+    SUMMARY_SOFT_TTL_SECONDS,
+    SUMMARY_HARD_TTL_SECONDS,
+    ALIAS_TTL_SECONDS,
+    alias_cache_key,
+    page_summary_key,
+    summary_entry,
+    has_insights,
+)
+from inflight import InflightRegistry
+from cancellation import PipelineCancelled
+from admission import AdmissionController, Overloaded
+from autocomplete_index import PrefixIndex
+from reverse_cache import ReverseCache, geohash, trim_hierarchy, DETAILS as REVERSE_DETAILS
 from pipeline import (
+    ner_engine,
+    model_router,
+    reverse_geocoder,
     run_pipeline,
+    get_best_wikipedia_title,
+    fetch_revision_ids,
+    context_fingerprint,
     search_wikipedia_candidates,
     search_onefivenine_candidates,
-    fetch_wikipedia_data,
-    fetch_onefivenine_data,
-    filter_geocultural_entities,
+    start_fetch,
+    collect_side,
+    assemble_result,
+    source_url_for,
+    extract_geocultural_sentences,
     summarize_with_groq_stream,
     get_location_hierarchy,
+    MODEL_CONTEXT_TOKENS,
+    MAX_COMPLETION_TOKENS,
+    PRIMARY_MODEL,
+    WIKI_BATCH_SIZE,
 )
 
 logger = logging.getLogger(__name__)
@@ -39,8 +71,30 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 # Module-level bounded thread pool for search parallelisation
 _search_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
 
-# TTL cache for autocomplete results (5-minute expiry, max 256 entries)
-_search_cache = TTLCache(maxsize=256, ttl=300)
+# Dedicated, bounded pool for pipeline runs so they never exhaust the default
+# executor that FastAPI's sync endpoints share
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", 8))
+_pipeline_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="pipeline")
+
+# A stream run whose last client disconnected is cancelled after this grace
+# period, unless a reload or another client re-attaches to it first
+STREAM_ABANDON_GRACE_SECONDS = float(os.getenv("STREAM_ABANDON_GRACE_SECONDS", 2.0))
+
+# Admission control for requests that start a pipeline run. Costs are in
+# "run units": one for the fetch + NER work, plus one per ADMISSION_TOKENS_PER_UNIT
+# LLM tokens. Cache hits and requests joining a run already in flight are free.
+ADMISSION_TOKENS_PER_UNIT = 2000
+RUN_COST = 1.0 + (MODEL_CONTEXT_TOKENS[PRIMARY_MODEL] + MAX_COMPLETION_TOKENS) / ADMISSION_TOKENS_PER_UNIT
+_admission = AdmissionController(
+    capacity=float(os.getenv("ADMISSION_CAPACITY", 2 * PIPELINE_WORKERS)),
+    per_client=float(os.getenv("ADMISSION_PER_CLIENT", 2 * RUN_COST)),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", 32)),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 10)),
+    max_loop_lag=float(os.getenv("ADMISSION_MAX_LOOP_LAG_MS", 250)) / 1000,
+)
+
+# TTL cache for autocomplete results (5-minute expiry, bounded by payload size)
+_search_cache = SizedTTLCache(max_bytes=int(os.getenv("SEARCH_CACHE_MAX_BYTES", 2_000_000)), ttl=300, name="search")
 
 _allowed_origins = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", "http://localhost:5173").split(",") if o.strip()]
 app.add_middleware(
@@ -51,6 +105,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Autocomplete sources, in the order their results are shown
+_SEARCH_SOURCES = {
+    "wikipedia": search_wikipedia_candidates,
+    "villages": search_onefivenine_candidates,
+}
+
+# Candidate "source" value produced by each autocomplete source
+_SEARCH_CANDIDATE_SOURCES = {"wikipedia": "wikipedia", "villages": "onefivenine"}
+
+# Local prefix index (memory-mapped, shared across workers); the network is only
+# queried when it holds fewer than this many matches for a source.
+_autocomplete_index = PrefixIndex()
+AUTOCOMPLETE_MIN_LOCAL_RESULTS = int(os.getenv("AUTOCOMPLETE_MIN_LOCAL_RESULTS", 3))
+
+# Per-source deadlines for /api/search/stream; a source that misses its deadline is dropped
+SEARCH_SOURCE_DEADLINES = {
+    "wikipedia": float(os.getenv("SEARCH_WIKIPEDIA_DEADLINE_S", 2.0)),
+    "villages": float(os.getenv("SEARCH_VILLAGES_DEADLINE_S", 4.0)),
+}
+
+
+def _search_cache_key(source: str, q: str) -> str:
+    return f"{source}:{q.strip().lower()}"
+
+
+def _search_source(source: str, q: str) -> list:
+    """Answers from the local prefix index when it has enough matches, otherwise asks the live source."""
+    local = _autocomplete_index.lookup(q, source=_SEARCH_CANDIDATE_SOURCES[source])
+    if len(local) >= AUTOCOMPLETE_MIN_LOCAL_RESULTS:
+        return local
+    results = _SEARCH_SOURCES[source](q)
+    _autocomplete_index.record(results)
+    return results
+
+
+def _submit_search(source: str, q: str) -> concurrent.futures.Future:
+    """Runs one source on the search pool and caches its results when it lands, even if nobody waits."""
+    future = _search_executor.submit(_search_source, source, q)
+
+    def _store(f):
+        if not f.cancelled() and f.exception() is None:
+            _search_cache[_search_cache_key(source, q)] = f.result()
+
+    future.add_done_callback(_store)
+    return future
+
+
 @app.get("/api/search")
 @limiter.limit("200/minute")
 def search_locations(request: Request, q: str, source: str = "all"):
@@ -58,34 +159,390 @@ def search_locations(request: Request, q: str, source: str = "all"):
     source=wikipedia  → only Wikipedia candidates (fast, ~200-400ms)
     source=villages   → only onefivenine village candidates
     source=all        → both combined, waits for the slower one (legacy behaviour)
+
+    Results are cached per source, so source=all is assembled from whichever
+    sources are already cached and only fetches the rest.
     """
     if not q:
         return []
     if len(q.strip()) > 300:
         raise HTTPException(status_code=400, detail="Query too long (max 300 characters)")
 
-    cache_key = f"{source}:{q.strip().lower()}"
-
-    if cache_key in _search_cache:
-        return _search_cache[cache_key]
+    sources = [source] if source in _SEARCH_SOURCES else list(_SEARCH_SOURCES)
 
     try:
-        if source == "wikipedia":
-            results = search_wikipedia_candidates(q)
-        elif source == "villages":
-            results = search_onefivenine_candidates(q)
-        else:
-            # Legacy combined mode — runs both in parallel, blocks until both done
-            wiki_future = _search_executor.submit(search_wikipedia_candidates, q)
-            ofn_future  = _search_executor.submit(search_onefivenine_candidates, q)
-            results = wiki_future.result() + ofn_future.result()
+        per_source = {}
+        pending = {}
+        for name in sources:
+            cached = _search_cache.get(_search_cache_key(name, q))
+            if cached is not None:
+                per_source[name] = cached
+            else:
+                pending[name] = _submit_search(name, q)
 
-        _search_cache[cache_key] = results
-        return results
+        for name, future in pending.items():
+            per_source[name] = future.result()
+
+        return [item for name in sources for item in per_source[name]]
     except Exception as e:
         logger.exception("Search failed for query: %s (source=%s)", q, source)
         raise HTTPException(status_code=500, detail="Search failed. Please try again.")
 
+
+@app.get("/api/search/stream")
+@limiter.limit("200/minute")
+async def search_locations_stream(request: Request, q: str):
+    """
+    Progressive variant of /api/search?source=all, streamed as NDJSON.
+
+    Each source is written as its own line the moment it completes, so fast
+    Wikipedia candidates are not held back by the onefivenine scrape:
+      {"source":"wikipedia","results":[...]}
+      {"source":"villages","results":[...]}
+    A source that misses its deadline is reported as {"source":...,"timeout":true}
+    and dropped from the response; it still fills the cache when it finishes.
+    """
+    if len(q.strip()) > 300:
+        raise HTTPException(status_code=400, detail="Query too long (max 300 characters)")
+
+    async def line_generator():
+        if not q.strip():
+            return
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = {}
+        for name in _SEARCH_SOURCES:
+            cached = _search_cache.get(_search_cache_key(name, q))
+            if cached is not None:
+                yield json.dumps({"source": name, "results": cached}) + "\n"
+            else:
+                tasks[asyncio.wrap_future(_submit_search(name, q))] = name
+
+        while tasks:
+            # Wake up at the earliest remaining deadline
+            next_deadline = min(SEARCH_SOURCE_DEADLINES[name] for name in tasks.values())
+            timeout = max(0.0, next_deadline - (loop.time() - started))
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                name = tasks.pop(task)
+                try:
+                    results = task.result()
+                except Exception:
+                    logger.exception("Search failed for query: %s (source=%s)", q, name)
+                    results = []
+                yield json.dumps({"source": name, "results": results}) + "\n"
+
+            elapsed = loop.time() - started
+            for task, name in list(tasks.items()):
+                if elapsed >= SEARCH_SOURCE_DEADLINES[name]:
+                    logger.info("Search source %s missed its deadline for %s", name, q)
+                    del tasks[task]
+                    yield json.dumps({"source": name, "timeout": True}) + "\n"
+
+    return StreamingResponse(
+        line_generator(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Summary cache: in-process L1 in front of Upstash, so hot locations skip the
+# HTTPS round-trip and the json.loads on every hit.
+_summary_cache = TieredCache(
+    redis_client,
+    SizedTTLCache(
+        max_bytes=int(os.getenv("SUMMARY_L1_MAX_BYTES", 32_000_000)),
+        ttl=SUMMARY_HARD_TTL_SECONDS,
+        name="summary",
+    ),
+)
+
+# Alias table: normalized query -> canonical Wikipedia title (+ QID). Summaries are
+# keyed by the canonical page, so "salem, tamil nadu" and "Salem, Tamil Nadu"
+# share one payload and a new alias costs one title lookup, not a pipeline run.
+_alias_cache = TieredCache(
+    redis_client,
+    SizedTTLCache(max_bytes=int(os.getenv("ALIAS_L1_MAX_BYTES", 2_000_000)), ttl=ALIAS_TTL_SECONDS, name="alias"),
+)
+
+# Single-flight registry shared by /api/stream and /api/summarize: concurrent
+# misses for the same canonical page attach to one pipeline run.
+_inflight = InflightRegistry()
+
+
+def _meta_event(location_name: str, source: str, source_url: str) -> dict:
+    return {"type": "meta", "location_name": location_name, "source": source, "source_url": source_url}
+
+
+def _images_event(image_url: str, image_urls: list) -> dict:
+    return {"type": "images", "image_url": image_url, "image_urls": image_urls or []}
+
+
+def _facts_event(quick_facts: dict) -> dict:
+    return {"type": "facts", "quick_facts": quick_facts or {}}
+
+
+def _result_events(result: dict, source: str) -> list:
+    """
+    Expands a finished (cached) result into the SSE event sequence the client
+    expects; a failed LLM step's {"error": ...} placeholder becomes insights_error.
+    """
+    events = [
+        json.dumps(_meta_event(result.get("location_name"), result.get("source", source), result.get("source_url", ""))),
+        json.dumps(_images_event(result.get("image_url"), result.get("image_urls"))),
+        json.dumps(_facts_event(result.get("quick_facts"))),
+    ]
+    insights = result.get("insights", {})
+    for key, value in insights.items():
+        if key != "error":
+            events.append(json.dumps({"type": "insight", "key": key, "value": value}))
+    if "error" in insights:
+        events.append(json.dumps({"type": "insights_error", "message": insights["error"]}))
+    return events
+
+
+def _fail_run(run, error: Exception, location_name: str):
+    """Publishes an SSE error event for subscribers and releases all waiters with the error."""
+    if isinstance(error, PipelineCancelled):
+        logger.info("Run for %s cancelled after its clients disconnected", location_name)
+        run.finish(error=error)
+        return
+    if isinstance(error, ValueError):
+        message = str(error)
+    else:
+        logger.exception("Pipeline failed for %s", location_name, exc_info=error)
+        message = "Failed to generate insights. Please try again."
+    run.publish(json.dumps({"type": "error", "message": message}))
+    run.finish(error=error)
+
+
+async def _resolve_target(location_name: str, source: str, path: str, exact_title: str = None) -> tuple:
+    """
+    Maps a request to (summary cache key, canonical title, qid).
+
+    onefivenine pages are keyed by path. Wikipedia queries go through the alias
+    table; on an alias miss the title is resolved once with get_best_wikipedia_title
+    and remembered. An exact_title (a disambiguation selection) is used as is;
+    _learn_alias maps the typed query to it once the page has been fetched.
+    Raises ValueError when no geographical article matches, and a 503 (or a 502
+    for a bad reply) when Wikipedia could not be searched.
+    """
+    if source == "onefivenine" and path:
+        return page_summary_key(source, path), None, None
+
+    if exact_title:
+        return page_summary_key(source, exact_title), exact_title, None
+
+    alias_key = alias_cache_key(source, location_name)
+
+    alias = await _alias_cache.get(alias_key)
+    if alias:
+        return page_summary_key(source, alias["title"]), alias["title"], alias.get("qid")
+
+    try:
+        title, qid = await run_in_threadpool(get_best_wikipedia_title, location_name)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        logger.warning("Title search unavailable for %s: %s", location_name, e)
+        raise HTTPException(status_code=503, detail="Wikipedia search is unavailable right now. Please retry shortly.", headers={"Retry-After": "5"})
+    except requests.exceptions.RequestException as e:
+        logger.warning("Title search failed for %s: %s", location_name, e)
+        raise HTTPException(status_code=502, detail="Wikipedia search returned an error. Please retry shortly.")
+    if not title:
+        raise ValueError(f"Could not identify a geographical location for: '{location_name}'. Please try being more specific.")
+    await _alias_cache.set(alias_key, {"title": title, "qid": qid}, ex=ALIAS_TTL_SECONDS)
+    logger.info("Alias learned: %s -> %s", location_name, title)
+    return page_summary_key(source, title), title, qid
+
+
+async def _learn_alias(source: str, query: str, title: str):
+    await _alias_cache.set(alias_cache_key(source, query), {"title": title, "qid": None}, ex=ALIAS_TTL_SECONDS)
+    logger.info("Alias learned from selection: %s -> %s", query, title)
+
+
+def _learn_alias_after(run, source: str, query: str, title: str):
+    """
+    Teaches the alias table a disambiguation pick (typed query -> chosen title),
+    but only once the run has fetched the page: a client-supplied title that does
+    not exist never re-points a shared alias.
+    """
+
+    def _learn(_task):
+        if run.error is None and run.result is not None:
+            asyncio.ensure_future(_learn_alias(source, query, title))
+
+    run.task.add_done_callback(_learn)
+
+
+async def _cache_result(cache_key: str, result: dict, location_name: str, revision: dict):
+    # A failed LLM step must not replace a good (possibly stale) entry for the hard TTL;
+    # leaving the key alone lets the next request retry
+    if not has_insights(result):
+        logger.warning("Not caching result without insights for %s", location_name)
+        return
+    await _summary_cache.set(cache_key, summary_entry(result, **revision), ex=SUMMARY_HARD_TTL_SECONDS)
+    logger.info("Cached result written for %s", location_name)
+
+
+async def _get_cached_summary(cache_key: str) -> tuple:
+    """Returns (entry, is_stale), or (None, False) on a miss. entry["result"] is the payload."""
+    entry = await _summary_cache.get(cache_key)
+    if not entry:
+        return None, False
+    if "stored_at" not in entry or "result" not in entry:
+        # Written before soft expiry existed; Redis expires it on the old 12h TTL
+        return {"result": entry}, False
+    is_stale = time.time() - entry["stored_at"] > SUMMARY_SOFT_TTL_SECONDS
+    return entry, is_stale
+
+
+# Stale entries revalidated around the same time share one prop=revisions query:
+# titles are collected for a short window, or until a full batch, then probed together.
+REVISION_PROBE_WINDOW_SECONDS = float(os.getenv("REVISION_PROBE_WINDOW_SECONDS", 0.5))
+
+
+class _RevisionProbes:
+    """Coalesces revision probes into batched fetch_revision_ids calls."""
+
+    def __init__(self, window: float, batch_size: int):
+        self.window = window
+        self.batch_size = batch_size
+        self._waiting: dict = {}  # title -> future resolved with its latest revid (None if unknown)
+        self._flush_handle = None
+        self._tasks = set()
+        self.batches = 0
+        self.titles = 0
+
+    async def revid(self, title: str):
+        loop = asyncio.get_running_loop()
+        future = self._waiting.get(title)
+        if future is None:
+            future = self._waiting[title] = loop.create_future()
+            if len(self._waiting) >= self.batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window, self._flush)
+        # One waiter giving up must not cancel the answer for the others
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._waiting = self._waiting, {}
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._probe(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _probe(self, batch: dict):
+        self.batches += 1
+        self.titles += len(batch)
+        try:
+            revids = await run_in_threadpool(fetch_revision_ids, list(batch))
+        except Exception as e:
+            logger.warning("Revision probe failed: %s", e)
+            revids = {}
+        for title, future in batch.items():
+            if not future.done():
+                future.set_result(revids.get(title))
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "titles": self.titles, "waiting": len(self._waiting)}
+
+
+_revision_probes = _RevisionProbes(REVISION_PROBE_WINDOW_SECONDS, WIKI_BATCH_SIZE)
+
+
+async def _revision_unchanged(title: str, previous: dict) -> bool:
+    """Batched prop=revisions probe: True when the article is still at the stored revid."""
+    if not title or not previous or not previous.get("revid"):
+        return False
+    return await _revision_probes.revid(title) == previous["revid"]
+
+
+def _start_summary_run(cache_key: str, location_name: str, source: str, path: str, exact_title: str = None, qid: str = None, previous: dict = None):
+    """
+    Joins or starts a blocking run_pipeline call for cache_key. With `previous`
+    (a stale entry) the article's revision is probed first: if unchanged only
+    the entry's TTL is extended, otherwise the pipeline reruns and skips the
+    LLM if the NER-positive sentences are the same.
+    """
+
+    if previous and not has_insights(previous.get("result")):
+        previous = None  # the stored LLM step failed: rerun it rather than renew the failure
+
+    async def worker(run):
+        try:
+            if await _revision_unchanged(exact_title, previous):
+                await _summary_cache.set(cache_key, {**previous, "stored_at": time.time()}, ex=SUMMARY_HARD_TTL_SECONDS)
+                logger.info("Revision unchanged for %s; extended cached summary", location_name)
+                result = previous["result"]
+                for event in _result_events(result, source):
+                    run.publish(event)
+                run.finish(result)
+                return
+            result, revision = await asyncio.get_running_loop().run_in_executor(
+                _pipeline_executor, run_pipeline, location_name, source, path, exact_title, qid, previous
+            )
+        except Exception as e:
+            _fail_run(run, e, location_name)
+            return
+        # Let any /api/stream subscribers on the same key see the result too
+        for event in _result_events(result, source):
+            run.publish(event)
+        await _cache_result(cache_key, result, location_name, revision)
+        run.finish(result)
+
+    return _inflight.join_or_start(cache_key, worker)
+
+
+async def _admit_run(request: Request, cache_key: str):
+    """
+    Charges a request that is about to start a pipeline run and returns its
+    admission ticket, or None when a run for the key is already in flight
+    (joining it costs nothing). Raises a 503 with Retry-After when shed.
+    """
+    if _inflight.get(cache_key) is not None:
+        return None
+    try:
+        return await _admission.acquire(get_remote_address(request), RUN_COST)
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="The server is busy generating other summaries. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+def _hold_ticket(ticket, run, started: bool):
+    """Keeps an admission ticket for the life of the run it paid for; a request that joined instead gives it back."""
+    if ticket is None:
+        return
+    if started:
+        run.task.add_done_callback(lambda _task: _admission.release(ticket))
+    else:
+        _admission.release(ticket)
+
+
+def _revalidate(cache_key: str, location_name: str, source: str, path: str, exact_title: str, qid: str, previous: dict):
+    """
+    Refreshes a stale entry in the background; the registry keeps it to one run
+    per key. Refreshes only use spare budget: when it is busy the stale entry is
+    served as is and a later hit tries again.
+    """
+    if _inflight.get(cache_key) is not None:
+        return
+    ticket = _admission.try_acquire("background", RUN_COST)
+    if ticket is None:
+        logger.info("Pipeline budget busy; deferring revalidation of %s", location_name)
+        return
+    run, started = _start_summary_run(cache_key, location_name, source, path, exact_title, qid, previous)
+    _hold_ticket(ticket, run, started)
+    if started:
+        logger.info("Revalidating stale summary for %s", location_name)
+
+
 @app.get("/api/summarize")
 @limiter.limit("100/minute")
 async def summarize_location(request: Request, location_name: str, source: str = "wikipedia", path: str = None):
@@ -94,234 +551,424 @@ async def summarize_location(request: Request, location_name: str, source: str =
     if len(location_name.strip()) > 300:
         raise HTTPException(status_code=400, detail="location_name too long (max 300 characters)")
 
-    normalized_key = location_name.strip().lower()
-    cache_key = f"summary:{source}:{normalized_key}"
+    try:
+        cache_key, title, qid = await _resolve_target(location_name, source, path)
+    except ValueError as ve:
+        raise HTTPException(status_code=404, detail=str(ve))
 
-    # 1. Check Upstash for the location_name
-    if redis_client:
-        try:
-            cached_result = await redis_client.get(cache_key)
-            if cached_result:
-                logger.info("Cache HIT for %s", location_name)
-                if isinstance(cached_result, str):
-                    cached_result = json.loads(cached_result)
-                return JSONResponse(
-                    content=cached_result,
-                    headers={"X-Pipeline-Duration-Ms": "0", "X-Cache": "HIT"}
-                )
-            else:
-                logger.debug("Cache MISS for %s", location_name)
-        except Exception as e:
-            logger.warning("Redis cache read error: %s", e)
-    else:
-        logger.debug("Skipping cache read: redis_client is None")
+    # 1. Check the in-process cache, then Upstash, for the canonical page
+    cached, is_stale = await _get_cached_summary(cache_key)
+    if cached:
+        logger.info("Cache %s for %s", "STALE" if is_stale else "HIT", location_name)
+        if is_stale:
+            _revalidate(cache_key, location_name, source, path, title, qid, cached)
+        return JSONResponse(
+            content=cached["result"],
+            headers={"X-Pipeline-Duration-Ms": "0", "X-Cache": "STALE" if is_stale else "HIT"}
+        )
+    logger.debug("Cache MISS for %s", location_name)
 
-    # 2. Run the extraction pipeline and measure duration
+    # 2. Run (or join) the extraction pipeline and measure duration, once admitted
     start = time.perf_counter()
+    ticket = await _admit_run(request, cache_key)
     try:
-        # Run synchronous AI pipeline in a background thread to prevent blocking
-        result = await run_in_threadpool(run_pipeline, location_name, source, path)
+        run, started = _start_summary_run(cache_key, location_name, source, path, title, qid)
+        _hold_ticket(ticket, run, started)
+        result = await run.wait()
         duration_ms = round((time.perf_counter() - start) * 1000)
-
-        # 3. Save the result to Upstash with a 12-hour TTL
-        if redis_client:
-            try:
-                await redis_client.set(cache_key, json.dumps(result), ex=43200)
-                logger.info("Cached result written for %s", location_name)
-            except Exception as e:
-                logger.warning("Redis cache write error: %s", e)
-        else:
-            logger.debug("Skipping cache write: redis_client is None")
+        if result is None:
+            raise RuntimeError("In-flight run finished without a result")
 
         return JSONResponse(
             content=result,
-            headers={"X-Pipeline-Duration-Ms": str(duration_ms), "X-Cache": "MISS"}
+            headers={"X-Pipeline-Duration-Ms": str(duration_ms), "X-Cache": "MISS" if started else "COALESCED"}
         )
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except Exception as e:
-        logger.exception("Pipeline failed for %s", location_name)
+        # Already logged by the run that failed
         raise HTTPException(status_code=500, detail="Failed to generate insights. Please try again later.")
 
 
+def _run_pipeline_stream(publish, cancel, location_name: str, source: str, path: str, exact_title: str, qid: str = None) -> dict:
+    """
+    Runs the pipeline in a worker thread, handing each SSE event to `publish`
+    as soon as it is ready. Returns (result, revision) for the cache.
+    Raises PipelineCancelled between steps, or mid-LLM stream, once `cancel` fires.
+    """
+    # The run may have been abandoned while it waited for a pipeline thread
+    cancel.raise_if_cancelled()
+
+    # Step 1: fetch the page text; image sizes and Wikidata facts keep running beside it
+    data, side = start_fetch(location_name, source, path, exact_title, qid, cancel=cancel)
+
+    # Step 2: emit meta IMMEDIATELY, then images and facts each as soon as they land
+    publish(json.dumps(_meta_event(data["title"], source, source_url_for(data["title"], source, path))))
+    emitted = set()
+    emit_lock = threading.Lock()
+
+    def emit_once(kind: str, event: dict):
+        with emit_lock:
+            if kind in emitted:
+                return
+            emitted.add(kind)
+            publish(json.dumps(event))
+
+    side["images"].add_done_callback(
+        lambda f: not f.cancelled() and f.exception() is None and emit_once("images", _images_event(*f.result()))
+    )
+    side["facts"].add_done_callback(
+        lambda f: not f.cancelled() and f.exception() is None and emit_once("facts", _facts_event(f.result()))
+    )
+
+    # Step 3: filter text with SpaCy NER (does not wait for images or facts)
+    cancel.raise_if_cancelled()
+    sentences = extract_geocultural_sentences(data)
+    cancel.raise_if_cancelled()
+
+    # Step 4: stream insights from Groq token by token, collecting them for cache
+    all_insights = {}
+    for kind, key, text in summarize_with_groq_stream(sentences, data["title"], cancel=cancel):
+        if kind == "start":
+            publish(json.dumps({"type": "insight_start", "key": key}))
+        elif kind == "delta":
+            publish(json.dumps({"type": "insight_delta", "key": key, "text": text}))
+        elif kind == "end":
+            all_insights[key] = text
+            publish(json.dumps({"type": "insight_end", "key": key, "value": text}))
+        elif kind == "error":
+            # The page itself is fine, so this is not a run failure; the "error"
+            # insight keeps the partial result out of the cache, as summarize_with_groq's does
+            all_insights["error"] = text
+            publish(json.dumps({"type": "insights_error", "message": text}))
+        elif key in all_insights:
+            # A malformed repeat of a finished key: put the finished value back
+            publish(json.dumps({"type": "insight_end", "key": key, "value": all_insights[key]}))
+        else:
+            publish(json.dumps({"type": "insight_abort", "key": key}))
+
+    # Step 5: the side fetches have normally landed long before the last insight.
+    # Future callbacks may still be running, so make sure both events precede the finish.
+    cancel.raise_if_cancelled()
+    collect_side(data, side)
+    emit_once("images", _images_event(data["image_url"], data["image_urls"]))
+    emit_once("facts", _facts_event(data["quick_facts"]))
+    result = assemble_result(data, all_insights, source, path)
+    return result, {"revid": data.get("revid"), "text_hash": context_fingerprint(sentences)}
+
+
+def _start_stream_run(cache_key: str, location_name: str, source: str, path: str, exact_title: str, qid: str = None):
+    """
+    Joins or starts a streaming pipeline run for cache_key. The run is cancelled
+    (fetches dropped, Groq stream closed) once every client has disconnected.
+    """
+
+    async def worker(run):
+        loop = asyncio.get_running_loop()
+
+        def publish(item: str):
+            loop.call_soon_threadsafe(run.publish, item)
+
+        try:
+            result, revision = await loop.run_in_executor(
+                _pipeline_executor, _run_pipeline_stream, publish, run.cancel_token,
+                location_name, source, path, exact_title, qid,
+            )
+        except Exception as e:
+            _fail_run(run, e, location_name)
+            return
+
+        # A run that finished is cached even if its clients left during the last step
+        await _cache_result(cache_key, result, location_name, revision)
+        run.finish(result)
+
+    return _inflight.join_or_start(cache_key, worker, abandon_after=STREAM_ABANDON_GRACE_SECONDS)
+
+
 @app.get("/api/stream")
 @limiter.limit("100/minute")
-async def stream_location(request: Request, location_name: str, source: str = "wikipedia", path: str = None, exact_title: str = None):
+async def stream_location(request: Request, location_name: str, source: str = "wikipedia", path: str = None, exact_title: str = None, query: str = None):
     """
     Server-Sent Events endpoint. Streams location insights progressively.
 
     Event sequence:
-      data: {"type":"meta","location_name":...,"image_url":...,"image_urls":[...],"source":...,"quick_facts":{...}}
-      data: {"type":"insight","key":"...","value":"..."}   (one per insight)
+      data: {"type":"meta","location_name":...,"source":...,"source_url":...}
+      data: {"type":"images","image_url":...,"image_urls":[...]}   (when the image fetch lands)
+      data: {"type":"facts","quick_facts":{...}}                   (when the Wikidata fetch lands)
+      data: {"type":"insight_start","key":"..."}                   (live runs: the value has opened)
+      data: {"type":"insight_delta","key":"...","text":"..."}      (value fragments as tokens arrive)
+      data: {"type":"insight_end","key":"...","value":"..."}       (the complete value)
+      data: {"type":"insight_abort","key":"..."}                   (the model's line was malformed)
+      data: {"type":"insight","key":"...","value":"..."}           (cache replays: one per insight)
+      data: {"type":"insights_error","message":"..."}               (the LLM failed; the page data stands)
       data: [DONE]
+    images, facts and insight events interleave in whatever order they complete.
+
+    With exact_title (a disambiguation pick), `query` is what the user typed;
+    once the page has been fetched, that query resolves to the pick for everyone.
     """
     if not location_name:
         raise HTTPException(status_code=400, detail="location_name is required")
-    if len(location_name.strip()) > 300:
+    if len(location_name.strip()) > 300 or (query and len(query.strip()) > 300):
         raise HTTPException(status_code=400, detail="location_name too long (max 300 characters)")
+    learn_alias = bool(exact_title and query and query.strip() and source == "wikipedia")
 
-    cache_key = f"summary:{source}:{location_name.strip().lower()}"
+    sse_headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Connection": "keep-alive"}
 
-    # --- Cache HIT: replay stored events immediately ---
-    if redis_client:
-        try:
-            cached = await redis_client.get(cache_key)
-            if cached:
-                logger.info("Stream cache HIT for %s", location_name)
-                if isinstance(cached, str):
-                    cached = json.loads(cached)
-
-                async def cached_generator():
-                    meta = {
-                        "type": "meta",
-                        "location_name": cached.get("location_name"),
-                        "image_url": cached.get("image_url"),
-                        "image_urls": cached.get("image_urls", []),
-                        "source": cached.get("source", source),
-                        "source_url": cached.get("source_url", ""),
-                        "quick_facts": cached.get("quick_facts", {}),
-                    }
-                    yield f"data: {json.dumps(meta)}\n\n"
-                    for key, value in cached.get("insights", {}).items():
-                        yield f"data: {json.dumps({'type': 'insight', 'key': key, 'value': value})}\n\n"
-                    yield "data: [DONE]\n\n"
-
-                return StreamingResponse(
-                    cached_generator(),
-                    media_type="text/event-stream",
-                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Connection": "keep-alive", "X-Cache": "HIT"},
-                )
-        except Exception as e:
-            logger.warning("Stream cache read error: %s", e)
+    try:
+        cache_key, title, qid = await _resolve_target(location_name, source, path, exact_title)
+    except ValueError as ve:
+        message = str(ve)
 
-    # --- Cache MISS: run pipeline and stream live ---
-    loop = asyncio.get_running_loop()
-    queue: asyncio.Queue = asyncio.Queue()
-    # Shared container so event_generator can write to Redis after streaming
-    collected: dict = {}
+        async def error_generator():
+            yield f"data: {json.dumps({'type': 'error', 'message': message})}\n\n"
+            yield "data: [DONE]\n\n"
 
-    def _run_pipeline_stream():
-        try:
-            # Step 1: fetch data (Wikipedia/Wikidata/images in parallel internally)
-            if source == "onefivenine" and path:
-                data = fetch_onefivenine_data(path)
-            else:
-                data = fetch_wikipedia_data(location_name, exact_title=exact_title)
+        return StreamingResponse(error_generator(), media_type="text/event-stream", headers=sse_headers)
 
-            # Step 2: emit meta event IMMEDIATELY — image and map are ready now.
-            # SpaCy NER (step 3) runs after this so the user sees content sooner.
-            if source == "onefivenine" and path:
-                src_url = f"https://www.onefivenine.com/india/villages/{path}"
-            else:
-                src_url = f"https://en.wikipedia.org/wiki/{data['title'].replace(' ', '_')}"
-
-            meta = {
-                "type": "meta",
-                "location_name": data["title"],
-                "image_url": data["image_url"],
-                "image_urls": data.get("image_urls", []),
-                "source": source,
-                "source_url": src_url,
-                "quick_facts": data.get("quick_facts", {}),
-            }
-            loop.call_soon_threadsafe(queue.put_nowait, json.dumps(meta))
-
-            # Step 3: filter text with SpaCy NER (runs while client is rendering the meta)
-            filtered_text = filter_geocultural_entities(data["text"])
-            if len(filtered_text) < 100:
-                filtered_text = filter_geocultural_entities(data["summary"])
-
-            # Step 4: stream insights from Groq, collecting them for cache
-            all_insights = {}
-            for line in summarize_with_groq_stream(filtered_text, data["title"]):
-                try:
-                    parsed = json.loads(line)
-                    for key, value in parsed.items():
-                        all_insights[key] = value
-                        event = json.dumps({"type": "insight", "key": key, "value": value})
-                        loop.call_soon_threadsafe(queue.put_nowait, event)
-                except json.JSONDecodeError:
-                    pass
-
-            # Store assembled result for Redis write after stream ends
-            collected["result"] = {
-                "location_name": data["title"],
-                "image_url": data["image_url"],
-                "image_urls": data.get("image_urls", []),
-                "insights": all_insights,
-                "source": source,
-                "source_url": src_url,
-                "quick_facts": data.get("quick_facts", {}),
-            }
-
-        except ValueError as ve:
-            error_event = json.dumps({"type": "error", "message": str(ve)})
-            loop.call_soon_threadsafe(queue.put_nowait, error_event)
-        except Exception as e:
-            logger.exception("Stream pipeline failed for %s", location_name)
-            error_event = json.dumps({"type": "error", "message": "Failed to generate insights. Please try again."})
-            loop.call_soon_threadsafe(queue.put_nowait, error_event)
-        finally:
-            loop.call_soon_threadsafe(queue.put_nowait, None)  # sentinel
+    # --- Cache HIT: replay stored events immediately ---
+    cached, is_stale = await _get_cached_summary(cache_key)
+    if cached:
+        logger.info("Stream cache %s for %s", "STALE" if is_stale else "HIT", location_name)
+        if is_stale:
+            _revalidate(cache_key, location_name, source, path, title, qid, cached)
+        if learn_alias:
+            await _learn_alias(source, query, exact_title)  # the cached summary proves the page exists
+
+        async def cached_generator():
+            for event in _result_events(cached["result"], source):
+                yield f"data: {event}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(
+            cached_generator(),
+            media_type="text/event-stream",
+            headers={**sse_headers, "X-Cache": "STALE" if is_stale else "HIT"},
+        )
+
+    # --- Cache MISS: run the pipeline (or join the run already in flight) and stream live ---
+    ticket = await _admit_run(request, cache_key)
+    run, started = _start_stream_run(cache_key, location_name, source, path, title, qid)
+    _hold_ticket(ticket, run, started)
+    if learn_alias:
+        _learn_alias_after(run, source, query, exact_title)
 
     async def event_generator():
-        loop.run_in_executor(None, _run_pipeline_stream)
-        while True:
-            item = await queue.get()
-            if item is None:
-                # Write to Redis BEFORE yielding [DONE].
-                # If we yield first, the client closes the connection immediately and
-                # FastAPI cancels this generator — the await below would never run.
-                if redis_client and "result" in collected:
-                    try:
-                        await redis_client.set(cache_key, json.dumps(collected["result"]), ex=43200)
-                        logger.info("Stream result cached for %s", location_name)
-                    except Exception as e:
-                        logger.warning("Stream cache write error: %s", e)
-                yield "data: [DONE]\n\n"
-                break
+        async for item in run.subscribe():
             yield f"data: {item}\n\n"
+        yield "data: [DONE]\n\n"
 
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive",
-        },
+        headers={**sse_headers, "X-Cache": "MISS" if started else "COALESCED"},
     )
 
 
+# Reverse-geocode cache: each admin level of a result is stored under a geohash
+# cell sized for it, in Redis, so all workers share village/state/country hits.
+# The L1 copy is short-lived so a cell another worker marks mixed stops being
+# answered from its coarse band within minutes.
+_nearby_cache = ReverseCache(TieredCache(
+    redis_client,
+    SizedTTLCache(
+        max_bytes=int(os.getenv("REVERSE_CACHE_MAX_BYTES", 4_000_000)),
+        ttl=int(os.getenv("REVERSE_L1_TTL_SECONDS", 300)),
+        name="reverse",
+    ),
+))
+
+def _check_detail(detail: str):
+    if detail not in REVERSE_DETAILS:
+        raise HTTPException(status_code=400, detail=f"detail must be one of: {', '.join(REVERSE_DETAILS)}")
 
-_nearby_cache = TTLCache(maxsize=512, ttl=600)
 
 @app.get("/api/reverse")
 @limiter.limit("300/minute")
-def reverse_geocode(request: Request, lat: float, lon: float):
+async def reverse_geocode(request: Request, lat: float, lon: float, detail: str = "place"):
     """
     Returns the administrative hierarchy (village → city → state → country)
-    for given coordinates using Nominatim reverse geocoding.
-    Used by the Explore map page. Works for any point on Earth.
+    for given coordinates, from the offline reverse index with Nominatim as
+    fallback. Used by the Explore map page. Works for any point on Earth.
+    A coarser `detail` (locality, district, state or country) returns only
+    the levels from there up, and is usually answered from the cache of any
+    earlier point in the same area.
     """
-    # Round to 3 decimal places (~110 m precision) for good cache reuse
-    cache_key = f"reverse:{round(lat, 3)}:{round(lon, 3)}"
-    if cache_key in _nearby_cache:
-        return _nearby_cache[cache_key]
+    _check_detail(detail)
+    cached, probe = await _nearby_cache.lookup(lat, lon, detail)
+    if cached is not None:
+        return cached
 
     try:
-        results = get_location_hierarchy(lat, lon)
-        _nearby_cache[cache_key] = results
-        return results
-    except Exception:
-        logger.exception("Reverse geocode failed for lat=%s lon=%s", lat, lon)
-        return []
+        results = trim_hierarchy(await run_in_threadpool(get_location_hierarchy, lat, lon, detail), detail)
+    except Exception as e:
+        # Upstream trouble is not "nothing here": answer with whatever coarser levels are cached, and cache nothing
+        logger.warning("Reverse geocode failed for lat=%s lon=%s: %s", lat, lon, e)
+        return _nearby_cache.partial(lat, lon, probe)
+    await _nearby_cache.store(lat, lon, results, probe, detail)
+    return results
+
+
+# Batch reverse geocoding. Misses resolve at most as many at a time as Nominatim
+# has sockets, shared by every batch, so a viewport never trips its bulkhead, and
+# queue for Nominatim's request rate until the batch's deadline; only misses still
+# waiting then come back marked unavailable. At 1 request/second a cold 8×8 grid
+# takes about a minute, so the default deadline labels roughly half of it and the
+# rest fills in as the map is panned back or the batch is retried.
+REVERSE_BATCH_MAX_POINTS = int(os.getenv("REVERSE_BATCH_MAX_POINTS", 256))
+REVERSE_BATCH_DEADLINE_SECONDS = float(os.getenv("REVERSE_BATCH_DEADLINE_SECONDS", 30))
+REVERSE_BATCH_CONCURRENCY = int(os.getenv(
+    "REVERSE_BATCH_CONCURRENCY", http_client.UPSTREAM_HOSTS["nominatim.openstreetmap.org"]
+))
+_reverse_batch_slots = asyncio.Semaphore(REVERSE_BATCH_CONCURRENCY)
+_reverse_resolving: set = set()  # keeps lookups alive after their batch is gone
+
+
+async def _resolve_reverse(lat: float, lon: float, probe: dict, detail: str, deadline: float):
+    """
+    Resolves and caches one point, queueing for Nominatim's rate until `deadline`
+    (monotonic), or returns None if the upstream failed or the rate had no slot
+    left in time; releases the caller's batch slot.
+    """
+    try:
+        rate_wait = max(deadline - time.monotonic(), 0)
+        results = trim_hierarchy(
+            await run_in_threadpool(get_location_hierarchy, lat, lon, detail, rate_wait), detail
+        )
+    except Exception as e:
+        logger.warning("Reverse geocode failed for lat=%s lon=%s: %s", lat, lon, e)
+        return None
+    finally:
+        _reverse_batch_slots.release()
+    await _nearby_cache.store(lat, lon, results, probe, detail)
+    return results
+
+
+class ReverseBatchRequest(BaseModel):
+    points: list[tuple[float, float]] = []   # [[lat, lon], ...]
+    bbox: tuple[float, float, float, float] = None  # [south, west, north, east]
+    grid: int = 8                            # bbox is sampled at grid × grid cell centres
+    detail: str = "place"                    # finest level wanted, as for /api/reverse
+
+
+def _batch_points(body: ReverseBatchRequest) -> list:
+    points = list(body.points)
+    if body.bbox is not None:
+        south, west, north, east = body.bbox
+        if west > east:
+            east += 360  # the box crosses the antimeridian
+        if body.grid < 1 or body.grid * body.grid > REVERSE_BATCH_MAX_POINTS:
+            raise HTTPException(status_code=400, detail="grid out of range")
+        for row in range(body.grid):
+            lat = south + (north - south) * (row + 0.5) / body.grid
+            for col in range(body.grid):
+                lon = west + (east - west) * (col + 0.5) / body.grid
+                points.append((round(lat, 6), round((lon + 180) % 360 - 180, 6)))
+    if not points:
+        raise HTTPException(status_code=400, detail="No points given")
+    if len(points) > REVERSE_BATCH_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Too many points (max {REVERSE_BATCH_MAX_POINTS})")
+    for lat, lon in points:
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise HTTPException(status_code=400, detail="Coordinates out of range")
+    return points
+
+
+@app.post("/api/reverse/batch")
+@limiter.limit("30/minute")
+async def reverse_geocode_batch(request: Request, body: ReverseBatchRequest):
+    """
+    Reverse-geocodes many points (or a bbox sampled on a grid), streamed as NDJSON.
+
+    Points are deduplicated by the reverse cache's finest cell (~1 km): one
+    representative per cell is looked up, all cells in one pipelined cache
+    read, and every point in the cell gets its answer. Cached cells are
+    written first, then misses as they resolve:
+      {"index":0,"lat":...,"lon":...,"results":[...],"cached":true}
+    index is the point's position in the request (points first, then the grid
+    in row-major order from the south-west). A point whose lookup hit an
+    upstream failure, or was still queued for Nominatim's rate limit when the
+    batch's deadline (REVERSE_BATCH_DEADLINE_SECONDS) passed, is sent with
+    "unavailable":true and whatever coarser levels the cache holds for it; it
+    is not cached, so retrying it later is cheap. With a coarse `detail` (say "state" for a
+    zoomed-out viewport) most points are answered from the cache outright.
+    """
+    _check_detail(body.detail)
+    points = _batch_points(body)
+    deadline = time.monotonic() + REVERSE_BATCH_DEADLINE_SECONDS
+    cells: dict = {}  # fine cell -> indices of the points that fall in it
+    for i, (lat, lon) in enumerate(points):
+        cells.setdefault(geohash(lat, lon), []).append(i)
+
+    def lines(indices: list, results, cached: bool, probe: dict = None):
+        extra = {}
+        if results is None:
+            extra = {"unavailable": True}
+            results = _nearby_cache.partial(*points[indices[0]], probe)
+        return "".join(
+            json.dumps({"index": i, "lat": points[i][0], "lon": points[i][1], "results": results, "cached": cached, **extra}) + "\n"
+            for i in indices
+        )
+
+    async def resolve(indices: list, probe: dict):
+        lat, lon = points[indices[0]]
+        try:
+            await asyncio.wait_for(_reverse_batch_slots.acquire(), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            return indices, probe, None  # still queued behind other misses at the deadline
+        # Once it holds a slot, a lookup runs to completion and fills the cache even if the client leaves
+        task = asyncio.ensure_future(_resolve_reverse(lat, lon, probe, body.detail, deadline))
+        _reverse_resolving.add(task)
+        task.add_done_callback(_reverse_resolving.discard)
+        return indices, probe, await asyncio.shield(task)
+
+    async def line_generator():
+        groups = list(cells.values())
+        looked_up = await _nearby_cache.lookup_many([points[indices[0]] for indices in groups], body.detail)
+        tasks = set()
+        try:
+            for indices, (cached, probe) in zip(groups, looked_up):
+                if cached is not None:
+                    yield lines(indices, cached, True)
+                else:
+                    tasks.add(asyncio.ensure_future(resolve(indices, probe)))
+            for next_done in asyncio.as_completed(tasks):
+                indices, probe, results = await next_done
+                yield lines(indices, results, False, probe)
+        finally:
+            # The client went away: misses still waiting for a slot are dropped
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        line_generator(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/api/health")
 def health_check():
     return {"status": "ok", "test": "active"}
 
+
+@app.get("/api/metrics")
+def metrics():
+    """Cache hit/miss counters per tier, plus load and upstream health, for sizing and alerting."""
+    return {
+        "summary_cache": _summary_cache.stats(),
+        "alias_cache": _alias_cache.stats(),
+        "search_cache": _search_cache.stats(),
+        "reverse_cache": _nearby_cache.stats(),
+        "reverse_index": reverse_geocoder.stats(),
+        "inflight_runs": len(_inflight),
+        "ner": ner_engine.stats(),
+        "llm_router": model_router.stats(),
+        "admission": _admission.stats(),
+        "revision_probes": _revision_probes.stats(),
+        "upstreams": http_client.session.stats(),
+    }
+
 # Paths for frontend
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FRONTEND_DIST_DIR = os.path.join(os.path.dirname(BASE_DIR), "frontend", "dist")
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import logging
+import threading
+import multiprocessing
+import concurrent.futures
+
+import spacy
+
+logger = logging.getLogger(__name__)
+
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", 16))
+NER_WORKERS = int(os.getenv("NER_WORKERS", 0))  # >0 runs NER in that many worker processes
+MAX_NER_CHARS = 5_000  # Truncate text before SpaCy NER to limit processing time
+
+TARGET_LABELS = {"GPE", "LOC", "FAC", "ORG", "NORP", "EVENT", "WORK_OF_ART"}
+
+# Content-addressed cache of NER output; set NER_CACHE_DIR to an empty string to disable
+NER_CACHE_DIR = os.getenv("NER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ner-cache"))
+NER_CACHE_TTL_SECONDS = int(os.getenv("NER_CACHE_TTL_SECONDS", 30 * 86400))
+NER_CACHE_MAX_BYTES = int(os.getenv("NER_CACHE_MAX_BYTES", 200_000_000))
+
+# Everything the full pipeline runs that entity filtering never reads. The
+# dependency parser is the expensive one; the statistical senter (or a rule
+# sentencizer) gives us sentence boundaries instead.
+_UNUSED_COMPONENTS = ["parser", "tagger", "lemmatizer", "attribute_ruler"]
+
+
+def load_lean_model(name: str = SPACY_MODEL):
+    """Loads only the components needed for sentence boundaries and entities."""
+    try:
+        nlp = spacy.load(name, exclude=_UNUSED_COMPONENTS)
+    except OSError:
+        from spacy import cli as spacy_cli
+        spacy_cli.download(name)
+        nlp = spacy.load(name, exclude=_UNUSED_COMPONENTS)
+
+    if "senter" in nlp.disabled:
+        nlp.enable_pipe("senter")
+    elif "senter" not in nlp.pipe_names:
+        nlp.add_pipe("sentencizer", first=True)
+    logger.info("SpaCy NER pipeline: %s", nlp.pipe_names)
+    return nlp
+
+
+class NerEngine:
+    """
+    Geo-cultural sentence filter over a lean SpaCy pipeline.
+
+    Accepts many texts at once and runs them through nlp.pipe, so bulk callers
+    (cache warming, batch refreshes) get batched throughput while single
+    requests pay for only tok2vec + senter + ner.
+    """
+
+    def __init__(self, nlp=None, batch_size: int = NER_BATCH_SIZE):
+        self.nlp = nlp if nlp is not None else load_lean_model()
+        self.batch_size = batch_size
+
+    def extract(self, texts: list) -> list:
+        """
+        Returns, per input text, the sentences that mention a target entity:
+        [{"text": ..., "labels": [...], "n_tokens": ...}, ...] in document order.
+        """
+        # Truncate long texts before NER to avoid multi-second SpaCy processing
+        truncated = (t[:MAX_NER_CHARS] for t in texts)
+        results = []
+        for doc in self.nlp.pipe(truncated, batch_size=self.batch_size):
+            sentences = []
+            for sent in doc.sents:
+                labels = [ent.label_ for ent in sent.ents if ent.label_ in TARGET_LABELS]
+                if labels:
+                    sentences.append({"text": sent.text.strip(), "labels": labels, "n_tokens": len(sent)})
+            results.append(sentences)
+        return results
+
+    def stats(self) -> dict:
+        return {"backend": "in-process", "batch_size": self.batch_size}
+
+
+# ── Process-pool backend ──────────────────────────────────────────────────────
+
+_worker_engine = None
+
+
+def _init_worker(model_name: str, batch_size: int):
+    """Runs once per worker process: load the model so every task reuses it."""
+    global _worker_engine
+    _worker_engine = NerEngine(load_lean_model(model_name), batch_size)
+
+
+def _worker_extract(texts: list) -> tuple:
+    started = time.perf_counter()
+    return _worker_engine.extract(texts), time.perf_counter() - started
+
+
+class ProcessPoolNer:
+    """
+    NER on a pool of worker processes, each holding its own copy of the model.
+
+    SpaCy inference holds the GIL, so concurrent cache misses on one uvicorn
+    process serialise when NER runs on threads. Here the calling thread only
+    waits on a future (GIL released) while the work runs on another core.
+    Same interface as NerEngine, plus queue-depth counters for pool sizing.
+    """
+
+    def __init__(self, workers: int, model_name: str = SPACY_MODEL, batch_size: int = NER_BATCH_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        # spawn, not fork: forking a process that already runs threads (uvicorn, executors) is unsafe
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, batch_size),
+        )
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self._total_seconds = 0.0
+        self._service_seconds = 0.0
+
+    def _submit(self, texts: list) -> concurrent.futures.Future:
+        submitted = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        future = self._pool.submit(_worker_extract, list(texts))
+        result = concurrent.futures.Future()
+
+        def _done(f):
+            with self._lock:
+                self.in_flight -= 1
+                if f.exception() is not None:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                    self._total_seconds += time.perf_counter() - submitted
+                    self._service_seconds += f.result()[1]
+            if f.exception() is not None:
+                result.set_exception(f.exception())
+            else:
+                result.set_result(f.result()[0])
+
+        future.add_done_callback(_done)
+        return result
+
+    def extract(self, texts: list) -> list:
+        return self._submit(texts).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = max(self.completed, 1)
+            avg_total = self._total_seconds / done
+            avg_service = self._service_seconds / done
+            return {
+                "backend": "process-pool",
+                "workers": self.workers,
+                "in_flight": self.in_flight,
+                "queue_depth": max(self.in_flight - self.workers, 0),
+                "max_in_flight": self.max_in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_queue_wait_ms": round((avg_total - avg_service) * 1000, 1),
+                "avg_service_ms": round(avg_service * 1000, 1),
+            }
+
+
+# ── Content-addressed result cache ────────────────────────────────────────────
+
+class NerResultCache:
+    """
+    On-disk cache of extracted sentences keyed by a hash of the (truncated) input text.
+
+    The same article text always yields the same sentences, so re-summaries
+    after an LLM-only expiry, query aliases that resolve to the same page and
+    warm-up jobs skip SpaCy entirely. Entries are zlib-compressed JSON, one
+    file per hash, shared by every worker on the host. Expiry is by file age;
+    when the directory outgrows its byte budget the oldest files go first.
+    """
+
+    _PRUNE_EVERY = 200  # writes between directory scans
+
+    def __init__(self, directory: str = NER_CACHE_DIR, ttl: int = NER_CACHE_TTL_SECONDS, max_bytes: int = NER_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str) -> str:
+        # Model and truncation settings are part of the key so changing either invalidates old entries
+        digest = hashlib.sha256(f"{SPACY_MODEL}|{MAX_NER_CHARS}|".encode("utf-8"))
+        digest.update(text[:MAX_NER_CHARS].encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def get(self, text: str):
+        path = self._path(self.key(text))
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "rb") as f:
+                sentences = json.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, zlib.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return sentences
+
+    def put(self, text: str, sentences: list):
+        path = self._path(self.key(text))
+        payload = zlib.compress(json.dumps(sentences, separators=(",", ":")).encode("utf-8"), 6)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("NER cache write failed: %s", e)
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self._PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Drops expired files, then the oldest ones until the directory fits max_bytes."""
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.ttl:
+                    _remove_quietly(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            _remove_quietly(path)
+            total -= size
+
+    def stats(self) -> dict:
+        return {"dir": self.directory, "hits": self.hits, "misses": self.misses}
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class CachedNer:
+    """Wraps an NER backend so only texts missing from the result cache are processed."""
+
+    def __init__(self, engine, cache: NerResultCache):
+        self.engine = engine
+        self.cache = cache
+
+    def extract(self, texts: list) -> list:
+        results = [self.cache.get(text) for text in texts]
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            for i, sentences in zip(missing, self.engine.extract([texts[i] for i in missing])):
+                results[i] = sentences
+                self.cache.put(texts[i], sentences)
+        return results
+
+    def stats(self) -> dict:
+        return {**self.engine.stats(), "result_cache": self.cache.stats()}
+
+
+def create_engine():
+    """
+    NerEngine in-process by default; ProcessPoolNer when NER_WORKERS > 0.
+    Either is fronted by the content-addressed result cache unless NER_CACHE_DIR is empty.
+    """
+    if NER_WORKERS > 0:
+        logger.info("Running SpaCy NER in %d worker processes", NER_WORKERS)
+        engine = ProcessPoolNer(NER_WORKERS)
+    else:
+        engine = NerEngine()
+    if NER_CACHE_DIR:
+        engine = CachedNer(engine, NerResultCache())
+    return engine
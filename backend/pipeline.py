@@ -1,43 +1,95 @@
 import os
 import re
 import json
+import hashlib
 import logging
 import concurrent.futures
 from typing import Dict
 
-import requests
-import wikipediaapi
-import spacy
 from groq import Groq
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
+import http_client
+from cache import SizedTTLCache, has_insights
+from ner import create_engine, MAX_NER_CHARS
+from context import build_context, context_length, CHARS_PER_TOKEN
+from insight_stream import InsightStreamParser
+from llm_router import ModelRouter, LLM_LATENCY_SLO_SECONDS
+from cancellation import PipelineCancelled
+from reverse_index import ReverseGeocoder
+
 load_dotenv(override=True)
 
 logger = logging.getLogger(__name__)
 
 # Constants
 USER_AGENT = "GCIES-App (contact@gcies.app)"
-MAX_NER_CHARS = 5_000  # Truncate text before SpaCy NER to limit processing time
 PRIMARY_MODEL = "llama-3.3-70b-versatile"
 FALLBACK_MODEL = "llama-3.1-8b-instant"
-
-# Initialize Wikipedia API
-wiki_wiki = wikipediaapi.Wikipedia(USER_AGENT, 'en')
-
-# Load SpaCy model
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    import spacy.cli
-    spacy.cli.download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+# Prompt context size per model, in estimated tokens. NER only ever sees
+# MAX_NER_CHARS of text (~1250 tokens), so the budgets are fractions of that:
+# the primary gets about what the old 30-sentence cap passed, leaving the
+# ranking something to drop; the 8B fallback runs under tighter rate limits,
+# so it gets a smaller, denser context.
+_NER_INPUT_TOKENS = MAX_NER_CHARS // CHARS_PER_TOKEN
+MODEL_CONTEXT_TOKENS = {
+    PRIMARY_MODEL: int(os.getenv("PRIMARY_CONTEXT_TOKENS", _NER_INPUT_TOKENS * 3 // 5)),
+    FALLBACK_MODEL: int(os.getenv("FALLBACK_CONTEXT_TOKENS", _NER_INPUT_TOKENS // 3)),
+}
+MAX_COMPLETION_TOKENS = 700
+WIKI_BATCH_SIZE = 50  # max titles/ids per MediaWiki and wbgetentities request
+WIKIDATA_SPARQL_URL = "https://query.wikidata.org/sparql"
+SPARQL_BATCH_SIZE = 200  # items per facts query; the body is POSTed so URL length is no limit
+
+# Quick facts read from Wikidata, in display order: fact name -> property
+FACT_PROPERTIES = {
+    "population": "P1082",
+    "area_km2": "P2046",
+    "country": "P17",
+    "coordinates": "P625",
+    "founded": "P571",
+}
+
+# Article extraction: "full" downloads the whole plain-text extract; "sections"
+# fetches the lead plus only the sections whose headings match the allowlist,
+# so NER and the LLM see History/Culture/Tourism instead of the first 5,000
+# characters of the article.
+WIKI_EXTRACT_MODE = os.getenv("WIKI_EXTRACT_MODE", "full").strip().lower()
+WIKI_SECTION_ALLOWLIST = [
+    heading.strip().lower()
+    for heading in os.getenv(
+        "WIKI_SECTION_ALLOWLIST",
+        "history,etymology,geography,climate,demographics,culture,religion,festivals,cuisine,"
+        "arts,architecture,heritage,tourism,landmarks,places of interest,attractions,economy",
+    ).split(",")
+    if heading.strip()
+]
+WIKI_SECTION_MAX_COUNT = int(os.getenv("WIKI_SECTION_MAX_COUNT", 6))
+
+# Shared pool for the fetches that run beside the main text path (image sizes,
+# Wikidata facts, the section index), so they outlive the call that started them.
+_side_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv("SIDE_FETCH_WORKERS", 16)), thread_name_prefix="side-fetch"
+)
+
+# Labels of referenced entities (mostly countries) barely change and repeat
+# across most lookups, so they are kept in process for a day.
+_label_cache = SizedTTLCache(max_bytes=256_000, ttl=86400, name="wikidata_labels")
+
+# Load the lean SpaCy NER pipeline (tok2vec + senter + ner only), in-process
+# or on a worker-process pool depending on NER_WORKERS
+ner_engine = create_engine()
 
 # Initialize Groq client
 _groq_api_key = os.getenv("GROQ_API_KEY", "").strip()
 if not _groq_api_key:
     raise RuntimeError("GROQ_API_KEY environment variable is not set. Please create backend/.env from .env.example.")
-groq_client = Groq(api_key=_groq_api_key)
+# GROQ_BASE_URL can point the client at any OpenAI-compatible server (e.g. a local fake)
+groq_client = Groq(api_key=_groq_api_key, base_url=os.getenv("GROQ_BASE_URL") or None)
+
+# Picks between the models by observed latency and hedges slow first tokens
+model_router = ModelRouter([PRIMARY_MODEL, FALLBACK_MODEL])
 
 def search_wikipedia_candidates(query: str) -> list:
     """
@@ -54,7 +106,7 @@ def search_wikipedia_candidates(query: str) -> list:
         "suburb", "borough", "township", "parish",
     ]
     try:
-        res = requests.get(url, params={
+        res = http_client.session.get(url, params={
             "action": "query",
             "generator": "search",
             "gsrsearch": query,
@@ -105,7 +157,7 @@ def search_onefivenine_candidates(query: str) -> list:
     url = "https://www.onefivenine.com/autoComplete.dont?method=completeVillages"
     headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        res = requests.post(url, data={"queryString": query}, headers=headers, timeout=5)
+        res = http_client.session.post(url, data={"queryString": query}, headers=headers, timeout=5)
         if res.status_code == 200 and res.text.strip():
             soup = BeautifulSoup(res.text, 'html.parser')
             results = []
@@ -135,7 +187,7 @@ def geocode_location(location_name: str) -> dict:
     url = "https://nominatim.openstreetmap.org/search"
     headers = {"User-Agent": USER_AGENT}
     try:
-        res = requests.get(
+        res = http_client.session.get(
             url,
             params={"q": location_name, "format": "json", "limit": 1},
             headers=headers,
@@ -154,7 +206,7 @@ def fetch_onefivenine_data(path: str) -> dict:
     headers = {"User-Agent": "Mozilla/5.0"}
 
     try:
-        res = requests.get(url, headers=headers, timeout=8)
+        res = http_client.session.get(url, headers=headers, timeout=8)
     except Exception as e:
         logger.warning("Error fetching OneFiveNine data: %s", e)
         raise ValueError(f"Could not load OneFiveNine page for path: {path}")
@@ -192,6 +244,7 @@ def fetch_onefivenine_data(path: str) -> dict:
         "image_url": None,
         "image_urls": [],
         "quick_facts": quick_facts,
+        "revid": None,
     }
 
 def get_best_wikipedia_title(query: str) -> tuple:
@@ -201,6 +254,8 @@ def get_best_wikipedia_title(query: str) -> tuple:
     Uses a single Wikipedia API call (generator=search with prop=coordinates|pageprops|extracts)
     instead of two sequential calls (opensearch → props). The QID is extracted here so the
     caller can skip the redundant QID lookup inside fetch_wikidata_facts.
+    Raises requests' exceptions when the search itself fails, so callers can tell
+    an outage from a query that matches no place.
     """
     url = "https://en.wikipedia.org/w/api.php"
 
@@ -210,31 +265,36 @@ def get_best_wikipedia_title(query: str) -> tuple:
     # comma-separated part before probing the page directly.
     if "," in query:
         title_cased = ", ".join(p.strip().title() for p in query.split(","))
-        for candidate_title in dict.fromkeys([title_cased, query.strip()]):  # try title-cased first, then raw
-            direct_page = wiki_wiki.page(candidate_title)
-            if direct_page.exists():
-                logger.debug("Direct title match for '%s' -> '%s'", query, direct_page.title)
-                return direct_page.title, None
+        candidate_titles = list(dict.fromkeys([title_cased, query.strip()]))  # try title-cased first, then raw
+        # Both spellings are probed in one query, which also yields the QID
+        resolved = resolve_wikipedia_titles(candidate_titles)
+        for candidate_title in candidate_titles:
+            direct_title, direct_qid = resolved.get(candidate_title, (None, None))
+            if direct_title:
+                logger.debug("Direct title match for '%s' -> '%s'", query, direct_title)
+                return direct_title, direct_qid
 
     parts = [p.strip() for p in query.split(",")]
     primary_query = parts[0]
     context_terms = [p.lower() for p in parts[1:] if p.strip()]
 
     headers = {"User-Agent": USER_AGENT}
-    try:
-        res = requests.get(url, params={
-            "action": "query",
-            "generator": "search",
-            "gsrsearch": primary_query,
-            "gsrlimit": 10,
-            "gsrnamespace": 0,
-            "prop": "coordinates|pageprops|extracts",
-            "exintro": 1,
-            "explaintext": 1,
-            "exchars": 500,
-            "format": "json",
-        }, headers=headers, timeout=8).json()
+    res = http_client.session.get(url, params={
+        "action": "query",
+        "generator": "search",
+        "gsrsearch": primary_query,
+        "gsrlimit": 10,
+        "gsrnamespace": 0,
+        "prop": "coordinates|pageprops|extracts",
+        "exintro": 1,
+        "explaintext": 1,
+        "exchars": 500,
+        "format": "json",
+    }, headers=headers, timeout=8)
+    res.raise_for_status()
+    res = res.json()
 
+    try:
         pages = res.get("query", {}).get("pages", {})
 
         best_candidate = None
@@ -299,56 +359,134 @@ def get_best_wikipedia_title(query: str) -> tuple:
 
     return None, None
 
-def fetch_wikidata_facts(wikipedia_title: str, qid: str = None) -> dict:
+def resolve_wikipedia_titles(titles: list) -> dict:
     """
-    Fetches structured facts (population, area, country, coordinates, founded) from Wikidata.
-    If qid is supplied (pre-fetched during title resolution) the Wikipedia QID lookup is skipped,
-    saving one HTTP round-trip.
+    Resolves many exact titles at once to {title: (canonical_title, qid)}.
+
+    Uses one prop=pageprops query per WIKI_BATCH_SIZE titles, following
+    normalisation and redirects. Titles without a page map to (None, None).
     """
     headers = {"User-Agent": USER_AGENT}
+    resolved = {}
+    for i in range(0, len(titles), WIKI_BATCH_SIZE):
+        chunk = titles[i:i + WIKI_BATCH_SIZE]
+        try:
+            res = http_client.session.get(
+                "https://en.wikipedia.org/w/api.php",
+                params={
+                    "action": "query",
+                    "titles": "|".join(chunk),
+                    "prop": "pageprops",
+                    "ppprop": "wikibase_item",
+                    "redirects": 1,
+                    "format": "json",
+                },
+                headers=headers,
+                timeout=8,
+            ).json()
+        except Exception as e:
+            logger.warning("Batch title resolution failed: %s", e)
+            continue
 
-    if not qid:
-        # QID not known yet — fetch it from Wikipedia pageprops
+        for title, page in _pages_by_input_title(res.get("query", {}), chunk).items():
+            if not page:
+                resolved[title] = (None, None)
+            else:
+                resolved[title] = (page["title"], page.get("pageprops", {}).get("wikibase_item"))
+    return resolved
+
+def fetch_revision_ids(titles: list) -> dict:
+    """
+    Returns {title: latest revid} for many titles, one prop=revisions query per
+    WIKI_BATCH_SIZE titles. Used to decide whether a stale summary needs a rerun.
+    Missing pages and failed batches map to None.
+    """
+    headers = {"User-Agent": USER_AGENT}
+    revids = {}
+    for i in range(0, len(titles), WIKI_BATCH_SIZE):
+        chunk = titles[i:i + WIKI_BATCH_SIZE]
         try:
-            res = requests.get(
+            res = http_client.session.get(
                 "https://en.wikipedia.org/w/api.php",
-                params={"action": "query", "prop": "pageprops", "titles": wikipedia_title, "format": "json"},
+                params={
+                    "action": "query",
+                    "titles": "|".join(chunk),
+                    "prop": "revisions",
+                    "rvprop": "ids",
+                    "redirects": 1,
+                    "format": "json",
+                },
                 headers=headers,
                 timeout=8,
             ).json()
-            pages = res.get("query", {}).get("pages", {})
-            for page_data in pages.values():
-                qid = page_data.get("pageprops", {}).get("wikibase_item")
+        except Exception as e:
+            logger.warning("Batch revision probe failed: %s", e)
+            revids.update((title, None) for title in chunk)
+            continue
+
+        for title, page in _pages_by_input_title(res.get("query", {}), chunk).items():
+            revisions = page.get("revisions") if page else None
+            revids[title] = revisions[0].get("revid") if revisions else None
+    return revids
+
+def _pages_by_input_title(query: dict, titles: list) -> dict:
+    """Maps each requested title to its page in a query response (None if missing), following normalisation and redirects."""
+    renames = {n["from"]: n["to"] for n in query.get("normalized", [])}
+    renames.update({r["from"]: r["to"] for r in query.get("redirects", [])})
+    pages_by_title = {p.get("title"): p for p in query.get("pages", {}).values()}
+
+    pages = {}
+    for title in titles:
+        target = title
+        for _ in range(3):
+            if target not in renames:
                 break
-            if not qid:
-                return {}
+            target = renames[target]
+        page = pages_by_title.get(target)
+        pages[title] = None if not page or "missing" in page else page
+    return pages
+
+def _preferred_or_first(claim_list):
+    """Return the claim with rank 'preferred', or the first one."""
+    if not claim_list:
+        return None
+    for c in claim_list:
+        if c.get("rank") == "preferred":
+            return c
+    return claim_list[0]
+
+def _fetch_entity_labels(qids: list) -> dict:
+    """Fetches English labels for many entities: cached ones first, the rest with batched wbgetentities calls."""
+    headers = {"User-Agent": USER_AGENT}
+    labels = {}
+    missing = []
+    for qid in qids:
+        label = _label_cache.get(qid)
+        if label:
+            labels[qid] = label
+        else:
+            missing.append(qid)
+
+    for i in range(0, len(missing), WIKI_BATCH_SIZE):
+        chunk = missing[i:i + WIKI_BATCH_SIZE]
+        try:
+            res = http_client.session.get(
+                "https://www.wikidata.org/w/api.php",
+                params={"action": "wbgetentities", "ids": "|".join(chunk), "props": "labels", "languages": "en", "format": "json"},
+                headers=headers,
+                timeout=5,
+            ).json()
+            for qid, entity in res.get("entities", {}).items():
+                label = entity.get("labels", {}).get("en", {}).get("value")
+                if label:
+                    labels[qid] = label
+                    _label_cache.set(qid, label)
         except Exception as e:
-            logger.warning("Wikidata QID lookup failed for %s: %s", wikipedia_title, e)
-            return {}
-
-    # Step 2: fetch entity data from Wikidata
-    try:
-        res = requests.get(
-            f"https://www.wikidata.org/wiki/Special:EntityData/{qid}.json",
-            headers=headers,
-            timeout=10,
-        ).json()
-        entities = res.get("entities", {})
-        entity = entities.get(qid, {})
-        claims = entity.get("claims", {})
-    except Exception as e:
-        logger.warning("Wikidata entity fetch failed for %s (%s): %s", wikipedia_title, qid, e)
-        return {}
-
-    def _preferred_or_first(claim_list):
-        """Return the claim with rank 'preferred', or the first one."""
-        if not claim_list:
-            return None
-        for c in claim_list:
-            if c.get("rank") == "preferred":
-                return c
-        return claim_list[0]
+            logger.warning("Wikidata label fetch failed for %s: %s", chunk, e)
+    return labels
 
+def _facts_from_claims(claims: dict, labels: dict) -> dict:
+    """Extracts quick facts from an entity's claims; `labels` maps referenced QIDs to names."""
     facts = {}
 
     # Population (P1082)
@@ -369,24 +507,13 @@ def fetch_wikidata_facts(wikipedia_title: str, qid: str = None) -> dict:
     except Exception:
         pass
 
-    # Country (P17) — resolve label from the same entity data blob if available
+    # Country (P17) — label resolved by the caller in one batched call
     try:
         claim = _preferred_or_first(claims.get("P17", []))
         if claim:
             country_qid = claim["mainsnak"]["datavalue"]["value"]["id"]
-            # Try to get the label from the already-fetched entity data
-            country_entity = entities.get(country_qid)
-            if country_entity:
-                facts["country"] = country_entity["labels"].get("en", {}).get("value")
-            else:
-                # Fallback: fetch just the label
-                label_res = requests.get(
-                    "https://www.wikidata.org/w/api.php",
-                    params={"action": "wbgetentities", "ids": country_qid, "props": "labels", "languages": "en", "format": "json"},
-                    headers=headers,
-                    timeout=5,
-                ).json()
-                facts["country"] = label_res["entities"][country_qid]["labels"].get("en", {}).get("value")
+            if labels.get(country_qid):
+                facts["country"] = labels[country_qid]
     except Exception:
         pass
 
@@ -416,217 +543,593 @@ def fetch_wikidata_facts(wikipedia_title: str, qid: str = None) -> dict:
 
     return facts
 
-def fetch_wikipedia_data(location_name: str, exact_title: str = None) -> dict:
-    """Fetches raw text, images, and Wikidata facts from Wikipedia/Wikidata in parallel.
+def _parse_fact(name: str, value: str):
+    """Converts one SPARQL result value into the quick-fact representation."""
+    if name == "population":
+        return int(float(value))
+    if name == "area_km2":
+        return round(float(value), 2)
+    if name == "country":
+        return value.rsplit("/", 1)[-1]  # entity IRI -> QID; the label is resolved afterwards
+    if name == "coordinates":
+        # WKT literal: Point(lon lat)
+        match = re.match(r"Point\(([-\d.eE]+) ([-\d.eE]+)\)", value)
+        return {"lat": float(match.group(2)), "lon": float(match.group(1))} if match else None
+    if name == "founded":
+        # 1853-01-01T00:00:00Z → "1853"
+        match = re.search(r"\+?(\d{1,4})-", value)
+        return match.group(1) if match else None
+    return None
+
+def _fetch_fact_values(qids: list) -> dict:
+    """
+    Reads only the FACT_PROPERTIES statements for many items with one SPARQL
+    query per SPARQL_BATCH_SIZE items, returning {qid: {fact: value}}.
 
-    If exact_title is supplied (e.g. from a disambiguation selection) title resolution
-    is skipped entirely, preventing the backend from picking a different article.
+    Deprecated statements are skipped; among the rest a preferred-rank statement
+    wins, then the latest point in time (P585), matching how the pages show a
+    current population. Raises on transport errors so the caller can fall back.
     """
-    if exact_title:
-        best_title = exact_title
-        qid = None  # will be resolved inside fetch_wikidata_facts
-    else:
-        best_title, qid = get_best_wikipedia_title(location_name)
+    headers = {"User-Agent": USER_AGENT, "Accept": "application/sparql-results+json"}
+    prop_rows = " ".join(f'("{name}" p:{pid} ps:{pid})' for name, pid in FACT_PROPERTIES.items())
+    best = {}  # (qid, fact) -> (sort key, raw value)
+    for i in range(0, len(qids), SPARQL_BATCH_SIZE):
+        chunk = qids[i:i + SPARQL_BATCH_SIZE]
+        query = f"""
+            SELECT ?item ?fact ?value ?rank ?when WHERE {{
+              VALUES ?item {{ {" ".join("wd:" + q for q in chunk)} }}
+              VALUES (?fact ?p ?ps) {{ {prop_rows} }}
+              ?item ?p ?statement .
+              ?statement ?ps ?value ; wikibase:rank ?rank .
+              FILTER(?rank != wikibase:DeprecatedRank)
+              OPTIONAL {{ ?statement pq:P585 ?when }}
+            }}"""
+        res = http_client.session.post(
+            WIKIDATA_SPARQL_URL, data={"query": query}, headers=headers, timeout=10
+        )
+        res.raise_for_status()
+        for row in res.json().get("results", {}).get("bindings", []):
+            qid = row["item"]["value"].rsplit("/", 1)[-1]
+            fact = row["fact"]["value"]
+            key = (row["rank"]["value"].endswith("PreferredRank"), row.get("when", {}).get("value", ""))
+            if (qid, fact) not in best or key > best[(qid, fact)][0]:
+                best[(qid, fact)] = (key, row["value"]["value"])
+
+    values = {}
+    for (qid, fact), (_, raw) in best.items():
+        try:
+            parsed = _parse_fact(fact, raw)
+        except (TypeError, ValueError):
+            continue
+        if parsed is not None:
+            values.setdefault(qid, {})[fact] = parsed
+    return values
+
+def fetch_wikidata_facts_batch(qids: list) -> dict:
+    """
+    Fetches quick facts for many entities at once, returning {qid: facts}.
 
-    if not best_title:
-        raise ValueError(f"Could not identify a geographical location for: '{location_name}'. Please try being more specific.")
+    Only the five fact properties are requested (SPARQL, many items per query)
+    and every referenced country label is resolved in one batched, cached call.
+    If the query service is unavailable the full wbgetentities claims are used.
+    """
+    try:
+        values = _fetch_fact_values(qids)
+    except Exception as e:
+        logger.warning("Wikidata SPARQL facts failed, falling back to wbgetentities: %s", e)
+        return _fetch_wikidata_facts_from_entities(qids)
 
+    country_qids = sorted({v["country"] for v in values.values() if "country" in v})
+    labels = _fetch_entity_labels(country_qids) if country_qids else {}
+
+    facts = {}
+    for qid in qids:
+        found = values.get(qid, {})
+        entry = {}
+        for name in FACT_PROPERTIES:
+            if name == "country":
+                if labels.get(found.get("country")):
+                    entry["country"] = labels[found["country"]]
+            elif name in found:
+                entry[name] = found[name]
+        facts[qid] = entry
+    return facts
+
+def _fetch_wikidata_facts_from_entities(qids: list) -> dict:
+    """
+    Fallback for fetch_wikidata_facts_batch: full claims from wbgetentities
+    (WIKI_BATCH_SIZE ids per call), with country labels in one batched call.
+    """
     headers = {"User-Agent": USER_AGENT}
+    claims_by_qid = {}
+    for i in range(0, len(qids), WIKI_BATCH_SIZE):
+        chunk = qids[i:i + WIKI_BATCH_SIZE]
+        try:
+            res = http_client.session.get(
+                "https://www.wikidata.org/w/api.php",
+                params={"action": "wbgetentities", "ids": "|".join(chunk), "props": "claims", "format": "json"},
+                headers=headers,
+                timeout=10,
+            ).json()
+            for qid, entity in res.get("entities", {}).items():
+                claims_by_qid[qid] = entity.get("claims", {})
+        except Exception as e:
+            logger.warning("Wikidata entity fetch failed for %s: %s", chunk, e)
 
-    def _fetch_page_text():
-        return wiki_wiki.page(best_title)
-
-    def _fetch_images():
-        """
-        Fetch up to 4 relevant location images for the page.
-
-        Strategy:
-          1. Wikipedia's curated 'pageimage' is always used as the primary (first) image —
-             it is the representative image chosen by Wikipedia editors for this article.
-          2. Supplemental images are filtered with three relevance signals:
-             a. Portrait orientation (height > width) is rejected — person photos are
-                almost always taller than wide, while place/landscape photos are wider.
-             b. Images whose filenames contain words from the location name are scored
-                higher and appear first.
-             c. A minimum size of 400×250 is required for visual quality in the carousel.
-        """
-        url = "https://en.wikipedia.org/w/api.php"
-        skip_keywords = [
-            "logo", "icon", "flag", "coat", "seal", "crest", "stamp", "signature",
-            "map", "locator", "relief", "blank", "arrow", "symbol", "diagram",
-            "pictogram", "button", "chart", "graph", "scheme", "outline", "silhouette",
-            "emblem", "badge", "placeholder", "default", "no_image", "noimage",
-        ]
+    country_qids = set()
+    for claims in claims_by_qid.values():
+        try:
+            claim = _preferred_or_first(claims.get("P17", []))
+            if claim:
+                country_qids.add(claim["mainsnak"]["datavalue"]["value"]["id"])
+        except Exception:
+            pass
+    labels = _fetch_entity_labels(sorted(country_qids)) if country_qids else {}
 
-        def _is_bad_image(fname: str, width: int = 0, height: int = 0) -> bool:
-            """Returns True if the image should be rejected."""
-            fname_lower = fname.lower()
-            # Reject SVGs — almost always icons/diagrams, not photos
-            if fname_lower.endswith(".svg"):
-                return True
-            if any(kw in fname_lower for kw in skip_keywords):
-                return True
-            # Reject portrait orientation
-            if width > 0 and height > 0 and height > width:
-                return True
-            # Reject tiny images
-            if width > 0 and height > 0 and (width < 400 or height < 250):
-                return True
-            return False
-
-        # Words from the title used to score filename relevance (e.g. "bhavani", "erode")
-        location_words = [
-            w for w in re.sub(r"[^a-z0-9 ]", "", best_title.lower()).split()
-            if len(w) > 3
-        ]
+    return {qid: _facts_from_claims(claims, labels) for qid, claims in claims_by_qid.items()}
 
-        # ── Step A: fetch primary pageimage + candidate filename list in one call ──
-        primary_url = None
-        primary_fname = None
-        candidate_fnames = []
+def fetch_wikidata_facts(wikipedia_title: str, qid: str = None) -> dict:
+    """
+    Fetches structured facts (population, area, country, coordinates, founded) from Wikidata.
+    If qid is supplied (pre-fetched during title resolution) the Wikipedia QID lookup is skipped,
+    saving one HTTP round-trip.
+    """
+    headers = {"User-Agent": USER_AGENT}
 
+    if not qid:
+        # QID not known yet — fetch it from Wikipedia pageprops
         try:
-            res_a = requests.get(url, params={
-                "action": "query",
-                "titles": best_title,
-                "prop": "pageimages|images",
-                "pithumbsize": 1200,
-                "imlimit": 30,
-                "format": "json",
-            }, headers=headers, timeout=8).json()
-
-            for page_data in res_a.get("query", {}).get("pages", {}).values():
-                # Wikipedia's curated representative image — filter it too
-                if "thumbnail" in page_data:
-                    pi_fname = "File:" + page_data.get("pageimage", "")
-                    thumb = page_data["thumbnail"]
-                    if not _is_bad_image(pi_fname, thumb.get("width", 0), thumb.get("height", 0)):
-                        primary_url = thumb["source"]
-                        primary_fname = pi_fname
-                    else:
-                        # Still track the fname so we skip it in candidates below
-                        primary_fname = pi_fname
-
-                # Collect other candidates, preserving page order
-                for img in page_data.get("images", []):
-                    fname = img.get("title", "")
-                    if fname == primary_fname:
-                        continue
-                    if _is_bad_image(fname):
-                        continue
-                    candidate_fnames.append(fname)
-
+            res = http_client.session.get(
+                "https://en.wikipedia.org/w/api.php",
+                params={"action": "query", "prop": "pageprops", "titles": wikipedia_title, "format": "json"},
+                headers=headers,
+                timeout=8,
+            ).json()
+            pages = res.get("query", {}).get("pages", {})
+            for page_data in pages.values():
+                qid = page_data.get("pageprops", {}).get("wikibase_item")
+                break
+            if not qid:
+                return {}
         except Exception as e:
-            logger.warning("Error fetching image list: %s", e)
+            logger.warning("Wikidata QID lookup failed for %s: %s", wikipedia_title, e)
+            return {}
 
-        if not candidate_fnames:
-            return (primary_url, [primary_url]) if primary_url else (None, [])
+    # Step 2: fetch the fact statements (and the country label) from Wikidata
+    return fetch_wikidata_facts_batch([qid]).get(qid, {})
 
-        # ── Step B: fetch size + URL for candidates ────────────────────────────────
-        try:
-            res_b = requests.get(url, params={
-                "action": "query",
-                "titles": "|".join(candidate_fnames[:20]),
-                "prop": "imageinfo",
-                "iiprop": "url|size",
-                "iiurlwidth": 1000,
-                "format": "json",
-            }, headers=headers, timeout=8).json()
-
-            # Build a lookup by title so we can iterate in original page order
-            info_by_title = {}
-            for page_data in res_b.get("query", {}).get("pages", {}).values():
-                info_list = page_data.get("imageinfo", [])
-                if info_list:
-                    info_by_title[page_data["title"]] = info_list[0]
-
-            scored = []
-            for fname in candidate_fnames:
-                info = info_by_title.get(fname)
-                if not info:
-                    continue
-                w = info.get("width", 0)
-                h = info.get("height", 0)
-                thumb = info.get("thumburl") or info.get("url")
-
-                if not thumb or _is_bad_image(fname, w, h):
-                    continue
-
-                # Score by location name match in filename
-                score = 0
-                fname_lower = fname.lower()
-                for word in location_words:
-                    if word in fname_lower:
-                        score += 40
-                if w > h * 1.6:
-                    score += 10  # extra-wide panorama bonus
-
-                scored.append((score, thumb))
-
-            # Sort highest relevance first, take top 3 supplemental images
-            scored.sort(key=lambda x: -x[0])
-            supplemental = [u for _, u in scored[:3]]
-
-            # Primary image first, then supplemental; deduplicate
-            seen: set = set()
-            final = []
-            for u in ([primary_url] if primary_url else []) + supplemental:
-                if u and u not in seen:
-                    seen.add(u)
-                    final.append(u)
-            final = final[:4]
-
-            if final:
-                return final[0], final
+def fetch_wikipedia_article(title: str, lead_only: bool = False) -> dict:
+    """
+    Fetches everything the pipeline reads from one article in a single MediaWiki
+    query: the plain-text extract, the page image, the image list, the QID,
+    coordinates and the current revision. Returns None if the page does not exist.
+    With lead_only the extract (and so "text") is just the intro.
+    """
+    params = {
+        "action": "query",
+        "titles": title,
+        "redirects": 1,
+        "prop": "extracts|pageimages|images|pageprops|coordinates|info",
+        "explaintext": 1,
+        "exsectionformat": "wiki",
+        "pithumbsize": 1200,
+        "imlimit": 30,
+        "ppprop": "wikibase_item",
+        "format": "json",
+    }
+    if lead_only:
+        params["exintro"] = 1
+    res = http_client.session.get(
+        "https://en.wikipedia.org/w/api.php", params=params, headers={"User-Agent": USER_AGENT}, timeout=10
+    ).json()
+
+    page = _pages_by_input_title(res.get("query", {}), [title])[title]
+    if not page:
+        return None
+
+    extract = page.get("extract", "")
+    # Section headings come back as "== History =="; the intro is everything before the first one
+    summary = re.split(r"\n+=+ [^\n]*? =+\n", extract, maxsplit=1)[0].strip()
+    text = re.sub(r"^(=+) (.+?) \1$", r"\2", extract, flags=re.MULTILINE).strip()
+    coords = (page.get("coordinates") or [{}])[0]
 
+    return {
+        "title": page["title"],
+        "text": text,
+        "summary": summary,
+        "qid": page.get("pageprops", {}).get("wikibase_item"),
+        "revid": page.get("lastrevid"),
+        "coordinates": {"lat": coords["lat"], "lon": coords["lon"]} if "lat" in coords else None,
+        "pageimage": page.get("pageimage"),
+        "thumbnail": page.get("thumbnail"),
+        "images": [img.get("title", "") for img in page.get("images", [])],
+    }
+
+def fetch_section_index(title: str) -> list:
+    """Returns the article's table of contents: [{"index", "line", "toclevel", ...}] from action=parse."""
+    res = http_client.session.get("https://en.wikipedia.org/w/api.php", params={
+        "action": "parse",
+        "page": title,
+        "prop": "sections",
+        "redirects": 1,
+        "format": "json",
+        "formatversion": 2,
+    }, headers={"User-Agent": USER_AGENT}, timeout=8).json()
+    return res.get("parse", {}).get("sections", [])
+
+def select_sections(sections: list) -> list:
+    """
+    Picks the sections whose heading matches WIKI_SECTION_ALLOWLIST, up to
+    WIKI_SECTION_MAX_COUNT. Subsections of a picked section are skipped, since
+    fetching a section already includes them.
+    """
+    chosen = []
+    covering_level = None
+    for section in sections:
+        level = int(section.get("toclevel", 1))
+        if covering_level is not None and level > covering_level:
+            continue
+        covering_level = None
+        heading = BeautifulSoup(section.get("line", ""), "html.parser").get_text().lower()
+        if any(allowed in heading for allowed in WIKI_SECTION_ALLOWLIST):
+            chosen.append(section)
+            covering_level = level
+            if len(chosen) >= WIKI_SECTION_MAX_COUNT:
+                break
+    return chosen
+
+def fetch_section_text(title: str, index: str) -> str:
+    """Fetches one section's rendered HTML and reduces it to its paragraph and list text."""
+    res = http_client.session.get("https://en.wikipedia.org/w/api.php", params={
+        "action": "parse",
+        "page": title,
+        "section": index,
+        "prop": "text",
+        "redirects": 1,
+        "disableeditsection": 1,
+        "disabletoc": 1,
+        "disablelimitreport": 1,
+        "format": "json",
+        "formatversion": 2,
+    }, headers={"User-Agent": USER_AGENT}, timeout=8).json()
+
+    soup = BeautifulSoup(res.get("parse", {}).get("text", ""), "html.parser")
+    # Citations, infoboxes, galleries and navigation carry no prose
+    for element in soup.select("sup, table, style, script, figure, .gallery, .hatnote, .navbox, .reflist, .thumb"):
+        element.decompose()
+    blocks = (el.get_text(" ", strip=True) for el in soup.find_all(["p", "li"]))
+    return "\n".join(block for block in blocks if block)
+
+def _trim_to_sentence(text: str, limit: int) -> str:
+    """Cuts text to at most `limit` characters, at the last sentence end if there is one."""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    end = cut.rfind(". ")
+    return cut[:end + 1] if end > limit // 2 else cut
+
+def fetch_targeted_text(title: str, lead: str, sections: list) -> str:
+    """
+    Builds the NER input from the lead plus the allowlisted sections. Each part
+    gets an equal share of MAX_NER_CHARS so later sections are not truncated
+    away. Returns None when no section matches, so the caller can use the full text.
+    """
+    chosen = select_sections(sections)
+    if not chosen:
+        return None
+
+    # Called from the pipeline thread, never from the side pool itself, so waiting here cannot deadlock it
+    futures = [_side_pool.submit(fetch_section_text, title, s["index"]) for s in chosen]
+    parts = []
+    for section, future in zip(chosen, futures):
+        try:
+            body = future.result()
         except Exception as e:
-            logger.warning("Error fetching image info: %s", e)
+            logger.warning("Section fetch failed for %s / %s: %s", title, section.get("line"), e)
+            continue
+        if body:
+            heading = BeautifulSoup(section.get("line", ""), "html.parser").get_text()
+            parts.append((heading, body))
+    if not parts:
+        return None
+
+    share = MAX_NER_CHARS // (len(parts) + 1)
+    text = [_trim_to_sentence(lead, share)]
+    text.extend(f"{heading}\n{_trim_to_sentence(body, share)}" for heading, body in parts)
+    logger.debug("Targeted extraction for %s: %s", title, [heading for heading, _ in parts])
+    return "\n\n".join(text)
+
+def fetch_article_images(article: dict) -> tuple:
+    """
+    Picks up to 4 relevant location images for an article from fetch_wikipedia_article,
+    returning (primary_url, urls). Costs one imageinfo query for the candidate sizes.
+
+    Strategy:
+      1. Wikipedia's curated 'pageimage' is always used as the primary (first) image —
+         it is the representative image chosen by Wikipedia editors for this article.
+      2. Supplemental images are filtered with three relevance signals:
+         a. Portrait orientation (height > width) is rejected — person photos are
+            almost always taller than wide, while place/landscape photos are wider.
+         b. Images whose filenames contain words from the location name are scored
+            higher and appear first.
+         c. A minimum size of 400×250 is required for visual quality in the carousel.
+    """
+    url = "https://en.wikipedia.org/w/api.php"
+    headers = {"User-Agent": USER_AGENT}
+    skip_keywords = [
+        "logo", "icon", "flag", "coat", "seal", "crest", "stamp", "signature",
+        "map", "locator", "relief", "blank", "arrow", "symbol", "diagram",
+        "pictogram", "button", "chart", "graph", "scheme", "outline", "silhouette",
+        "emblem", "badge", "placeholder", "default", "no_image", "noimage",
+    ]
 
+    def _is_bad_image(fname: str, width: int = 0, height: int = 0) -> bool:
+        """Returns True if the image should be rejected."""
+        fname_lower = fname.lower()
+        # Reject SVGs — almost always icons/diagrams, not photos
+        if fname_lower.endswith(".svg"):
+            return True
+        if any(kw in fname_lower for kw in skip_keywords):
+            return True
+        # Reject portrait orientation
+        if width > 0 and height > 0 and height > width:
+            return True
+        # Reject tiny images
+        if width > 0 and height > 0 and (width < 400 or height < 250):
+            return True
+        return False
+
+    # Words from the title used to score filename relevance (e.g. "bhavani", "erode")
+    location_words = [
+        w for w in re.sub(r"[^a-z0-9 ]", "", article["title"].lower()).split()
+        if len(w) > 3
+    ]
+
+    # ── Step A: primary pageimage + candidate filename list (from the article query) ──
+    primary_url = None
+    primary_fname = None
+    candidate_fnames = []
+
+    # Wikipedia's curated representative image — filter it too
+    if article["thumbnail"]:
+        pi_fname = "File:" + (article["pageimage"] or "")
+        thumb = article["thumbnail"]
+        if not _is_bad_image(pi_fname, thumb.get("width", 0), thumb.get("height", 0)):
+            primary_url = thumb["source"]
+            primary_fname = pi_fname
+        else:
+            # Still track the fname so we skip it in candidates below
+            primary_fname = pi_fname
+
+    # Collect other candidates, preserving page order
+    for fname in article["images"]:
+        if fname == primary_fname:
+            continue
+        if _is_bad_image(fname):
+            continue
+        candidate_fnames.append(fname)
+
+    if not candidate_fnames:
         return (primary_url, [primary_url]) if primary_url else (None, [])
 
-    # Fetch page text, images, and Wikidata facts in parallel
-    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-        page_future = executor.submit(_fetch_page_text)
-        image_future = executor.submit(_fetch_images)
-        facts_future = executor.submit(fetch_wikidata_facts, best_title, qid)
+    # ── Step B: fetch size + URL for candidates ────────────────────────────────
+    try:
+        res_b = http_client.session.get(url, params={
+            "action": "query",
+            "titles": "|".join(candidate_fnames[:20]),
+            "prop": "imageinfo",
+            "iiprop": "url|size",
+            "iiurlwidth": 1000,
+            "format": "json",
+        }, headers=headers, timeout=8).json()
+
+        # Build a lookup by title so we can iterate in original page order
+        info_by_title = {}
+        for page_data in res_b.get("query", {}).get("pages", {}).values():
+            info_list = page_data.get("imageinfo", [])
+            if info_list:
+                info_by_title[page_data["title"]] = info_list[0]
+
+        scored = []
+        for fname in candidate_fnames:
+            info = info_by_title.get(fname)
+            if not info:
+                continue
+            w = info.get("width", 0)
+            h = info.get("height", 0)
+            thumb = info.get("thumburl") or info.get("url")
 
-        page = page_future.result()
-        image_url, image_urls = image_future.result()
-        quick_facts = facts_future.result()
+            if not thumb or _is_bad_image(fname, w, h):
+                continue
 
-    if not page.exists():
-        raise ValueError(f"Could not find Wikipedia page for: '{location_name}' (Tried: '{best_title}')")
+            # Score by location name match in filename
+            score = 0
+            fname_lower = fname.lower()
+            for word in location_words:
+                if word in fname_lower:
+                    score += 40
+            if w > h * 1.6:
+                score += 10  # extra-wide panorama bonus
+
+            scored.append((score, thumb))
+
+        # Sort highest relevance first, take top 3 supplemental images
+        scored.sort(key=lambda x: -x[0])
+        supplemental = [u for _, u in scored[:3]]
+
+        # Primary image first, then supplemental; deduplicate
+        seen: set = set()
+        final = []
+        for u in ([primary_url] if primary_url else []) + supplemental:
+            if u and u not in seen:
+                seen.add(u)
+                final.append(u)
+        final = final[:4]
+
+        if final:
+            return final[0], final
 
-    return {
-        "text": page.text,
-        "summary": page.summary,
-        "title": page.title,
-        "image_url": image_url,
-        "image_urls": image_urls,
-        "quick_facts": quick_facts,
+    except Exception as e:
+        logger.warning("Error fetching image info: %s", e)
+
+    return (primary_url, [primary_url]) if primary_url else (None, [])
+
+
+def start_wikipedia_fetch(location_name: str, exact_title: str = None, qid: str = None, quick_facts: dict = None, cancel=None) -> tuple:
+    """
+    Fetches an article's text and starts its side fetches, returning (data, side).
+
+    `data` holds text, summary, title and revid as soon as the article query (and,
+    in WIKI_EXTRACT_MODE=sections, the allowlisted sections) has returned.
+    `side` maps "images" and "facts" to futures on the shared side-fetch pool,
+    so NER and the LLM can start while image sizes and Wikidata are in flight.
+    If exact_title is supplied (e.g. from a disambiguation selection) title resolution
+    is skipped entirely, preventing the backend from picking a different article.
+    Batch callers that already hold the QID or the facts can pass them to skip those lookups.
+    A `cancel` token drops side fetches that have not started yet once it fires.
+    """
+    if exact_title:
+        best_title = exact_title
+        # qid, if not supplied, comes from the article query's pageprops
+    else:
+        best_title, qid = get_best_wikipedia_title(location_name)
+
+    if not best_title:
+        raise ValueError(f"Could not identify a geographical location for: '{location_name}'. Please try being more specific.")
+
+    # A QID known up front (alias table, batch resolution) lets the facts start at once
+    targeted = WIKI_EXTRACT_MODE == "sections"
+    facts_future = None
+    if quick_facts is not None:
+        facts_future = _completed(quick_facts)
+    elif qid:
+        facts_future = _side_pool.submit(fetch_wikidata_facts, best_title, qid)
+    index_future = _side_pool.submit(fetch_section_index, best_title) if targeted else None
+
+    if cancel is not None:
+        cancel.on_cancel(lambda: [f.cancel() for f in (facts_future, index_future) if f is not None])
+
+    article = fetch_wikipedia_article(best_title, lead_only=targeted)
+    if article is None:
+        raise ValueError(f"Could not find Wikipedia page for: '{location_name}' (Tried: '{best_title}')")
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+
+    if facts_future is None:
+        facts_future = _side_pool.submit(fetch_wikidata_facts, article["title"], article["qid"]) if article["qid"] else _completed({})
+    side = {
+        "images": _side_pool.submit(fetch_article_images, article),
+        "facts": _then(facts_future, lambda facts: _with_coordinates(facts, article["coordinates"])),
+    }
+    if cancel is not None:
+        cancel.on_cancel(lambda: [f.cancel() for f in (side["images"], facts_future)])
+    if targeted:
+        article["text"] = _targeted_or_full_text(article, index_future)
+
+    data = {
+        "text": article["text"],
+        "summary": article["summary"],
+        "title": article["title"],
+        "revid": article["revid"],
     }
+    return data, side
 
-def filter_geocultural_entities(text: str) -> str:
-    """Filters sentences containing specific geographical or cultural entities."""
-    # Truncate long texts before NER to avoid multi-second SpaCy processing
-    truncated = text[:MAX_NER_CHARS] if len(text) > MAX_NER_CHARS else text
-    doc = nlp(truncated)
-    relevant_sentences = []
+def start_fetch(location_name: str, source: str = "wikipedia", path: str = None, exact_title: str = None, qid: str = None, cancel=None) -> tuple:
+    """start_wikipedia_fetch for either source; onefivenine pages have their side data up front."""
+    if source == "onefivenine" and path:
+        data = fetch_onefivenine_data(path)
+        side = {
+            "images": _completed((data.pop("image_url"), data.pop("image_urls"))),
+            "facts": _completed(data.pop("quick_facts")),
+        }
+        return data, side
+    return start_wikipedia_fetch(location_name, exact_title=exact_title, qid=qid, cancel=cancel)
+
+def collect_side(data: dict, side: dict) -> dict:
+    """Waits for the side fetches and merges them into `data` (the shape fetch_wikipedia_data returns)."""
+    try:
+        data["image_url"], data["image_urls"] = side["images"].result()
+    except Exception as e:
+        logger.warning("Image fetch failed for %s: %s", data["title"], e)
+        data["image_url"], data["image_urls"] = None, []
+    try:
+        data["quick_facts"] = side["facts"].result()
+    except Exception as e:
+        logger.warning("Facts fetch failed for %s: %s", data["title"], e)
+        data["quick_facts"] = {}
+    return data
 
-    target_labels = {"GPE", "LOC", "FAC", "ORG", "NORP", "EVENT", "WORK_OF_ART"}
+def fetch_wikipedia_data(location_name: str, exact_title: str = None, qid: str = None, quick_facts: dict = None) -> dict:
+    """Fetches raw text, images, and Wikidata facts for an article (blocking start_wikipedia_fetch)."""
+    data, side = start_wikipedia_fetch(location_name, exact_title=exact_title, qid=qid, quick_facts=quick_facts)
+    return collect_side(data, side)
 
-    for sent in doc.sents:
-        has_target = any(ent.label_ in target_labels for ent in sent.ents)
-        if has_target:
-            relevant_sentences.append(sent.text.strip())
+def _completed(value) -> concurrent.futures.Future:
+    future = concurrent.futures.Future()
+    future.set_result(value)
+    return future
 
-    # Limit to top 30 filtered sentences — sufficient for the LLM, faster than 40
-    return " ".join(relevant_sentences[:30])
+def _then(future: concurrent.futures.Future, fn) -> concurrent.futures.Future:
+    """A future for fn(future's result), resolved by callback so no pool thread blocks waiting."""
+    chained = concurrent.futures.Future()
+
+    def _done(f):
+        try:
+            chained.set_result(fn(f.result()))
+        except Exception as e:
+            chained.set_exception(e)
 
-def summarize_with_groq(text: str, location_name: str) -> Dict[str, str]:
+    future.add_done_callback(_done)
+    return chained
+
+def _with_coordinates(facts: dict, coordinates: dict) -> dict:
+    """The article's own primary coordinates cover items without a Wikidata P625."""
+    quick_facts = dict(facts or {})
+    if "coordinates" not in quick_facts and coordinates:
+        quick_facts["coordinates"] = coordinates
+    return quick_facts
+
+def _targeted_or_full_text(article: dict, index_future) -> str:
+    """Section-targeted text for a lead-only article, falling back to the full extract."""
+    try:
+        text = fetch_targeted_text(article["title"], article["summary"], index_future.result())
+    except Exception as e:
+        logger.warning("Section-targeted extraction failed for %s: %s", article["title"], e)
+        text = None
+    if text:
+        return text
+    full = fetch_wikipedia_article(article["title"])
+    return full["text"] if full else article["text"]
+
+def context_fingerprint(sentences: list) -> str:
+    """Hash of the NER-positive sentences; when it is unchanged the stored insights are still valid."""
+    return hashlib.sha256("\n".join(s["text"] for s in sentences).encode("utf-8")).hexdigest()
+
+def extract_geocultural_sentences(data: dict) -> list:
+    """
+    Sentences of the page text that mention a geographical or cultural entity,
+    with their labels. Falls back to the page summary when the text yields too little.
+    """
+    sentences = ner_engine.extract([data["text"]])[0]
+    if context_length(sentences) < 100:
+        sentences = ner_engine.extract([data["summary"]])[0]
+    return sentences
+
+def extract_geocultural_sentences_many(pages: list) -> list:
+    """Batched extract_geocultural_sentences via nlp.pipe, for bulk callers."""
+    extracted = ner_engine.extract([data["text"] for data in pages])
+    short = [i for i, sentences in enumerate(extracted) if context_length(sentences) < 100]
+    if short:
+        for i, sentences in zip(short, ner_engine.extract([pages[i]["summary"] for i in short])):
+            extracted[i] = sentences
+    return extracted
+
+def summarize_with_groq(sentences: list, location_name: str) -> Dict[str, str]:
     """Uses Groq's Llama 3 70B to generate exactly 6-7 key insights."""
 
-    prompt = f"""
+    def prompt_for(model: str) -> str:
+        text = build_context(sentences, MODEL_CONTEXT_TOKENS[model])
+        return f"""
 You are an expert geographer and historian. I will provide you with filtered text about {location_name}.
 Extract the 6 to 7 most "famous things" (landmarks, culture, history) about {location_name} from the text.
 Format your output ONLY as a JSON object with 6 to 7 string key-value pairs.
@@ -637,45 +1140,46 @@ Do NOT wrap the JSON in markdown blocks, just return the raw JSON.
 Text:
 {text}
 """
-    models = [PRIMARY_MODEL, FALLBACK_MODEL]
+    def create(model: str):
+        return groq_client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt_for(model),
+                }
+            ],
+            model=model,
+            temperature=0.3,
+            max_completion_tokens=MAX_COMPLETION_TOKENS,
+            response_format={"type": "json_object"},
+            timeout=30,
+        )
 
-    for model in models:
-        try:
-            response = groq_client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model=model,
-                temperature=0.3,
-                max_completion_tokens=700,
-                response_format={"type": "json_object"},
-                timeout=30,
-            )
-            content = response.choices[0].message.content
-            insights = json.loads(content)
-            if model == FALLBACK_MODEL:
-                logger.info("Used fallback model %s successfully", FALLBACK_MODEL)
-            return insights
-        except Exception as e:
-            error_msg = str(e).lower()
-            is_rate_limit = "rate_limit" in error_msg or "429" in error_msg
-            if is_rate_limit and model == PRIMARY_MODEL:
-                logger.warning("Primary model %s rate-limited, falling back to %s", PRIMARY_MODEL, FALLBACK_MODEL)
-                continue
-            logger.exception("Groq API Error with model %s", model)
-            return {
-                "error": "Failed to generate insights. Please check if your Groq API key is valid.",
-            }
+    try:
+        # No latency SLO here: callers of the blocking path (refreshes, warming) want the best model
+        response, model = model_router.complete(create)
+        insights = json.loads(response.choices[0].message.content)
+        if model == FALLBACK_MODEL:
+            logger.info("Used fallback model %s successfully", FALLBACK_MODEL)
+        return insights
+    except Exception:
+        logger.exception("Groq API Error")
+        return {
+            "error": "Failed to generate insights. Please check if your Groq API key is valid.",
+        }
 
-def summarize_with_groq_stream(text: str, location_name: str):
+def summarize_with_groq_stream(sentences: list, location_name: str, cancel=None):
     """
-    Generator that streams insights one-by-one as NDJSON lines.
-    Each yielded value is a raw JSON string like: '{"Historical Significance": "..."}'
+    Generator that streams insights as the model writes them.
+    Yields InsightStreamParser events: ("start", key, ""), ("delta", key, fragment),
+    ("end", key, value) and ("abort", key, "") for a line that turned out malformed.
+    If every model fails, the last event is ("error", None, message).
+    Raises PipelineCancelled (after closing the Groq stream) when `cancel` fires.
     """
-    prompt = f"""You are an expert geographer and historian. I will provide you with filtered text about {location_name}.
+
+    def prompt_for(model: str) -> str:
+        text = build_context(sentences, MODEL_CONTEXT_TOKENS[model])
+        return f"""You are an expert geographer and historian. I will provide you with filtered text about {location_name}.
 Extract the 6 to 7 most "famous things" (landmarks, culture, history) about {location_name} from the text.
 
 Output each insight on its own line as a JSON object with exactly ONE key-value pair.
@@ -685,97 +1189,114 @@ Output 6 to 7 lines total. No other text, no markdown, no wrapper array — just
 Text:
 {text}
 """
-    models = [PRIMARY_MODEL, FALLBACK_MODEL]
+    def create(model: str):
+        return groq_client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt_for(model)}],
+            model=model,
+            temperature=0.3,
+            max_completion_tokens=MAX_COMPLETION_TOKENS,
+            stream=True,
+            timeout=30,
+        )
 
-    for model in models:
-        try:
-            stream = groq_client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model=model,
-                temperature=0.3,
-                max_completion_tokens=700,
-                stream=True,
-                timeout=30,
-            )
-            buffer = ""
-            for chunk in stream:
-                delta = chunk.choices[0].delta.content or ""
-                buffer += delta
-                # Yield each complete line that parses as valid JSON
-                while "\n" in buffer:
-                    line, buffer = buffer.split("\n", 1)
-                    line = line.strip()
-                    if line:
-                        try:
-                            json.loads(line)  # validate
-                            yield line
-                        except json.JSONDecodeError:
-                            pass  # partial or non-JSON line, skip
-            # Flush remaining buffer
-            remainder = buffer.strip()
-            if remainder:
-                try:
-                    json.loads(remainder)
-                    yield remainder
-                except json.JSONDecodeError:
-                    pass
-            return  # success — don't try fallback
-        except Exception as e:
-            error_msg = str(e).lower()
-            is_rate_limit = "rate_limit" in error_msg or "429" in error_msg
-            if is_rate_limit and model == PRIMARY_MODEL:
-                logger.warning("Primary model %s rate-limited, falling back to %s", PRIMARY_MODEL, FALLBACK_MODEL)
-                continue
-            logger.exception("Groq streaming error with model %s", model)
-            return
+    parser = InsightStreamParser()
+    try:
+        for delta in model_router.stream(create, slo_seconds=LLM_LATENCY_SLO_SECONDS, cancel=cancel):
+            yield from parser.feed(delta)
+        yield from parser.finish()
+    except PipelineCancelled:
+        raise
+    except Exception:
+        # Close out an insight the failure cut short so the client can drop it
+        yield from parser.finish()
+        logger.exception("Groq streaming error")
+        yield "error", None, "Failed to generate insights. Please try again."
 
-def run_pipeline(location_name: str, source: str = "wikipedia", path: str = None):
-    if source == "onefivenine" and path:
-        data = fetch_onefivenine_data(path)
-    else:
-        data = fetch_wikipedia_data(location_name)
+def run_pipeline(location_name: str, source: str = "wikipedia", path: str = None, exact_title: str = None, qid: str = None, previous: dict = None):
+    """
+    Returns (result, revision) where revision is {"revid", "text_hash"} for the cache entry.
 
-    # Process the full page text for deep extraction
-    filtered_text = filter_geocultural_entities(data["text"])
+    `previous` is the stored cache entry when refreshing: if the NER-positive
+    sentences hash the same, its insights are reused and the LLM call is skipped
+    (unless the stored LLM step had failed).
+    """
+    # NER and the LLM run while image sizes and Wikidata facts are still in flight
+    data, side = start_fetch(location_name, source, path, exact_title, qid)
 
-    # If the page is too short, fallback to summary
-    if len(filtered_text) < 100:
-        filtered_text = filter_geocultural_entities(data["summary"])
+    # Process the full page text for deep extraction (summary fallback for short pages)
+    sentences = extract_geocultural_sentences(data)
 
-    insights = summarize_with_groq(filtered_text, data["title"])
+    revision = {"revid": data.get("revid"), "text_hash": context_fingerprint(sentences)}
+    if previous and has_insights(previous.get("result")) and previous.get("text_hash") == revision["text_hash"]:
+        logger.info("Filtered text unchanged for %s; reusing stored insights", data["title"])
+        insights = previous["result"].get("insights", {})
+    else:
+        insights = summarize_with_groq(sentences, data["title"])
+
+    collect_side(data, side)
+    return assemble_result(data, insights, source, path), revision
 
+def source_url_for(title: str, source: str, path: str = None) -> str:
     if source == "onefivenine" and path:
-        source_url = f"https://www.onefivenine.com/india/villages/{path}"
-    else:
-        source_url = f"https://en.wikipedia.org/wiki/{data['title'].replace(' ', '_')}"
+        return f"https://www.onefivenine.com/india/villages/{path}"
+    return f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
 
+def assemble_result(data: dict, insights: dict, source: str, path: str = None) -> dict:
+    """Builds the cached/returned payload from fetched page data and generated insights."""
     return {
         "location_name": data["title"],
         "image_url": data["image_url"],
         "image_urls": data.get("image_urls", []),
         "insights": insights,
         "source": source,
-        "source_url": source_url,
+        "source_url": source_url_for(data["title"], source, path),
         "quick_facts": data.get("quick_facts", {}),
     }
 
 
-def get_location_hierarchy(lat: float, lon: float) -> list:
+# Offline index built by `python reverse_index.py build`; without it every lookup goes to Nominatim
+reverse_geocoder = ReverseGeocoder()
+REVERSE_NOMINATIM_FALLBACK = os.getenv("REVERSE_NOMINATIM_FALLBACK", "1").strip().lower() not in ("0", "false", "no")
+# Nominatim's address detail level for a reverse_cache detail band; the default (18) gives the full address
+_NOMINATIM_ZOOM = {"locality": 12, "district": 8, "state": 5, "country": 3}
+
+
+def get_location_hierarchy(lat: float, lon: float, detail: str = "place", rate_wait: float = None) -> list:
     """
-    Uses Nominatim reverse geocoding to return the administrative hierarchy
-    for given coordinates (village → city → district → state → country).
-    Free, no API key. Works for any point on Earth.
+    Returns the administrative hierarchy for given coordinates
+    (village → city → district → state → country). Answered from the local
+    reverse index when it covers the point, else from Nominatim if the
+    fallback is enabled. A coarser `detail` (a reverse_cache band) only asks
+    Nominatim for that level of address; `rate_wait` is how long to queue for
+    its rate limit (see ResilientSession.request). Raises when Nominatim
+    cannot be reached.
     """
-    try:
-        resp = requests.get(
-            "https://nominatim.openstreetmap.org/reverse",
-            params={"lat": lat, "lon": lon, "format": "json", "addressdetails": 1},
-            headers={"User-Agent": USER_AGENT},
-            timeout=6,
-        )
-        data = resp.json()
-    except Exception:
+    hierarchy = reverse_geocoder.lookup(lat, lon)
+    if hierarchy:
+        return hierarchy
+    if not REVERSE_NOMINATIM_FALLBACK:
         return []
+    return _nominatim_hierarchy(lat, lon, _NOMINATIM_ZOOM.get(detail), rate_wait)
+
+
+def _nominatim_hierarchy(lat: float, lon: float, zoom: int = None, rate_wait: float = None) -> list:
+    """
+    Nominatim reverse geocoding. Free, no API key. Works for any point on Earth.
+    Returns [] only when Nominatim found nothing there; upstream failures (rate
+    limit, 429, open circuit, timeouts) raise, so callers do not cache them.
+    """
+    params = {"lat": lat, "lon": lon, "format": "json", "addressdetails": 1}
+    if zoom is not None:
+        params["zoom"] = zoom
+    resp = http_client.session.get(
+        "https://nominatim.openstreetmap.org/reverse",
+        params=params,
+        headers={"User-Agent": USER_AGENT},
+        timeout=6,
+        rate_wait=rate_wait,
+    )
+    resp.raise_for_status()
+    data = resp.json()
 
     address = data.get("address", {})
     if not address:
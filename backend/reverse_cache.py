@@ -0,0 +1,207 @@
+"""
+Geohash-tiered cache for reverse-geocoding results.
+
+A hierarchy is split into bands by admin level and each band is cached under
+the geohash cell that suits it: the village in a ~1 km cell, the town/city in a
+~5 km cell, down to the country in a ~1000 km cell. A lookup reads every band
+for the point's cells in one pipelined round-trip. It asks for a `detail`
+band and is answered once that band and every coarser one hit: a full lookup
+needs the village cell, but a viewport labelled by state is answered anywhere
+in a state already seen, without going upstream. When a resolve fails,
+partial() still offers whatever coarser bands are cached for the point.
+
+Coarse cells can straddle a border. When a resolve disagrees with what a
+coarse cell holds, that cell is marked mixed and the band is cached at the
+finest precision instead, for every point that lands in it from then on.
+A point with no hierarchy at all (open sea) is cached for a short while as a
+"none" marker in its fine place cell, never in the shared bands.
+"""
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+REVERSE_CACHE_TTL_SECONDS = int(os.getenv("REVERSE_CACHE_TTL_SECONDS", 2592000))        # 30 days; boundaries rarely move
+REVERSE_NEGATIVE_TTL_SECONDS = int(os.getenv("REVERSE_NEGATIVE_TTL_SECONDS", 600))
+
+# (band, geohash precision, hierarchy types it holds), most specific first.
+# Covers the labels of both the offline index and Nominatim.
+BANDS = (
+    ("place", 6, ("Village", "Hamlet", "Area")),                              # ~1.2 × 0.6 km
+    ("locality", 5, ("City District", "Town", "City", "Municipality")),      # ~4.9 × 4.9 km
+    ("district", 4, ("County", "District")),                                 # ~39 × 20 km
+    ("state", 3, ("State",)),                                                # ~156 × 156 km
+    ("country", 2, ("Country",)),                                            # ~1250 × 625 km
+)
+FINE_PRECISION = max(precision for _, precision, _ in BANDS)
+DETAILS = tuple(band for band, _, _ in BANDS)
+_BAND_OF_TYPE = {label: band for band, _, labels in BANDS for label in labels}
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lon: float, precision: int = FINE_PRECISION) -> str:
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars = []
+    bits = value = 0
+    even = True  # geohash interleaves bits starting with longitude
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value, lon_lo = value * 2 + 1, mid
+            else:
+                value, lon_hi = value * 2, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value, lat_lo = value * 2 + 1, mid
+            else:
+                value, lat_hi = value * 2, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def _band_key(band: str, cell: str) -> str:
+    return f"reverse:{band}:{cell}"
+
+
+def _band_of(level: dict) -> str:
+    # Unknown labels are most likely local subdivisions; keep them with the place
+    return _BAND_OF_TYPE.get(level.get("type"), "place")
+
+
+def trim_hierarchy(hierarchy: list, detail: str) -> list:
+    """The levels of a hierarchy at the `detail` band or coarser."""
+    keep = set(DETAILS[DETAILS.index(detail):])
+    return [level for level in hierarchy if _band_of(level) in keep]
+
+
+def split_bands(hierarchy: list) -> dict:
+    """Band name -> the hierarchy levels it holds (possibly empty), in order."""
+    bands = {band: [] for band, _, _ in BANDS}
+    for level in hierarchy:
+        bands[_band_of(level)].append(level)
+    return bands
+
+
+class ReverseCache:
+    """Point-level view over a TieredCache; all methods run on the event loop."""
+
+    def __init__(self, tiered):
+        self.tiered = tiered
+        self.hits = 0
+        self.misses = 0
+        self.mixed_cells = 0
+        self.partials = 0
+
+    async def lookup(self, lat: float, lon: float, detail: str = "place"):
+        """
+        Returns (hierarchy, probe): the levels from `detail` up to the country,
+        or None on a miss. Pass probe back to store() so it can tell which
+        coarse cells the new result agrees with.
+        """
+        return (await self.lookup_many([(lat, lon)], detail))[0]
+
+    async def lookup_many(self, points: list, detail: str = "place") -> list:
+        """lookup() for many points, in at most two pipelined round-trips however many there are."""
+        cells = [geohash(lat, lon) for lat, lon in points]
+        keys = [_band_key(band, fine[:precision]) for fine in cells for band, precision, _ in BANDS]
+        found = await self.tiered.get_many(list(dict.fromkeys(keys)))
+
+        # Bands whose coarse cell is mixed live at the fine cell instead
+        refine = [
+            _band_key(band, fine)
+            for fine in cells
+            for band, precision, _ in BANDS
+            if precision < FINE_PRECISION and (found.get(_band_key(band, fine[:precision])) or {}).get("mixed")
+        ]
+        if refine:
+            found.update(await self.tiered.get_many(list(dict.fromkeys(refine))))
+        return [(self._assemble(fine, found, detail), found) for fine in cells]
+
+    @staticmethod
+    def _entry(band: str, precision: int, fine: str, found: dict):
+        entry = found.get(_band_key(band, fine[:precision]))
+        if entry is not None and entry.get("mixed"):
+            entry = found.get(_band_key(band, fine))
+        return entry
+
+    def _assemble(self, fine: str, found: dict, detail: str):
+        if (found.get(_band_key(BANDS[0][0], fine)) or {}).get("none"):
+            self.hits += 1
+            return []
+        hierarchy = []
+        for band, precision, _ in BANDS[DETAILS.index(detail):]:
+            entry = self._entry(band, precision, fine, found)
+            if entry is None:
+                self.misses += 1
+                return None
+            hierarchy.extend(entry["levels"])
+        self.hits += 1
+        return hierarchy
+
+    def partial(self, lat: float, lon: float, probe: dict) -> list:
+        """Every cached band for a point whose lookup missed, most specific first; a fallback when resolving fails."""
+        fine = geohash(lat, lon)
+        hierarchy = []
+        for band, precision, _ in BANDS:
+            entry = self._entry(band, precision, fine, probe or {})
+            if entry is not None:
+                hierarchy.extend(entry["levels"])
+        if hierarchy:
+            self.partials += 1
+        return hierarchy
+
+    async def store(self, lat: float, lon: float, hierarchy: list, probe: dict = None, detail: str = "place"):
+        """
+        Caches a resolved hierarchy band by band, from `detail` up (finer bands
+        were not asked for, so an absent village says nothing about the point).
+        An empty hierarchy is cached briefly as "nothing here".
+        """
+        fine = geohash(lat, lon)
+        if not hierarchy:
+            await self.tiered.set(_band_key(BANDS[0][0], fine), {"levels": [], "none": True}, ex=REVERSE_NEGATIVE_TTL_SECONDS)
+            return
+
+        probe = probe or {}
+        writes = {}
+        bands = split_bands(hierarchy)
+        for band, precision, _ in BANDS[DETAILS.index(detail):]:
+            levels = bands[band]
+            key, fine_key = _band_key(band, fine[:precision]), _band_key(band, fine)
+            existing = probe.get(key)
+            if existing is not None and not existing.get("none") and existing.get("levels") == levels:
+                continue
+            if existing is None or key == fine_key:
+                writes[key] = {"levels": levels}
+            elif existing.get("mixed"):
+                if (probe.get(fine_key) or {}).get("levels") != levels:
+                    writes[fine_key] = {"levels": levels}
+            else:
+                # A border runs through this cell: stop answering the band from it
+                self.mixed_cells += 1
+                logger.info("Reverse cache cell %s is mixed for %s", fine[:precision], band)
+                writes[key] = {"mixed": True}
+                writes[fine_key] = {"levels": levels}
+        if not writes:
+            return
+        try:
+            await self.tiered.set_many(writes, ex=REVERSE_CACHE_TTL_SECONDS)
+        except Exception:
+            pass  # set_many has logged it; the L1 copies were written
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "mixed_cells": self.mixed_cells,
+            "partials": self.partials,
+            **self.tiered.stats(),
+        }
@@ -0,0 +1,428 @@
+"""
+Offline reverse geocoder.
+
+`python reverse_index.py download` fetches the GeoNames dumps (populated places
+plus the admin1/admin2/country name tables) and `python reverse_index.py build`
+packs them into a memory-mapped grid index. A lookup reads the few cells around
+the point, picks the nearest populated place (and the nearest city, if the
+place is smaller), and returns the same village → city → district → state →
+country hierarchy that Nominatim produced, in microseconds and without a
+network call.
+
+Index file layout (little-endian):
+    b"GCRG" | uint8 version | uint16 cell size (millidegrees) | uint32 cells | uint32 places | uint32 admins
+    cells  = cells × (uint32 cell id, uint32 first place)        sorted by cell id
+    places = places × (float32 lat, float32 lon, uint32 population, uint32 name, uint32 admin, uint8 kind, 3 pad)
+    admins = admins × (uint32 district, uint32 state, uint32 country)
+    strings = NUL-terminated UTF-8 names; name fields are offsets into this block (NO_NAME if absent)
+
+Places are stored grouped by cell, so a cell's places are the run between its
+first place and the next cell's. Like the autocomplete index, the file is
+mmap'd read-only: every worker shares one page-cache copy.
+"""
+import os
+import math
+import mmap
+import struct
+import zipfile
+import logging
+import argparse
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.getenv("REVERSE_INDEX_PATH", os.path.join(BASE_DIR, "data", "reverse.idx"))
+GEONAMES_DIR = os.getenv("GEONAMES_DIR", os.path.join(BASE_DIR, "data", "geonames"))
+GEONAMES_DUMP_URL = "https://download.geonames.org/export/dump/"
+GEONAMES_FILES = ["cities500.zip", "admin1CodesASCII.txt", "admin2Codes.txt", "countryInfo.txt"]
+RELOAD_CHECK_SECONDS = 30
+
+MAX_DISTANCE_KM = float(os.getenv("REVERSE_MAX_DISTANCE_KM", 20))  # farther than this, the nearest place does not describe the point
+CITY_RADIUS_KM = float(os.getenv("REVERSE_CITY_RADIUS_KM", 30))    # how far to look for the city a village belongs to
+CITY_POPULATION = 100_000
+TOWN_POPULATION = 10_000
+DEFAULT_CELL_DEGREES = 0.1      # ~11 km of latitude
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Place kinds, as the hierarchy "type" labels get_location_hierarchy uses
+KIND_TYPES = ("Village", "Town", "City", "Area")
+_VILLAGE, _TOWN, _CITY, _AREA = range(4)
+# GeoNames feature codes of places that no longer exist
+_DEAD_PLACE_CODES = {"PPLH", "PPLQ", "PPLW", "PPLCH"}
+
+_MAGIC = b"GCRG"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBHIII")
+_CELL = struct.Struct("<II")
+_PLACE = struct.Struct("<ffIIIB3x")
+_ADMIN = struct.Struct("<III")
+NO_NAME = 0xFFFFFFFF
+
+
+def _distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class _Grid:
+    """Cell arithmetic shared by the builder and the reader."""
+
+    def __init__(self, cell_degrees: float):
+        self.cell = cell_degrees
+        self.rows = round(180 / cell_degrees)
+        self.cols = round(360 / cell_degrees)
+
+    def row_col(self, lat: float, lon: float) -> tuple:
+        row = min(int((lat + 90) / self.cell), self.rows - 1)
+        col = int(((lon + 180) % 360) / self.cell) % self.cols
+        return row, col
+
+    def cell_id(self, row: int, col: int) -> int:
+        return row * self.cols + col
+
+
+class ReverseGeocoder:
+    """Read side of the index. lookup() returns None when the index cannot answer, so callers can fall back."""
+
+    def __init__(self, index_path: str = INDEX_PATH):
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._mm = None
+        self._file_id = None
+        self._checked_at = 0.0
+        self.lookups = 0
+        self.answered = 0
+        self._open()
+
+    # ── Reading ───────────────────────────────────────────────────────────────
+
+    def _open(self):
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        if file_id == self._file_id or stat.st_size < _HEADER.size:
+            return
+        with open(self.index_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, cell_milli, n_cells, n_places, n_admins = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            logger.warning("Ignoring reverse index with unexpected header: %s", self.index_path)
+            mm.close()
+            return
+        self._grid = _Grid(cell_milli / 1000)
+        self._n_cells, self._n_places = n_cells, n_places
+        self._cells_at = _HEADER.size
+        self._places_at = self._cells_at + n_cells * _CELL.size
+        self._admins_at = self._places_at + n_places * _PLACE.size
+        self._strings_at = self._admins_at + n_admins * _ADMIN.size
+        self._mm, self._file_id = mm, file_id
+        logger.info("Reverse index loaded: %d places in %d cells from %s", n_places, n_cells, self.index_path)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        self._open()
+
+    @property
+    def loaded(self) -> bool:
+        return self._mm is not None
+
+    def _string(self, offset: int):
+        if offset == NO_NAME:
+            return None
+        start = self._strings_at + offset
+        return self._mm[start:self._mm.find(b"\0", start)].decode("utf-8")
+
+    def _first_place(self, cell_id: int) -> int:
+        """Index of the first place in the first non-empty cell at or after cell_id (binary search over the cell table)."""
+        lo, hi = 0, self._n_cells
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _CELL.unpack_from(self._mm, self._cells_at + mid * _CELL.size)[0] < cell_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self._n_cells:
+            return self._n_places
+        return _CELL.unpack_from(self._mm, self._cells_at + lo * _CELL.size)[1]
+
+    def _row_places(self, row: int, first_col: int, last_col: int):
+        """
+        Indices of the places in columns first_col..last_col of a row, which may
+        wrap past the antimeridian. Places are stored in cell order, so each
+        contiguous run of cells is one slice found with two binary searches.
+        """
+        grid = self._grid
+        if last_col - first_col + 1 >= grid.cols:
+            spans = [(0, grid.cols - 1)]
+        else:
+            first_col, last_col = first_col % grid.cols, last_col % grid.cols
+            spans = [(first_col, last_col)] if first_col <= last_col else [(first_col, grid.cols - 1), (0, last_col)]
+        for first, last in spans:
+            yield from range(self._first_place(grid.cell_id(row, first)), self._first_place(grid.cell_id(row, last) + 1))
+
+    def _ring(self, row: int, col: int, k: int, col_scale: float):
+        """
+        Places in ring k around (row, col). Rings grow by one row and by
+        col_scale columns (cells shrink east-west towards the poles), so each
+        ring adds about a cell's north-south height of distance in every
+        direction; the column span stops growing once it covers all 360°.
+        """
+        grid = self._grid
+        half = grid.cols // 2
+        span = min(math.ceil(k * col_scale), half)
+        inner = min(math.ceil((k - 1) * col_scale), half) if k else -1
+        for dr in range(-k, k + 1):
+            r = row + dr
+            if r < 0 or r >= grid.rows:
+                continue
+            if abs(dr) == k:
+                yield from self._row_places(r, col - span, col + span)
+            elif span > inner:
+                yield from self._row_places(r, col + inner + 1, col + span)
+                yield from self._row_places(r, col - span, col - inner - 1)
+
+    def _nearest(self, lat: float, lon: float) -> tuple:
+        """(place, city) as (distance_km, index) pairs, either None; rings of cells are searched outward."""
+        grid = self._grid
+        row, col = grid.row_col(lat, lon)
+        cell_km = grid.cell * KM_PER_DEGREE
+        # Columns per ring, from the narrowest cells the search can reach
+        col_scale = 1 / max(math.cos(math.radians(min(abs(lat) + grid.cell, 89.0))), 0.01)
+        radius = max(MAX_DISTANCE_KM, CITY_RADIUS_KM)
+        max_ring = math.ceil(radius / cell_km) + 1
+        place = city = None
+        for k in range(max_ring + 1):
+            # Nothing in ring k can be closer than this
+            bound = max(k - 1, 0) * cell_km
+            if bound > radius:
+                break
+            if place is not None and bound > place[0] and (bound > CITY_RADIUS_KM or (city is not None and bound > city[0])):
+                break
+            for i in self._ring(row, col, k, col_scale):
+                p_lat, p_lon, _, _, _, kind = _PLACE.unpack_from(self._mm, self._places_at + i * _PLACE.size)
+                d = _distance_km(lat, lon, p_lat, p_lon)
+                if place is None or d < place[0]:
+                    place = (d, i)
+                if kind == _CITY and (city is None or d < city[0]):
+                    city = (d, i)
+        return place, city
+
+    def lookup(self, lat: float, lon: float):
+        """Hierarchy for the point, most specific first, or None (no index, or no place within MAX_DISTANCE_KM)."""
+        with self._lock:
+            self._maybe_reload()
+            self.lookups += 1
+            if self._mm is None:
+                return None
+            place, city = self._nearest(lat, lon)
+            if place is None or place[0] > MAX_DISTANCE_KM:
+                return None
+
+            _, _, _, name, admin, kind = _PLACE.unpack_from(self._mm, self._places_at + place[1] * _PLACE.size)
+            levels = [(self._string(name), KIND_TYPES[kind])]
+            if kind != _CITY and city is not None and city[0] <= CITY_RADIUS_KM:
+                _, _, _, city_name, city_admin, _ = _PLACE.unpack_from(self._mm, self._places_at + city[1] * _PLACE.size)
+                # Only a city in the same state: across a border it is not "the" city of the place
+                if _ADMIN.unpack_from(self._mm, self._admins_at + city_admin * _ADMIN.size)[1:] == \
+                        _ADMIN.unpack_from(self._mm, self._admins_at + admin * _ADMIN.size)[1:]:
+                    levels.append((self._string(city_name), "City"))
+            district, state, country = _ADMIN.unpack_from(self._mm, self._admins_at + admin * _ADMIN.size)
+            levels += [(self._string(district), "District"), (self._string(state), "State"), (self._string(country), "Country")]
+            self.answered += 1
+
+        hierarchy = []
+        seen = set()
+        for level_name, label in levels:
+            if level_name and level_name not in seen:
+                seen.add(level_name)
+                hierarchy.append({"name": level_name, "type": label})
+        return hierarchy
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._mm is not None,
+            "places": self._n_places if self._mm is not None else 0,
+            "lookups": self.lookups,
+            "answered": self.answered,
+        }
+
+
+# ── Building ──────────────────────────────────────────────────────────────────
+
+def _kind(feature_code: str, population: int) -> int:
+    if feature_code == "PPLX":
+        return _AREA  # a section of a populated place (neighbourhood)
+    if feature_code in ("PPLC", "PPLA") or population >= CITY_POPULATION:
+        return _CITY
+    if population >= TOWN_POPULATION:
+        return _TOWN
+    return _VILLAGE
+
+
+def _read_places(path: str):
+    """Yields (name, lat, lon, country, admin1, admin2, population, feature code) from a GeoNames dump."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 15 or cols[6] != "P" or cols[7] in _DEAD_PLACE_CODES:
+                continue
+            try:
+                lat, lon = float(cols[4]), float(cols[5])
+            except ValueError:
+                continue
+            yield cols[1], lat, lon, cols[8], cols[10], cols[11], int(cols[14] or 0), cols[7]
+
+
+def _read_codes(path: str) -> dict:
+    """admin1CodesASCII.txt / admin2Codes.txt: 'CC.A1[.A2]<TAB>name<TAB>ascii name<TAB>geonameid'."""
+    codes = {}
+    if not path or not os.path.exists(path):
+        return codes
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) >= 2:
+                codes[cols[0]] = cols[1]
+    return codes
+
+
+def _read_countries(path: str) -> dict:
+    countries = {}
+    if not path or not os.path.exists(path):
+        return countries
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) >= 5:
+                countries[cols[0]] = cols[4]
+    return countries
+
+
+def build_index(places_paths: list, admin1_path: str, admin2_path: str, countries_path: str,
+                out_path: str = INDEX_PATH, cell_degrees: float = DEFAULT_CELL_DEGREES) -> int:
+    """Packs GeoNames populated places and their admin names into a fresh index file."""
+    grid = _Grid(cell_degrees)
+    admin1, admin2, countries = _read_codes(admin1_path), _read_codes(admin2_path), _read_countries(countries_path)
+
+    strings = bytearray()
+    string_offsets: dict = {}
+
+    def intern(text: str) -> int:
+        if not text:
+            return NO_NAME
+        offset = string_offsets.get(text)
+        if offset is None:
+            offset = string_offsets[text] = len(strings)
+            strings.extend(text.encode("utf-8") + b"\0")
+        return offset
+
+    admin_rows: dict = {}   # (district, state, country) offsets -> admin index
+    cells = defaultdict(list)
+    for paths_entry in places_paths:
+        for name, lat, lon, cc, a1, a2, population, code in _read_places(paths_entry):
+            key = (
+                intern(admin2.get(f"{cc}.{a1}.{a2}")),
+                intern(admin1.get(f"{cc}.{a1}")),
+                intern(countries.get(cc)),
+            )
+            admin = admin_rows.setdefault(key, len(admin_rows))
+            row, col = grid.row_col(lat, lon)
+            cells[grid.cell_id(row, col)].append((lat, lon, population, intern(name), admin, _kind(code, population)))
+
+    cell_table = []
+    places = bytearray()
+    count = 0
+    for cell_id in sorted(cells):
+        cell_table.append((cell_id, count))
+        for place in cells[cell_id]:
+            places += _PLACE.pack(*place)
+            count += 1
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, round(cell_degrees * 1000), len(cell_table), count, len(admin_rows)))
+        for entry in cell_table:
+            f.write(_CELL.pack(*entry))
+        f.write(places)
+        for key in sorted(admin_rows, key=admin_rows.get):
+            f.write(_ADMIN.pack(*key))
+        f.write(strings)
+    # Atomic swap: workers still mapping the old file keep a valid view until they reload
+    os.replace(tmp_path, out_path)
+    return count
+
+
+def download(dest_dir: str = GEONAMES_DIR, files: list = GEONAMES_FILES) -> list:
+    """Fetches the GeoNames dump files into dest_dir, unpacking zips. Returns the local paths."""
+    import http_client  # only the CLI downloads; the server just reads the index
+
+    os.makedirs(dest_dir, exist_ok=True)
+    paths = []
+    for name in files:
+        path = os.path.join(dest_dir, name)
+        logger.info("Downloading %s", GEONAMES_DUMP_URL + name)
+        with http_client.session.get(GEONAMES_DUMP_URL + name, stream=True, timeout=60) as res:
+            res.raise_for_status()
+            with open(path + ".part", "wb") as f:
+                for chunk in res.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
+        os.replace(path + ".part", path)
+        if name.endswith(".zip"):
+            with zipfile.ZipFile(path) as archive:
+                archive.extractall(dest_dir)
+            os.remove(path)
+            path = os.path.join(dest_dir, name[:-4] + ".txt")
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build and query the offline reverse-geocoding index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fetch = sub.add_parser("download", help="fetch the GeoNames dumps into --dir")
+    fetch.add_argument("--dir", default=GEONAMES_DIR)
+    build = sub.add_parser("build", help="pack GeoNames places into the index file")
+    build.add_argument("--places", action="append", default=[],
+                       help="GeoNames places dump, e.g. cities500.txt or a country file like IN.txt (repeatable)")
+    build.add_argument("--dir", default=GEONAMES_DIR, help="where the admin/country tables (and default places) live")
+    build.add_argument("--cell", type=float, default=DEFAULT_CELL_DEGREES, help="grid cell size in degrees")
+    build.add_argument("--out", default=INDEX_PATH)
+    query = sub.add_parser("query", help="reverse-geocode one point")
+    query.add_argument("lat", type=float)
+    query.add_argument("lon", type=float)
+    args = parser.parse_args()
+
+    if args.command == "download":
+        for path in download(args.dir):
+            print(path)
+    elif args.command == "build":
+        places = args.places or [os.path.join(args.dir, "cities500.txt")]
+        total = build_index(
+            places,
+            os.path.join(args.dir, "admin1CodesASCII.txt"),
+            os.path.join(args.dir, "admin2Codes.txt"),
+            os.path.join(args.dir, "countryInfo.txt"),
+            out_path=args.out,
+            cell_degrees=args.cell,
+        )
+        print(f"Wrote {total} places to {args.out}")
+    else:
+        started = time.perf_counter()
+        result = ReverseGeocoder().lookup(args.lat, args.lon)
+        print(result, f"({(time.perf_counter() - started) * 1e6:.0f} µs)")
@@ -0,0 +1,160 @@
+"""
+ModelRouter against fake_llm_server.py through the Groq SDK: hedging, fallback,
+rate-limit cooldown and exploration. Timings are scaled down so the suite runs
+in a few seconds.
+"""
+import json
+import time
+import threading
+
+import pytest
+
+groq = pytest.importorskip("groq")
+
+import llm_router
+import fake_llm_server
+from llm_router import ModelRouter
+
+BIG, SMALL = "big", "small"
+SLO_SECONDS = 5.0
+EXPECTED = json.dumps(fake_llm_server._INSIGHTS, indent=2)
+
+
+@pytest.fixture(autouse=True)
+def short_timings(monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_AFTER_SECONDS", 0.3)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_LOSS_LIMIT", 2)
+    monkeypatch.setattr(llm_router, "LLM_EXPLORE_AFTER_SECONDS", 60.0)
+    monkeypatch.setattr(llm_router, "LLM_RATE_LIMIT_COOLDOWN_SECONDS", 0.5)
+
+
+@pytest.fixture
+def fake():
+    """Starts the fake server; returns (profiles, client). Profiles can be changed mid-test."""
+    profiles = {
+        BIG: dict(fake_llm_server.DEFAULT_PROFILE, ttft=0.05, tps=5000.0),
+        SMALL: dict(fake_llm_server.DEFAULT_PROFILE, ttft=0.05, tps=5000.0),
+    }
+    server = fake_llm_server.serve(0, profiles)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = groq.Groq(api_key="fake", base_url=f"http://127.0.0.1:{server.server_address[1]}", max_retries=0)
+    yield profiles, client
+    server.shutdown()
+    server.server_close()
+
+
+def _create(client, stream: bool):
+    def create(model: str):
+        return client.chat.completions.create(
+            model=model, messages=[{"role": "user", "content": "insights"}], stream=stream, timeout=10,
+        )
+    return create
+
+
+def _stream(router: ModelRouter, client) -> str:
+    return "".join(router.stream(_create(client, True), slo_seconds=SLO_SECONDS))
+
+
+def _model(router: ModelRouter, model: str) -> dict:
+    return router.stats()["models"][model]
+
+
+def test_streams_from_preferred_model(fake):
+    _, client = fake
+    router = ModelRouter([BIG, SMALL])
+
+    assert _stream(router, client) == EXPECTED
+    assert _model(router, BIG)["requests"] == 1
+    assert _model(router, SMALL)["requests"] == 0
+    assert router.stats()["hedges"] == 0
+
+
+def test_hedges_slow_primary_and_demotes_it_after_repeated_losses(fake):
+    profiles, client = fake
+    profiles[BIG]["ttft"] = 1.0
+    router = ModelRouter([BIG, SMALL])
+
+    for losses in (1, 2):
+        assert router.plan(SLO_SECONDS)[0] == BIG  # the lower-bound TTFT still fits the SLO
+        assert _stream(router, client) == EXPECTED
+        assert _model(router, BIG)["hedge_losses"] == losses
+    assert router.stats()["hedges"] == 2
+    assert _model(router, SMALL)["hedge_wins"] == 2
+
+    # Demoted: the next request goes straight to the fallback without waiting out a hedge
+    assert router.plan(SLO_SECONDS)[0] == SMALL
+    started = time.monotonic()
+    assert _stream(router, client) == EXPECTED
+    assert time.monotonic() - started < llm_router.LLM_HEDGE_AFTER_SECONDS
+    assert router.stats()["hedges"] == 2
+
+
+def test_falls_back_when_primary_errors(fake):
+    profiles, client = fake
+    profiles[BIG].update(error=1.0, status=500)
+    router = ModelRouter([BIG, SMALL])
+
+    assert _stream(router, client) == EXPECTED
+    response, model = router.complete(_create(client, False), slo_seconds=SLO_SECONDS)
+    assert model == SMALL
+    assert response.choices[0].message.content == EXPECTED
+    assert _model(router, BIG)["errors"] == 2
+    assert not _model(router, BIG)["cooling_down"]
+
+
+def test_rate_limited_model_cools_down(fake):
+    profiles, client = fake
+    profiles[BIG].update(error=1.0, status=429)
+    router = ModelRouter([BIG, SMALL])
+
+    assert _stream(router, client) == EXPECTED
+    assert _model(router, BIG)["cooling_down"]
+    assert router.plan(SLO_SECONDS) == [SMALL]
+
+    time.sleep(llm_router.LLM_RATE_LIMIT_COOLDOWN_SECONDS)
+    assert router.plan(SLO_SECONDS) == [BIG, SMALL]
+
+
+def test_empty_primary_waits_for_live_hedge(fake):
+    profiles, client = fake
+    # The primary finishes empty after the hedge started but before it produced a token
+    profiles[BIG].update(ttft=0.4, empty=1.0)
+    profiles[SMALL]["ttft"] = 0.3
+    router = ModelRouter([BIG, SMALL])
+
+    assert _stream(router, client) == EXPECTED
+    assert _model(router, SMALL)["hedge_wins"] == 1
+
+
+def test_explores_demoted_model_and_readopts_it_once_fast(fake, monkeypatch):
+    profiles, client = fake
+    profiles[BIG]["ttft"] = 1.0
+    router = ModelRouter([BIG, SMALL])
+    for _ in range(2):
+        _stream(router, client)
+    assert router.plan(SLO_SECONDS)[0] == SMALL
+
+    profiles[BIG]["ttft"] = 0.05
+    monkeypatch.setattr(llm_router, "LLM_EXPLORE_AFTER_SECONDS", 0.2)
+    time.sleep(0.25)
+    assert _stream(router, client) == EXPECTED
+    assert router.stats()["explorations"] == 1
+    assert _model(router, BIG)["hedge_losses"] == 0
+    # The probe's sample replaced the slow estimate, so one request is enough
+    assert router.plan(SLO_SECONDS)[0] == BIG
+
+
+def test_exploration_of_still_slow_model_keeps_it_demoted(fake, monkeypatch):
+    profiles, client = fake
+    profiles[BIG]["ttft"] = 1.0
+    router = ModelRouter([BIG, SMALL])
+    for _ in range(2):
+        _stream(router, client)
+
+    monkeypatch.setattr(llm_router, "LLM_EXPLORE_AFTER_SECONDS", 0.2)
+    time.sleep(0.25)
+    assert _stream(router, client) == EXPECTED  # explored, then hedged away again
+    assert router.stats()["explorations"] == 1
+    assert router.stats()["hedges"] == 3
+    assert router.plan(SLO_SECONDS)[0] == SMALL
@@ -0,0 +1,136 @@
+"""
+ReverseCache over an L1-only TieredCache: band assembly by detail, partial
+answers, negative markers and the mixed-cell refinement in store().
+"""
+import asyncio
+
+import pytest
+
+from cache import SizedTTLCache, TieredCache
+from reverse_cache import ReverseCache, geohash, _band_key
+
+HOME = (11.0, 78.0)       # t9zqwf
+NEXT_DOOR = (11.003, 78.0)  # t9zqwg: another village cell, same town cell
+ACROSS = (11.15, 78.15)   # t9zx6m: another district cell, same state cell
+BORDER = (10.8, 77.9)     # t9zmkw: same state cell, resolved to another state
+
+
+def _hierarchy(village: str, town: str, district: str, state: str, country: str = "India") -> list:
+    return [
+        {"name": village, "type": "Village"},
+        {"name": town, "type": "Town"},
+        {"name": district, "type": "District"},
+        {"name": state, "type": "State"},
+        {"name": country, "type": "Country"},
+    ]
+
+
+HOME_HIERARCHY = _hierarchy("Kuppam", "Namakkal", "Namakkal District", "Tamil Nadu")
+
+
+@pytest.fixture
+def reverse():
+    return ReverseCache(TieredCache(None, SizedTTLCache(max_bytes=1_000_000, ttl=3600, name="reverse")))
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _resolve(reverse: ReverseCache, point: tuple, hierarchy: list, detail: str = "place"):
+    """What the endpoints do on a miss: look up, then store with the probe."""
+    cached, probe = await reverse.lookup(*point, detail)
+    assert cached is None
+    await reverse.store(*point, hierarchy, probe, detail)
+
+
+def test_cell_layout():
+    assert geohash(*HOME)[:5] == geohash(*NEXT_DOOR)[:5] and geohash(*HOME) != geohash(*NEXT_DOOR)
+    assert geohash(*HOME)[:3] == geohash(*ACROSS)[:3] and geohash(*HOME)[:4] != geohash(*ACROSS)[:4]
+    assert geohash(*HOME)[:3] == geohash(*BORDER)[:3] and geohash(*HOME)[:4] != geohash(*BORDER)[:4]
+
+
+def test_full_lookup_hits_only_in_the_same_village_cell(reverse):
+    async def scenario():
+        await _resolve(reverse, HOME, HOME_HIERARCHY)
+        assert (await reverse.lookup(*HOME))[0] == HOME_HIERARCHY
+        assert (await reverse.lookup(*NEXT_DOOR))[0] is None
+    _run(scenario())
+
+
+def test_coarse_detail_is_answered_from_coarse_bands(reverse):
+    async def scenario():
+        await _resolve(reverse, HOME, HOME_HIERARCHY)
+        assert (await reverse.lookup(*NEXT_DOOR, "locality"))[0] == HOME_HIERARCHY[1:]
+        assert (await reverse.lookup(*ACROSS, "state"))[0] == HOME_HIERARCHY[3:]
+        assert (await reverse.lookup(*ACROSS, "district"))[0] is None
+    _run(scenario())
+
+
+def test_coarse_store_does_not_claim_finer_bands(reverse):
+    async def scenario():
+        await _resolve(reverse, ACROSS, HOME_HIERARCHY[3:], detail="state")
+        assert (await reverse.lookup(*ACROSS, "state"))[0] == HOME_HIERARCHY[3:]
+        assert (await reverse.lookup(*ACROSS))[0] is None
+        assert (await reverse.lookup(*ACROSS, "district"))[0] is None
+    _run(scenario())
+
+
+def test_partial_offers_cached_coarser_bands(reverse):
+    async def scenario():
+        await _resolve(reverse, HOME, HOME_HIERARCHY)
+        cached, probe = await reverse.lookup(*ACROSS)
+        assert cached is None
+        assert reverse.partial(*ACROSS, probe) == HOME_HIERARCHY[3:]
+        assert reverse.stats()["partials"] == 1
+    _run(scenario())
+
+
+def test_no_hierarchy_is_cached_as_nothing_here(reverse):
+    async def scenario():
+        sea = (0.0, -30.0)
+        await _resolve(reverse, sea, [])
+        assert (await reverse.lookup(*sea))[0] == []
+        assert (await reverse.lookup(*sea, "country"))[0] == []
+    _run(scenario())
+
+
+def test_disagreeing_resolve_marks_the_coarse_cell_mixed(reverse):
+    async def scenario():
+        await _resolve(reverse, HOME, HOME_HIERARCHY)
+        state_cell = _band_key("state", geohash(*HOME)[:3])
+        assert reverse.tiered.l1.get(state_cell) == {"levels": [{"name": "Tamil Nadu", "type": "State"}]}
+
+        kerala = _hierarchy("Anakkara", "Palakkad", "Palakkad District", "Kerala")
+        await _resolve(reverse, BORDER, kerala)
+        assert reverse.tiered.l1.get(state_cell) == {"mixed": True}
+        assert reverse.stats()["mixed_cells"] == 1
+        # The country band agreed, so it still answers from its coarse cell
+        assert reverse.tiered.l1.get(_band_key("country", geohash(*HOME)[:2]))["levels"] == kerala[4:]
+
+        # The new point answers from its own fine cell; the first one has to resolve again...
+        assert (await reverse.lookup(*BORDER))[0] == kerala
+        assert (await reverse.lookup(*HOME, "state"))[0] is None
+        await _resolve(reverse, HOME, HOME_HIERARCHY)
+        # ...after which it is back at the fine precision, and the cell is not counted twice
+        assert (await reverse.lookup(*HOME))[0] == HOME_HIERARCHY
+        assert (await reverse.lookup(*BORDER))[0] == kerala
+        assert reverse.stats()["mixed_cells"] == 1
+        assert reverse.tiered.l1.get(_band_key("state", geohash(*HOME)))["levels"] == HOME_HIERARCHY[3:4]
+    _run(scenario())
+
+
+def test_agreeing_resolve_writes_only_the_bands_it_adds(reverse, monkeypatch):
+    async def scenario():
+        await _resolve(reverse, HOME, HOME_HIERARCHY)
+        writes = []
+        original = reverse.tiered.set_many
+
+        async def recording_set_many(items, ex):
+            writes.append(sorted(items))
+            await original(items, ex)
+
+        monkeypatch.setattr(reverse.tiered, "set_many", recording_set_many)
+        await _resolve(reverse, NEXT_DOOR, _hierarchy("Mettur", "Namakkal", "Namakkal District", "Tamil Nadu"))
+        assert writes == [[_band_key("place", geohash(*NEXT_DOOR))]]
+    _run(scenario())
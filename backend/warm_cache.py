@@ -0,0 +1,387 @@
+"""
+Bulk cache warming.
+
+Runs the summary pipeline over a file of known locations and writes the
+results to the same `summary:*` page keys and `alias:*` query keys the API
+reads, so the first visitor never pays for a cold pipeline run.
+
+Input (one location per line / row):
+  - JSONL: {"name": "Salem, Tamil Nadu", "source": "wikipedia", "exact_title": "Salem, Tamil Nadu"}
+           {"name": "Thandampalayam", "source": "onefivenine", "path": "tamil-nadu/erode/..."}
+  - CSV with a header row using the same column names
+  - plain text: one Wikipedia location name per line
+
+With --refresh, entries that already exist are revalidated instead: one
+batched revision probe per chunk extends the entries whose article has not
+changed, and pages whose NER-positive sentences are unchanged reuse their insights.
+
+Usage:
+  python warm_cache.py locations.jsonl --workers 8 --groq-rpm 30
+  python warm_cache.py locations.jsonl --refresh
+"""
+import os
+import csv
+import json
+import time
+import asyncio
+import logging
+import argparse
+import threading
+import concurrent.futures
+from collections import deque, defaultdict
+
+from database import redis_client
+from context import estimate_tokens
+from cache import (
+    SizedTTLCache,
+    TieredCache,
+    SUMMARY_HARD_TTL_SECONDS,
+    ALIAS_TTL_SECONDS,
+    alias_cache_key,
+    page_summary_key,
+    summary_entry,
+    has_insights,
+)
+from pipeline import (
+    resolve_wikipedia_titles,
+    get_best_wikipedia_title,
+    fetch_wikidata_facts_batch,
+    fetch_revision_ids,
+    context_fingerprint,
+    fetch_wikipedia_data,
+    fetch_onefivenine_data,
+    extract_geocultural_sentences_many,
+    MODEL_CONTEXT_TOKENS,
+    MAX_COMPLETION_TOKENS,
+    PRIMARY_MODEL,
+    summarize_with_groq,
+    assemble_result,
+)
+
+logger = logging.getLogger("warm_cache")
+
+
+class RateLimiter:
+    """Sliding one-minute window over requests and tokens, shared by all worker threads."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._window: deque = deque()  # (timestamp, tokens)
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._window and now - self._window[0][0] >= 60:
+                    self._window.popleft()
+                used = sum(t for _, t in self._window)
+                if len(self._window) < self.rpm and (used + tokens <= self.tpm or not self._window):
+                    self._window.append((now, tokens))
+                    return
+                wait = 60 - (now - self._window[0][0])
+            time.sleep(max(wait, 0.05))
+
+
+class Stats:
+    def __init__(self, total: int):
+        self.total = total
+        self.started = time.monotonic()
+        self.done = 0
+        self.failed = 0
+        self.stage_seconds = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float):
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+
+    def report(self) -> str:
+        elapsed = time.monotonic() - self.started
+        finished = self.done + self.failed
+        rate = finished / elapsed if elapsed else 0.0
+        stages = ", ".join(
+            f"{name} {seconds / max(finished, 1):.2f}s" for name, seconds in self.stage_seconds.items()
+        )
+        return (
+            f"{finished}/{self.total} processed ({self.done} cached, {self.failed} failed) "
+            f"in {elapsed:.0f}s — {rate * 60:.1f} locations/min; avg per location: {stages or 'n/a'}"
+        )
+
+
+def read_locations(path: str) -> list:
+    """Reads the input file into a list of {name, source, path, exact_title} dicts."""
+    items = []
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = []
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                rows.append(json.loads(line) if line.startswith("{") else {"name": line})
+
+    for row in rows:
+        name = (row.get("name") or row.get("location_name") or "").strip()
+        if not name:
+            continue
+        items.append({
+            "name": name,
+            "source": (row.get("source") or "wikipedia").strip(),
+            "path": (row.get("path") or "").strip() or None,
+            "exact_title": (row.get("exact_title") or "").strip() or None,
+        })
+    return items
+
+
+def load_progress(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class Warmer:
+    def __init__(self, args):
+        self.args = args
+        # Per-upstream bulkheads so a fast worker pool cannot stampede one host
+        self.limits = {
+            "wikipedia": threading.BoundedSemaphore(args.wikipedia_concurrency),
+            "onefivenine": threading.BoundedSemaphore(args.onefivenine_concurrency),
+            "groq": threading.BoundedSemaphore(args.groq_concurrency),
+        }
+        self.groq_limiter = RateLimiter(args.groq_rpm, args.groq_tpm)
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=args.workers)
+        self.stats = None
+
+    def _timed(self, stage: str, upstream: str, fn, *fn_args, **fn_kwargs):
+        started = time.monotonic()
+        try:
+            if upstream:
+                with self.limits[upstream]:
+                    return fn(*fn_args, **fn_kwargs)
+            return fn(*fn_args, **fn_kwargs)
+        finally:
+            self.stats.add_stage(stage, time.monotonic() - started)
+
+    # ── Batched resolution ────────────────────────────────────────────────────
+
+    def resolve(self, items: list):
+        """Resolves canonical titles, QIDs and Wikidata facts for Wikipedia items in batches."""
+        wiki_items = [i for i in items if not (i["source"] == "onefivenine" and i["path"])]
+
+        exact = [i["exact_title"] for i in wiki_items if i["exact_title"]]
+        resolved = self._timed("resolve", "wikipedia", resolve_wikipedia_titles, exact) if exact else {}
+        for item in wiki_items:
+            if item["exact_title"]:
+                item["title"], item["qid"] = resolved.get(item["exact_title"], (None, None))
+
+        # Free-text names need the scored search; these cannot be batched
+        searches = {
+            self.pool.submit(self._timed, "resolve", "wikipedia", get_best_wikipedia_title, item["name"]): item
+            for item in wiki_items if not item["exact_title"]
+        }
+        for future in concurrent.futures.as_completed(searches):
+            item = searches[future]
+            try:
+                item["title"], item["qid"] = future.result()
+            except Exception as e:
+                logger.warning("Title resolution failed for %s: %s", item["name"], e)
+                item["title"], item["qid"] = None, None
+
+        qids = sorted({i["qid"] for i in wiki_items if i.get("qid")})
+        facts = self._timed("facts", None, fetch_wikidata_facts_batch, qids) if qids else {}
+        for item in wiki_items:
+            if item.get("qid") in facts:
+                item["quick_facts"] = facts[item["qid"]]
+
+    @staticmethod
+    def page_key(item: dict):
+        if item["source"] == "onefivenine" and item["path"]:
+            return page_summary_key(item["source"], item["path"])
+        return page_summary_key(item["source"], item["title"]) if item.get("title") else None
+
+    # ── Pipeline stages ───────────────────────────────────────────────────────
+
+    def fetch_one(self, item: dict) -> dict:
+        source, path = item["source"], item["path"]
+        if source == "onefivenine" and path:
+            return self._timed("fetch", "onefivenine", fetch_onefivenine_data, path)
+        if not item.get("title"):
+            raise ValueError(f"Could not identify a geographical location for: '{item['name']}'")
+        return self._timed(
+            "fetch", "wikipedia", fetch_wikipedia_data, item["name"],
+            exact_title=item["title"], qid=item.get("qid"), quick_facts=item.get("quick_facts"),
+        )
+
+    def filter_all(self, fetched: list) -> list:
+        """Runs NER over every fetched page in one nlp.pipe pass (summary fallbacks in a second)."""
+        return self._timed("ner", None, extract_geocultural_sentences_many, [data for _, data in fetched])
+
+    def summarize_one(self, item: dict, data: dict, sentences: list) -> dict:
+        """Returns a cache entry; a refreshed page whose sentences are unchanged keeps its insights."""
+        text_hash = context_fingerprint(sentences)
+        previous = item.get("previous")
+        if previous and previous.get("text_hash") == text_hash:
+            insights = previous["result"].get("insights", {})
+        else:
+            # The prompt is the sentences capped at the primary model's context budget, plus the completion
+            prompt_tokens = min(estimate_tokens(" ".join(s["text"] for s in sentences)), MODEL_CONTEXT_TOKENS[PRIMARY_MODEL])
+            self.groq_limiter.acquire(prompt_tokens + MAX_COMPLETION_TOKENS)
+            insights = self._timed("llm", "groq", summarize_with_groq, sentences, data["title"])
+            if not insights or "error" in insights:
+                raise RuntimeError("LLM did not return insights")
+        result = assemble_result(data, insights, item["source"], item["path"])
+        return summary_entry(result, revid=data.get("revid"), text_hash=text_hash)
+
+    # ── Refresh ───────────────────────────────────────────────────────────────
+
+    async def probe_unchanged(self, cache: TieredCache, items: list) -> list:
+        """
+        Loads the stored entries for `items` and probes all their revisions in one
+        batched query. Returns the items whose article is unchanged, each carrying
+        its entry with a renewed stored_at; the rest keep theirs as item["previous"].
+        """
+        stored = await cache.get_many([key for key in {self.page_key(i) for i in items} if key])
+        for item in items:
+            entry = stored.get(self.page_key(item))
+            # An entry whose LLM step failed is treated as absent, so the LLM runs again
+            if entry and "result" in entry and has_insights(entry["result"]):
+                item["previous"] = entry
+
+        probed = [i for i in items if i.get("previous", {}).get("revid") and i.get("title")]
+        titles = sorted({i["title"] for i in probed})
+        loop = asyncio.get_running_loop()
+        revids = await loop.run_in_executor(None, self._timed, "probe", "wikipedia", fetch_revision_ids, titles) if titles else {}
+
+        unchanged = []
+        for item in probed:
+            if revids.get(item["title"]) == item["previous"]["revid"]:
+                item["previous"] = {**item["previous"], "stored_at": time.time()}
+                unchanged.append(item)
+        return unchanged
+
+    # ── Driver ────────────────────────────────────────────────────────────────
+
+    async def run(self, items: list):
+        args = self.args
+        done_keys = load_progress(args.progress)
+        pending = []
+        for item in items:
+            item["key"] = alias_cache_key(item["source"], item["name"])
+            if item["key"] not in done_keys:
+                pending.append(item)
+        # Duplicate rows share an alias key; resolve each once
+        pending = list({item["key"]: item for item in pending}.values())
+        logger.info("%d locations to warm (%d already done)", len(pending), len(items) - len(pending))
+
+        self.stats = Stats(len(pending))
+        cache = TieredCache(redis_client, SizedTTLCache(max_bytes=1_000_000, ttl=60, name="warm"))
+        loop = asyncio.get_running_loop()
+
+        aliases = {}
+
+        def group_of(item: dict) -> list:
+            page_key = self.page_key(item)
+            return aliases[page_key] if page_key else [item]
+
+        async def attempt(fn, item, *fn_args):
+            try:
+                return item, await loop.run_in_executor(self.pool, fn, item, *fn_args)
+            except Exception as e:
+                logger.warning("Warming failed for %s: %s", item["name"], e)
+                self.stats.failed += len(group_of(item))
+                return item, None
+
+        for start in range(0, len(pending), args.chunk_size):
+            chunk = pending[start:start + args.chunk_size]
+            await loop.run_in_executor(None, self.resolve, chunk)
+
+            # Different aliases of one page run the pipeline once; the others only get alias entries
+            aliases = defaultdict(list)
+            for item in chunk:
+                aliases[self.page_key(item)].append(item)
+            unique = [group[0] for page_key, group in aliases.items() if page_key] + aliases.get(None, [])
+
+            batch = {}
+            if args.refresh:
+                unchanged = await self.probe_unchanged(cache, unique)
+                for item in unchanged:
+                    batch[self.page_key(item)] = (item["previous"], group_of(item))
+                skipped = {id(item) for item in unchanged}
+                unique = [item for item in unique if id(item) not in skipped]
+                logger.info("%d pages unchanged since their last summary", len(unchanged))
+
+            fetched = [
+                (item, data)
+                for item, data in await asyncio.gather(*(attempt(self.fetch_one, item) for item in unique))
+                if data is not None
+            ]
+            extracted = await loop.run_in_executor(None, self.filter_all, fetched) if fetched else []
+
+            summaries = [attempt(self.summarize_one, item, data, sentences) for (item, data), sentences in zip(fetched, extracted)]
+            for future in asyncio.as_completed(summaries):
+                item, entry = await future
+                if entry is None:
+                    continue
+                batch[self.page_key(item)] = (entry, group_of(item))
+                if len(batch) >= args.batch_size:
+                    await self._flush(cache, batch)
+                    batch = {}
+            await self._flush(cache, batch)
+            logger.info(self.stats.report())
+
+        self.pool.shutdown()
+        print(self.stats.report())
+
+    async def _flush(self, cache: TieredCache, batch: dict):
+        """Writes {page key: (entry, alias items)}: the summaries, then every alias pointing at them."""
+        if not batch:
+            return
+        items = [item for _, group in batch.values() for item in group]
+        alias_entries = {
+            item["key"]: {"title": item.get("title"), "qid": item.get("qid")}
+            for item in items if item.get("title")
+        }
+        try:
+            await cache.set_many({key: entry for key, (entry, _) in batch.items()}, ex=SUMMARY_HARD_TTL_SECONDS)
+            if alias_entries:
+                await cache.set_many(alias_entries, ex=ALIAS_TTL_SECONDS)
+        except Exception:
+            self.stats.failed += len(items)
+            return
+        # Only record progress once the entries are actually in Redis
+        with open(self.args.progress, "a", encoding="utf-8") as f:
+            for item in items:
+                f.write(item["key"] + "\n")
+        self.stats.done += len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-compute location summaries into the Redis cache.")
+    parser.add_argument("input", help="JSONL, CSV or plain-text file of locations")
+    parser.add_argument("--progress", help="resume file of finished cache keys (default: <input>.progress, or <input>.refresh-progress with --refresh)")
+    parser.add_argument("--refresh", action="store_true", help="revalidate existing entries, skipping unchanged articles")
+    parser.add_argument("--workers", type=int, default=8, help="locations processed concurrently")
+    parser.add_argument("--chunk-size", type=int, default=200, help="locations resolved per batched lookup round")
+    parser.add_argument("--batch-size", type=int, default=25, help="results per pipelined Redis write")
+    parser.add_argument("--wikipedia-concurrency", type=int, default=4)
+    parser.add_argument("--onefivenine-concurrency", type=int, default=2)
+    parser.add_argument("--groq-concurrency", type=int, default=2)
+    parser.add_argument("--groq-rpm", type=int, default=int(os.getenv("GROQ_RPM", 30)), help="Groq requests per minute")
+    parser.add_argument("--groq-tpm", type=int, default=int(os.getenv("GROQ_TPM", 6000)), help="Groq tokens per minute")
+    args = parser.parse_args()
+    args.progress = args.progress or args.input + (".refresh-progress" if args.refresh else ".progress")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not redis_client:
+        parser.error("UPSTASH_REDIS_REST_URL and UPSTASH_REDIS_REST_TOKEN must be set to warm the cache")
+
+    asyncio.run(Warmer(args).run(read_locations(args.input)))
+
+
+if __name__ == "__main__":
+    main()
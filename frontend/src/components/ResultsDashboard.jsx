@@ -1,6 +1,6 @@
 import { useState, useEffect, useCallback } from 'react';
 import { motion } from 'framer-motion';
-import { Landmark, MapPin, Users, Factory, Train, BarChart3, Globe, Compass, Palmtree, BookOpen, Utensils, Music, Sparkles, ChevronLeft, ChevronRight, ExternalLink, Printer, Share2, Check } from 'lucide-react';
+import { Landmark, MapPin, Users, Factory, Train, BarChart3, Globe, Compass, Palmtree, BookOpen, Utensils, Music, Sparkles, ChevronLeft, ChevronRight, ExternalLink, Printer, Share2, Check, RefreshCw } from 'lucide-react';
 import MapCard from './MapCard';
 import WeatherCard from './WeatherCard';
 
@@ -186,8 +186,8 @@ const SourceCard = ({ source, source_url, location_name }) => {
 };
 
 /* ── Main Dashboard ───────────────────────────────────── */
-const ResultsDashboard = ({ data, onSearch }) => {
-    const { image_url, image_urls, insights, location_name, source, source_url, quick_facts } = data;
+const ResultsDashboard = ({ data, onSearch, onRetry }) => {
+    const { image_url, image_urls, insights, insights_error, location_name, source, source_url, quick_facts } = data;
     const [copied, setCopied] = useState(false);
 
     const handleShare = () => {
@@ -366,6 +366,34 @@ const ResultsDashboard = ({ data, onSearch }) => {
                     })}
                 </div>
 
+                {/* The LLM step failed: the page data above is real, the insights are not there */}
+                {insights_error && (
+                    <div
+                        className="glass-panel fade-in"
+                        style={{
+                            marginTop: '1.25rem', padding: '1rem 1.5rem',
+                            display: 'flex', alignItems: 'center', justifyContent: 'space-between', gap: '1rem',
+                            color: '#ef4444', border: '1px solid rgba(239, 68, 68, 0.3)',
+                        }}
+                    >
+                        <span>{insights_error}</span>
+                        {onRetry && (
+                            <button
+                                onClick={onRetry}
+                                style={{
+                                    display: 'flex', alignItems: 'center', gap: '0.5rem',
+                                    padding: '0.5rem 1.1rem', borderRadius: '9999px',
+                                    border: '1px solid rgba(239, 68, 68, 0.4)', background: 'transparent',
+                                    cursor: 'pointer', fontSize: '0.85rem', fontWeight: 600, color: '#ef4444',
+                                }}
+                            >
+                                <RefreshCw size={15} />
+                                Retry
+                            </button>
+                        )}
+                    </div>
+                )}
+
 
             </div>
         </div>
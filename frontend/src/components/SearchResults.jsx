@@ -35,7 +35,7 @@ const SkeletonCard = ({ delay }) => (
 );
 
 /* ── Individual result card ── */
-const ResultCard = ({ item, onSelect, index }) => {
+const ResultCard = ({ item, query, onSelect, index }) => {
     const [hovered, setHovered] = useState(false);
     const cfg = SOURCE_CONFIG[item.source] || SOURCE_CONFIG.wikipedia;
 
@@ -44,7 +44,7 @@ const ResultCard = ({ item, onSelect, index }) => {
             initial={{ opacity: 0, y: 18 }}
             animate={{ opacity: 1, y: 0 }}
             transition={{ delay: index * 0.07, ease: 'easeOut' }}
-            onClick={() => onSelect(item.source === 'wikipedia' ? { ...item, exactTitle: item.title } : item)}
+            onClick={() => onSelect(item.source === 'wikipedia' ? { ...item, exactTitle: item.title, query } : item)}
             onMouseEnter={() => setHovered(true)}
             onMouseLeave={() => setHovered(false)}
             style={{
@@ -187,6 +187,7 @@ const SearchResults = ({ candidates, query, onSelect, onBack, loading }) => {
                             <ResultCard
                                 key={`${item.title}-${item.source}`}
                                 item={item}
+                                query={query}
                                 onSelect={onSelect}
                                 index={i}
                             />
@@ -19,6 +19,7 @@ const Home = ({ initialQuery = null }) => {
     const location   = useLocation();
     const resultsRef = useRef(null);
     const eventSourceRef = useRef(null);
+    const lastSearchRef = useRef(null);
 
     // Reset to hero when navigating home
     useEffect(() => {
@@ -68,9 +69,31 @@ const Home = ({ initialQuery = null }) => {
         setCandidatesLoading(true);
 
         try {
-            const res = await fetch(`/api/search?q=${encodeURIComponent(queryText.trim())}&source=all`);
-            const results = await res.json();
-            setCandidates(Array.isArray(results) ? results : []);
+            // NDJSON stream: one line per source, Wikipedia usually lands first
+            const res = await fetch(`/api/search/stream?q=${encodeURIComponent(queryText.trim())}`);
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let received = [];
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                for (const line of lines) {
+                    if (!line.trim()) continue;
+                    const chunk = JSON.parse(line);
+                    if (Array.isArray(chunk.results)) {
+                        received = [...received, ...chunk.results];
+                        setCandidates(received);
+                        // Show the first candidates right away; later sources append
+                        if (received.length > 0) setCandidatesLoading(false);
+                    }
+                }
+            }
+            setCandidates(received);
         } catch (e) {
             console.error('Search failed:', e);
             setCandidates([]);
@@ -92,6 +115,7 @@ const Home = ({ initialQuery = null }) => {
 
         // Save to history
         saveSearchToHistory(searchObj);
+        lastSearchRef.current = searchObj;
 
         setCandidates(null);
         setCandidatesLoading(false);
@@ -108,6 +132,9 @@ const Home = ({ initialQuery = null }) => {
         // If the title came from disambiguation, pin it so the backend skips re-resolution
         if (searchObj.source === 'wikipedia' && searchObj.exactTitle)
             url += `&exact_title=${encodeURIComponent(searchObj.exactTitle)}`;
+        // ...and send what was typed, so the backend can learn that query -> title
+        if (searchObj.exactTitle && searchObj.query)
+            url += `&query=${encodeURIComponent(searchObj.query)}`;
 
         const es = new EventSource(url);
         eventSourceRef.current = es;
@@ -128,13 +155,14 @@ const Home = ({ initialQuery = null }) => {
                 const event = JSON.parse(raw);
 
                 if (event.type === 'meta') {
+                    // Images and facts follow as their own events once their fetches land
                     setData({
                         location_name: event.location_name,
-                        image_url:     event.image_url,
-                        image_urls:    event.image_urls || [],
+                        image_url:     null,
+                        image_urls:    [],
                         source:        event.source,
                         source_url:    event.source_url || '',
-                        quick_facts:   event.quick_facts || {},
+                        quick_facts:   {},
                         insights:      {},
                     });
                     setLoading(false);
@@ -143,12 +171,51 @@ const Home = ({ initialQuery = null }) => {
                         `/location/${encodeURIComponent(event.location_name.toLowerCase())}`
                     );
 
-                } else if (event.type === 'insight') {
+                } else if (event.type === 'images') {
+                    setData(prev =>
+                        prev ? { ...prev, image_url: event.image_url, image_urls: event.image_urls || [] } : null
+                    );
+
+                } else if (event.type === 'facts') {
+                    setData(prev =>
+                        prev ? { ...prev, quick_facts: event.quick_facts || {} } : null
+                    );
+
+                } else if (event.type === 'insight' || event.type === 'insight_end') {
                     insights = { ...insights, [event.key]: event.value };
                     setData(prev =>
                         prev ? { ...prev, insights: { ...prev.insights, [event.key]: event.value } } : null
                     );
 
+                } else if (event.type === 'insight_start') {
+                    // Live runs stream each value token by token; the card fills in as it arrives
+                    insights = { ...insights, [event.key]: '' };
+                    setData(prev =>
+                        prev ? { ...prev, insights: { ...prev.insights, [event.key]: '' } } : null
+                    );
+
+                } else if (event.type === 'insight_delta') {
+                    insights = { ...insights, [event.key]: (insights[event.key] || '') + event.text };
+                    setData(prev =>
+                        prev ? {
+                            ...prev,
+                            insights: { ...prev.insights, [event.key]: (prev.insights[event.key] || '') + event.text },
+                        } : null
+                    );
+
+                } else if (event.type === 'insight_abort') {
+                    const { [event.key]: _dropped, ...rest } = insights;
+                    insights = rest;
+                    setData(prev => {
+                        if (!prev) return null;
+                        const { [event.key]: _removed, ...kept } = prev.insights;
+                        return { ...prev, insights: kept };
+                    });
+
+                } else if (event.type === 'insights_error') {
+                    // The page data stands; only the LLM step failed, so offer a retry in place
+                    setData(prev => prev ? { ...prev, insights_error: event.message } : null);
+
                 } else if (event.type === 'error') {
                     es.close();
                     eventSourceRef.current = null;
@@ -227,7 +294,11 @@ const Home = ({ initialQuery = null }) => {
             {/* Results */}
             {data && !inDisambiguation && (
                 <div ref={resultsRef} style={{ width: '100%' }}>
-                    <ResultsDashboard data={data} onSearch={handleSearch} />
+                    <ResultsDashboard
+                        data={data}
+                        onSearch={handleSearch}
+                        onRetry={() => lastSearchRef.current && handleSearch(lastSearchRef.current)}
+                    />
                 </div>
             )}
         </div>